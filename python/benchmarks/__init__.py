@@ -0,0 +1,10 @@
+"""
+Benchmarks for the matchmaker hot paths.
+
+Generate a synthetic league and time loading, team search, recording and saving:
+
+    python -m benchmarks.run --players 100 10000 --out results.json
+
+Run from the python/ directory so matchmaker can be imported. A league that fails is
+reported with an 'error' instead of timings, and the run exits with status 1.
+"""
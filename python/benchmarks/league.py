@@ -0,0 +1,86 @@
+"""Seeded synthetic league data in the players.csv / games.csv / attendance.csv formats."""
+import csv
+import os
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+# Share of players in each skill group
+SKILL_GROUP_WEIGHTS = {'A': 0.1, 'B': 0.2, 'C': 0.35, 'D': 0.2, 'E': 0.1, 'F': 0.05}
+SKILL_GROUP_BASE = {'A': 160.0, 'B': 120.0, 'C': 100.0, 'D': 80.0, 'E': 40.0, 'F': 0.0}
+
+
+def player_name(i: int) -> str:
+    """Stable synthetic player name for index i."""
+    return f"Player{i:06d}"
+
+
+def generate_league(directory: str, num_players: int, num_games: int, num_attending: Optional[int] = None,
+                    team_size: int = 6, chemistry_entries: int = 3, seed: int = 0) -> Dict[str, str]:
+    """
+    Write a synthetic league to directory.
+    
+    Args:
+        directory: Output directory (created if missing)
+        num_players: Rows in players.csv
+        num_games: Rows in games.csv, one game every 30 minutes ending today
+        num_attending: Rows in attendance.csv (default min(num_players, 48))
+        team_size: Players per side in generated games
+        chemistry_entries: Chemistry scores stored per player
+        seed: Random seed, the same seed always writes the same files
+        
+    Returns:
+        Dict with the 'players', 'games' and 'attendance' file paths
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, f"{name}.csv") for name in ('players', 'games', 'attendance')}
+    names = [player_name(i) for i in range(num_players)]
+    groups = rng.choices(list(SKILL_GROUP_WEIGHTS), weights=list(SKILL_GROUP_WEIGHTS.values()), k=num_players)
+    today = date.today()
+
+    with open(paths['players'], 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Name', 'Skill_Group', 'Z_Score', 'Sigma', 'LastPlayed',
+                         'GamesPlayed', 'Wins', 'PointsScored', 'PointsAllowed', 'Chemistry'])
+        for i, name in enumerate(names):
+            games_played = rng.randint(0, 200)
+            wins = rng.randint(0, games_played)
+            teammates = rng.sample(range(num_players), max(0, min(chemistry_entries, num_players - 1)))
+            chemistry = ';'.join(f"{names[j]}:{rng.uniform(-10, 30):.2f}" for j in teammates if j != i)
+            writer.writerow([
+                name,
+                groups[i],
+                round(rng.gauss(SKILL_GROUP_BASE[groups[i]], 15), 3),
+                round(rng.uniform(25, 100), 3),
+                # Some players have been away long enough for skill decay to apply
+                (today - timedelta(days=rng.randint(0, 120))).strftime("%Y-%m-%d"),
+                games_played,
+                wins,
+                games_played * rng.randint(15, 25),
+                games_played * rng.randint(15, 25),
+                chemistry
+            ])
+
+    start = datetime.combine(today, datetime.min.time()) - timedelta(minutes=30 * num_games)
+    with open(paths['games'], 'w', newline='') as f:
+        writer = csv.writer(f)
+        rows: List[list] = []
+        for g in range(num_games):
+            sample = rng.sample(names, 2 * team_size) if num_players >= 2 * team_size else names
+            half = len(sample) // 2
+            winner_first = rng.random() < 0.5
+            loser_score = rng.randint(10, 23)
+            rows.append([(start + timedelta(minutes=30 * g)).strftime("%Y-%m-%d %H:%M"),
+                         ",".join(sample[:half]), ",".join(sample[half:]),
+                         25 if winner_first else loser_score, loser_score if winner_first else 25])
+            if len(rows) >= 10000:
+                writer.writerows(rows)
+                rows = []
+        writer.writerows(rows)
+
+    attending = rng.sample(names, min(num_players, 48) if num_attending is None else min(num_attending, num_players))
+    with open(paths['attendance'], 'w', newline='') as f:
+        csv.writer(f).writerows([name] for name in attending)
+
+    return paths
@@ -0,0 +1,213 @@
+"""
+Load test the matchmaker service with concurrent check-in traffic and report latency percentiles.
+
+Starts service.py on a synthetic league (or targets --url), then runs concurrent clients
+for a fixed duration. Each client keeps one HTTP connection open and picks requests by
+weight: check-ins and check-outs from a session roster, player stats, team searches and
+game results. Results are written as JSON with p50/p99 latency per request type.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.league import generate_league, player_name
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'service.py')
+LEAGUE = 'bench'
+
+# Relative frequency of each request type
+DEFAULT_MIX = {'checkin': 40, 'checkout': 20, 'stats': 30, 'teams': 5, 'games': 5}
+
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 JSON client."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            if key.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+def _percentiles(seconds: List[float]) -> Dict[str, Any]:
+    """Count and p50/p99/max latency in milliseconds."""
+    if not seconds:
+        return {'requests': 0}
+    ordered = sorted(seconds)
+    pick = lambda q: 1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'requests': len(ordered),
+        'p50_ms': pick(0.50),
+        'p99_ms': pick(0.99),
+        'max_ms': 1000 * ordered[-1],
+        'mean_ms': 1000 * statistics.fmean(ordered),
+    }
+
+
+async def run_client(client: Client, rng: random.Random, roster: List[str], players: List[str],
+                     mix: Dict[str, int], deadline: float, time_budget: float,
+                     latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    """Issue weighted random requests until deadline."""
+    kinds, weights = list(mix), list(mix.values())
+    base = f"/leagues/{LEAGUE}"
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'checkin':
+            request = ('POST', f"{base}/checkin", {'name': rng.choice(roster)})
+        elif kind == 'checkout':
+            request = ('POST', f"{base}/checkout", {'name': rng.choice(roster)})
+        elif kind == 'stats':
+            request = ('GET', f"{base}/players/{quote(rng.choice(players))}", None)
+        elif kind == 'teams':
+            request = ('POST', f"{base}/teams", {'method': 'anneal', 'time_budget': time_budget})
+        else:
+            sample = rng.sample(roster, 12)
+            request = ('POST', f"{base}/games", {'team1': sample[:6], 'team2': sample[6:],
+                                                 'score1': 25, 'score2': rng.randint(10, 23)})
+        start = time.perf_counter()
+        status, _ = await client.request(*request)
+        elapsed = time.perf_counter() - start
+        if status == 200:
+            latencies.setdefault(kind, []).append(elapsed)
+        else:
+            errors[kind] = errors.get(kind, 0) + 1
+
+
+async def load_test(host: str, port: int, roster: List[str], players: List[str], clients: int,
+                    duration: float, mix: Dict[str, int], time_budget: float, seed: int) -> Dict[str, Any]:
+    """Run clients concurrently for duration seconds against a running service."""
+    setup = Client(host, port)
+    await setup.request('PUT', f"/leagues/{LEAGUE}/attendance", {'names': roster})
+    await setup.close()
+
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    connections = [Client(host, port) for _ in range(clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(client, random.Random(seed * 1000 + i), roster, players, mix,
+                                      start + duration, time_budget, latencies, errors)
+                           for i, client in enumerate(connections)))
+    elapsed = time.perf_counter() - start
+    for client in connections:
+        await client.close()
+
+    everything = [seconds for values in latencies.values() for seconds in values]
+    return {
+        'clients': clients,
+        'seconds': elapsed,
+        'throughput_rps': len(everything) / elapsed,
+        'all': _percentiles(everything),
+        'requests': {kind: _percentiles(values) for kind, values in sorted(latencies.items())},
+        'errors': errors,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_service(directory: str, port: int, flush_delay: float, log_path: str) -> subprocess.Popen:
+    """Start service.py on a league directory, logging to log_path, and wait until it is listening."""
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen([sys.executable, SERVICE, '--league', f"{LEAGUE}={directory}",
+                                    '--port', str(port), '--flush-delay', str(flush_delay)],
+                                   stderr=log, stdout=subprocess.DEVNULL)
+    while process.poll() is None:
+        with open(log_path, 'r') as log:
+            if 'Serving on ' in log.read():
+                return process
+        time.sleep(0.05)
+    raise RuntimeError(f"Service exited with status {process.returncode}, see {log_path}")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default=None,
+                        help="Test a running service at http://host:port (its 'bench' league) instead of starting one")
+    parser.add_argument('--players', type=int, default=10000, help="Players in the generated league")
+    parser.add_argument('--games', type=int, default=20000, help="Games in the generated league")
+    parser.add_argument('--roster', type=int, default=48, help="Players checking in and out of the session")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32], help="Concurrent clients per run")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run")
+    parser.add_argument('--time-budget', type=float, default=0.2, help="Time budget of each team search")
+    parser.add_argument('--flush-delay', type=float, default=1.0, help="Service write-behind delay")
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX,
+                        help=f"Request weights as JSON (default: {json.dumps(DEFAULT_MIX)})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="Write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    players = [player_name(i) for i in range(args.players)]
+    roster = random.Random(args.seed).sample(players, min(args.roster, len(players)))
+    report: Dict[str, Any] = {'players': args.players, 'games': args.games, 'roster': len(roster),
+                              'mix': args.mix, 'time_budget': args.time_budget, 'runs': []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        if args.url:
+            host, _, port = args.url.split('://')[-1].rstrip('/').partition(':')
+            port = int(port or 80)
+        else:
+            print(f"Generating {args.players} players, {args.games} games...", file=sys.stderr)
+            generate_league(tmp, args.players, args.games, seed=args.seed)
+            host, port = '127.0.0.1', _free_port()
+            start = time.perf_counter()
+            process = start_service(tmp, port, args.flush_delay, os.path.join(tmp, 'service.log'))
+            report['service_start_seconds'] = time.perf_counter() - start
+        try:
+            for clients in args.clients:
+                print(f"{clients} clients for {args.duration:.0f} s...", file=sys.stderr)
+                report['runs'].append(asyncio.run(load_test(host, port, roster, players, clients, args.duration,
+                                                            args.mix, args.time_budget, args.seed)))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Time the matchmaker hot paths on synthetic leagues and write the results as JSON."""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.league import generate_league
+from matchmaker import SKILL_GROUP_RATINGS, Player, PlayerTable, VolleyballMatchmaker
+from storage import SqliteStorage, migrate
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+DEFAULT_PLAYERS = [100, 10000, 100000]
+MAX_DEFAULT_GAMES = 1000000
+
+
+class DictPlayer:
+    """The dict-backed Player that PlayerTable views replaced, the reference for benchmark_players."""
+
+    def __init__(self, name: str, skill_group: str, z_score: float = 100.0,
+                 sigma: float = 100.0, last_played: Optional[date] = None):
+        self.name = name
+        self.skill_group = skill_group
+        self.z_score = z_score
+        self.sigma = sigma
+        self.last_played = last_played or date.today()
+        self.chemistry: Dict[str, float] = {}
+        self.games_played = 0
+        self.wins = 0
+        self.points_scored = 0
+        self.points_allowed = 0
+        self.skill_group_rating = SKILL_GROUP_RATINGS.get(skill_group, 100.0)
+
+    def weighted_rating(self) -> float:
+        skill_weight = max(0.2, min(1.0, 1.0 - (self.games_played * 0.8 / 30)))
+        return skill_weight * self.skill_group_rating + (1 - skill_weight) * self.z_score
+
+
+def _timed(fn: Callable, *args, **kwargs) -> Tuple[float, Any]:
+    """Run fn once, returning (seconds, result)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _summary(seconds: List[float], **extra) -> Dict[str, Any]:
+    """Mean/min/max in milliseconds for a list of timings, plus any extra fields."""
+    return {
+        'runs': len(seconds),
+        'mean_ms': 1000 * statistics.fmean(seconds),
+        'min_ms': 1000 * min(seconds),
+        'max_ms': 1000 * max(seconds),
+        **extra
+    }
+
+
+def _traced_bytes(build: Callable) -> Tuple[int, Any]:
+    """Bytes still allocated after build() returns, as traced by tracemalloc, and its result."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_players(matchmaker: VolleyballMatchmaker, repeat_count: int) -> Dict[str, Any]:
+    """
+    Memory per player and one weighted rating pass over the roster, for DictPlayer objects
+    against a PlayerTable with Player views (names are shared, so neither side counts them).
+
+    Returns:
+        Dict of benchmark name -> summary
+    """
+    players = list(matchmaker.players.values())
+    names = [player.name for player in players]
+    source = matchmaker.player_table
+    source_rows = np.array([player.row for player in players], dtype=np.int64)
+    indices = [player.index for player in players]
+
+    def build_dict_players() -> Dict[str, DictPlayer]:
+        roster = {}
+        for player in players:
+            copy = DictPlayer(player.name, player.skill_group, player.z_score, player.sigma, player.last_played)
+            copy.games_played, copy.wins = player.games_played, player.wins
+            copy.points_scored, copy.points_allowed = player.points_scored, player.points_allowed
+            roster[copy.name] = copy
+        return roster
+
+    def build_table() -> Tuple[PlayerTable, Dict[str, Player]]:
+        table = PlayerTable()
+        table.group_names, table.group_index = list(source.group_names), dict(source.group_index)
+        rows = table.add_many(names)
+        for field in PlayerTable.FIELDS:
+            getattr(table, field)[rows] = getattr(source, field)[source_rows]
+        return table, dict(zip(names, map(Player.view, repeat(table), rows.tolist(),
+                                          repeat(matchmaker.chemistry), indices)))
+
+    dict_bytes, dict_players = _traced_bytes(build_dict_players)
+    table_bytes, (table, views) = _traced_bytes(build_table)
+    count = max(1, len(players))
+    results: Dict[str, Any] = {'player_memory': {
+        'players': len(players),
+        'dict_player_bytes_per_player': dict_bytes / count,
+        'player_table_bytes_per_player': table_bytes / count,
+    }}
+
+    # The same ratings three ways: per object, per view, and one NumPy pass over the table
+    expected = np.array([player.weighted_rating() for player in dict_players.values()])
+    seconds = [_timed(lambda: [player.weighted_rating() for player in dict_players.values()])[0]
+               for _ in range(repeat_count)]
+    results['weighted_rating_dict_players'] = _summary(seconds)
+    seconds = [_timed(lambda: [player.weighted_rating() for player in views.values()])[0]
+               for _ in range(repeat_count)]
+    results['weighted_rating_views'] = _summary(seconds)
+    seconds, ratings = [], None
+    for _ in range(repeat_count):
+        elapsed, ratings = _timed(table.weighted_ratings)
+        seconds.append(elapsed)
+    results['weighted_ratings_table'] = _summary(
+        seconds, max_abs_diff=float(np.max(np.abs(ratings - expected), initial=0.0)),
+        speedup=results['weighted_rating_dict_players']['mean_ms'] / max(1e-9, 1000 * statistics.fmean(seconds)))
+    return results
+
+
+def cli_cold_start(paths: Dict[str, str], args: List[str], repeat: int) -> Dict[str, Any]:
+    """Wall time of fresh main.py processes, from launch until their JSON is written."""
+    command = [sys.executable, CLI, '--players-file', paths['players'], '--games-file', paths['games'],
+               '--attendance-file', paths['attendance'], *args]
+    seconds = []
+    for _ in range(repeat):
+        elapsed, process = _timed(subprocess.run, command, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed: {process.stdout}{process.stderr}")
+        seconds.append(elapsed)
+    return _summary(seconds)
+
+
+def benchmark_league(directory: str, num_players: int, num_games: int, repeat: int = 3,
+                     seed: int = 0, num_attending: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generate one league in directory and time every benchmarked operation on it.
+    
+    Returns:
+        Dict of operation name -> timing summary
+    """
+    paths = generate_league(directory, num_players, num_games, num_attending=num_attending, seed=seed)
+    empty_games = os.path.join(directory, 'no_games.csv')
+    open(empty_games, 'w').close()
+    rng = random.Random(seed)
+    results: Dict[str, Any] = {}
+    quiet = lambda: contextlib.redirect_stdout(io.StringIO())
+
+    # load_players: a fresh matchmaker over an empty game file only loads players
+    matchmaker = None
+    seconds = []
+    for _ in range(repeat):
+        matchmaker = None
+        elapsed, matchmaker = _timed(VolleyballMatchmaker, paths['players'], empty_games, paths['attendance'])
+        seconds.append(elapsed)
+    results['load_players'] = _summary(seconds, players=len(matchmaker.players))
+    results.update(benchmark_players(matchmaker, repeat))
+
+    # load_game_history only opens the log; the first query builds its sparse index
+    matchmaker.game_file = matchmaker.storage.game_file = paths['games']
+    seconds, index_seconds = [], []
+    for _ in range(repeat):
+        seconds.append(_timed(matchmaker.load_game_history)[0])
+        index_seconds.append(_timed(len, matchmaker.game_log)[0])
+    results['load_game_history'] = _summary(seconds)
+    results['index_game_history'] = _summary(index_seconds, games=len(matchmaker.game_log))
+
+    with quiet():
+        matchmaker.load_attendance()
+    attending = matchmaker.attending_players
+
+    # create_teams per search method; quality per millisecond tracks search efficiency
+    for method in ('random', 'anneal'):
+        seconds, qualities = [], []
+        for run in range(repeat):
+            with quiet():
+                elapsed, _ = _timed(matchmaker.create_teams, method=method, seed=seed + run)
+            seconds.append(elapsed)
+            qualities.append(matchmaker.last_search_stats['quality'])
+        mean_ms = 1000 * statistics.fmean(seconds)
+        results[f'create_teams_{method}'] = _summary(
+            seconds, quality=statistics.fmean(qualities), quality_per_ms=statistics.fmean(qualities) / mean_ms)
+
+    # create_multiple_teams (single round of matchups)
+    seconds, qualities = [], []
+    for run in range(repeat):
+        with quiet():
+            elapsed, _ = _timed(matchmaker.create_multiple_teams, seed=seed + run)
+        seconds.append(elapsed)
+        qualities.append(matchmaker.last_matchup_stats.get('total_quality', 0.0))
+    mean_ms = 1000 * statistics.fmean(seconds)
+    results['create_multiple_teams'] = _summary(
+        seconds, matchup_quality=statistics.fmean(qualities),
+        quality_per_ms=statistics.fmean(qualities) / mean_ms)
+
+    # get_player_stats on random players
+    names = rng.sample(list(matchmaker.players), min(len(matchmaker.players), 100 * repeat))
+    seconds = [_timed(matchmaker.get_player_stats, name)[0] for name in names]
+    results['get_player_stats'] = _summary(seconds)
+
+    # Command line cold starts: 'stats' reads the files directly, 'teams' loads the whole league
+    results['cli_stats'] = cli_cold_start(paths, ['stats', names[0]], repeat)
+    results['cli_teams'] = cli_cold_start(paths, ['teams', '--seed', str(seed), '--time-budget', '0.1'], repeat)
+
+    # record_game, each call persisting games.csv, the rating log and players.csv
+    team_size = min(6, len(attending) // 2)
+    games = []
+    for _ in range(10 * repeat):
+        sample = rng.sample(attending, 2 * team_size)
+        games.append((sample[:team_size], sample[team_size:], 25, rng.randint(10, 23)))
+    seconds = [_timed(matchmaker.record_game, *game)[0] for game in games[:repeat]]
+    results['record_game'] = _summary(seconds)
+
+    # record_games: the rest of the games in one batch, persisted once
+    elapsed, _ = _timed(matchmaker.record_games, games[repeat:])
+    results['record_games'] = _summary([elapsed], games=len(games) - repeat,
+                                       per_game_ms=1000 * elapsed / max(1, len(games) - repeat))
+
+    seconds = [_timed(matchmaker.save_players)[0] for _ in range(repeat)]
+    results['save_players'] = _summary(seconds)
+
+    # Saving players.csv also wrote its binary snapshot, which a fresh matchmaker maps
+    # instead of parsing the CSV; the snapshot carries the game index too
+    seconds = []
+    for _ in range(repeat):
+        elapsed, snapshot_matchmaker = _timed(VolleyballMatchmaker, paths['players'], paths['games'],
+                                              paths['attendance'])
+        seconds.append(elapsed)
+    results['load_players_snapshot'] = _summary(seconds, players=len(snapshot_matchmaker.players))
+    results['index_game_history_snapshot'] = _summary([_timed(len, snapshot_matchmaker.game_log)[0]],
+                                                      games=len(snapshot_matchmaker.game_log))
+
+    # The same league in SQLite, where a recorded game writes only the rows it changed
+    database = os.path.join(directory, 'league.db')
+    elapsed, counts = _timed(migrate, matchmaker, SqliteStorage(database))
+    results['migrate_sqlite'] = _summary([elapsed], **counts)
+    seconds = []
+    for _ in range(repeat):
+        elapsed, sqlite_matchmaker = _timed(VolleyballMatchmaker, paths['players'], paths['games'],
+                                            paths['attendance'], storage=SqliteStorage(database))
+        seconds.append(elapsed)
+    results['load_players_sqlite'] = _summary(seconds)
+    sqlite_matchmaker.chemistry.load()  # as for the CSV matchmaker after its searches
+    sqlite_games = [([sqlite_matchmaker.players[p.name] for p in team1], [sqlite_matchmaker.players[p.name] for p in team2],
+                     score1, score2) for team1, team2, score1, score2 in games]
+    seconds = [_timed(sqlite_matchmaker.record_game, *game)[0] for game in sqlite_games[:repeat]]
+    results['record_game_sqlite'] = _summary(seconds)
+    elapsed, _ = _timed(sqlite_matchmaker.record_games, sqlite_games[repeat:])
+    results['record_games_sqlite'] = _summary([elapsed], games=len(games) - repeat,
+                                              per_game_ms=1000 * elapsed / max(1, len(games) - repeat))
+    sqlite_matchmaker.storage.close()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, nargs='+', default=DEFAULT_PLAYERS,
+                        help='League sizes to benchmark (default: 100 10000 100000)')
+    parser.add_argument('--games', type=int, default=None,
+                        help=f'Games per league (default: 10 per player, at most {MAX_DEFAULT_GAMES})')
+    parser.add_argument('--attending', type=int, default=None, help='Attending players (default 48)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per operation')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for league generation and searches')
+    parser.add_argument('--workdir', default=None, help='Where to write generated leagues (default: a temp dir)')
+    parser.add_argument('--out', default=None, help='Write JSON results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'leagues': []
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_players in args.players:
+            num_games = args.games if args.games is not None else min(10 * num_players, MAX_DEFAULT_GAMES)
+            league: Dict[str, Any] = {'players': num_players, 'games': num_games}
+            directory = os.path.join(args.workdir or tmp, f"league_{num_players}_{num_games}")
+            print(f"Benchmarking {num_players} players, {num_games} games...", file=sys.stderr)
+            try:
+                league['benchmarks'] = benchmark_league(directory, num_players, num_games, args.repeat,
+                                                        args.seed, args.attending)
+            except Exception as e:
+                # A league that cannot be benchmarked is reported, not left out
+                league['error'] = f"{type(e).__name__}: {e}"
+                print(f"League of {num_players} players failed: {league['error']}", file=sys.stderr)
+            report['leagues'].append(league)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    report = main()
+    sys.exit(1 if any('error' in league for league in report['leagues']) else 0)
@@ -0,0 +1,446 @@
+"""
+Game history and rating log readers that need only the standard library.
+
+matchmaker builds on these, and the command line uses them directly so that lookups
+such as 'main.py stats' start without importing NumPy.
+"""
+import bisect
+import csv
+import io
+import itertools
+import os
+import struct
+from array import array
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+# Games per sparse index entry in GameLog; a date seek starts at most this many rows early
+GAME_INDEX_STRIDE = 256
+
+
+class GameLog:
+    """
+    Streaming, indexed access to the game file (Date, Team1, Team2, Score1, Score2, one game per line).
+
+    Nothing is read when the log is opened. The first query scans the file once to build
+    a sparse index with one entry per GAME_INDEX_STRIDE games: the byte offset of the
+    block, the date of its first game and the latest date up to the end of the block.
+    Queries then seek to the first block that can hold a game on or after since, read
+    one block at a time and, while the file is in date order, stop after until. The index
+    is extended from where it stopped when the file grows. Games appended since the last
+    flush are kept in memory and yielded after the file.
+
+    Unless index_players is off, the first query for a player also builds a per-player
+    index, the byte offset of every game line of each player, so player queries seek
+    straight to that player's games. Once built it is extended along with the block index,
+    and flush() indexes the games it writes without reading them back. One-off readers
+    such as 'main.py stats' turn it off and filter blocks by the player's name instead.
+    """
+
+    def __init__(self, path: str, stride: int = GAME_INDEX_STRIDE, index_players: bool = True):
+        self.path = path
+        self.stride = stride
+        self.index_players = index_players
+        self.pending: List[list] = []  # rows waiting for flush()
+        # Player -> positions in pending of their queued games
+        self.pending_players: Dict[str, List[int]] = {}
+        self._reset_index()
+
+    def _reset_index(self) -> None:
+        self.block_offsets: List[int] = []
+        self.block_first_dates: List[date] = []
+        self.block_max_dates: List[date] = []  # latest date in this block or any earlier one
+        self.indexed_bytes = 0
+        self.indexed_games = 0
+        self.in_order = True  # dates never decrease, so blocks can be skipped by until
+        # Player -> byte offsets of the game lines they played in, up to indexed_bytes
+        # (an array, or a read-only int64 memoryview restored from a snapshot); None until
+        # the first player query
+        self.player_offsets: Optional[Dict[str, Union[array, memoryview]]] = None
+        self._load_player_offsets: Optional[Callable[[], Dict[str, Union[array, memoryview]]]] = None
+
+    def file_state(self) -> List[int]:
+        """The game file's size and modification time (ns), saved with the index for restore_index."""
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def restore_index(self, offsets: List[int], first_dates: List[date], max_dates: List[date],
+                      indexed_bytes: int, indexed_games: int, in_order: bool, source: List[int],
+                      appended_at: Optional[int] = None,
+                      player_offsets: Optional[Callable[[], Dict[str, Union[array, memoryview]]]] = None) -> bool:
+        """
+        Adopt an index saved from an earlier scan of the same file, so the first query
+        only scans rows written since.
+
+        Args:
+            source: file_state() when the index was saved
+            appended_at: Byte offset where games known to have been appended since start
+                (journaled by the storage), if any
+            player_offsets: Function returning the saved per-player index, if there is
+                one, called by the first player query; offsets may be int64 memoryviews,
+                copied when a player's offsets are next extended
+
+        Returns:
+            False (keeping the current index) if the file's size or modification time
+            differs from source, unless it only grew by the games appended at appended_at
+        """
+        size = source[0]
+        try:
+            state = self.file_state()
+        except FileNotFoundError:
+            return False
+        if state != source and not (appended_at == size and state[0] > size):
+            return False
+        self.block_offsets, self.block_first_dates, self.block_max_dates = offsets, first_dates, max_dates
+        self.indexed_bytes, self.indexed_games, self.in_order = indexed_bytes, indexed_games, in_order
+        self.player_offsets, self._load_player_offsets = None, player_offsets
+        return True
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self.indexed_games + len(self.pending)
+
+    @staticmethod
+    def _parse(row: List[str]) -> Optional[dict]:
+        """Game dict for a CSV row, or None if the row is not a complete game."""
+        if len(row) < 5:
+            return None
+        try:
+            return {
+                'date': datetime.fromisoformat(row[0]).date(),
+                'team1': row[1].split(','),
+                'team2': row[2].split(','),
+                'score1': int(row[3]),
+                'score2': int(row[4])
+            }
+        except ValueError:
+            return None
+
+    def _index_game(self, game: dict, offset: int) -> None:
+        """Add the game whose line starts at byte offset to the index."""
+        game_date = game['date']
+        if self.block_max_dates and game_date < self.block_max_dates[-1]:
+            self.in_order = False
+        if self.indexed_games % self.stride == 0:
+            self.block_offsets.append(offset)
+            self.block_first_dates.append(game_date)
+            self.block_max_dates.append(max(self.block_max_dates[-1], game_date)
+                                        if self.block_max_dates else game_date)
+        elif game_date > self.block_max_dates[-1]:
+            self.block_max_dates[-1] = game_date
+        self.indexed_games += 1
+        if self.player_offsets is not None:
+            self._index_players(game, offset)
+
+    def _index_players(self, game: dict, offset: int) -> None:
+        """Add the game whose line starts at byte offset to the per-player index."""
+        index = self.player_offsets
+        for team in (game['team1'], game['team2']):
+            for name in team:
+                offsets = index.get(name)
+                if offsets is None:
+                    index[name] = array('q', (offset,))
+                elif offsets[-1] != offset:  # a name listed twice in one game is indexed once
+                    if not isinstance(offsets, array):
+                        # Restored offsets are read-only until the player's first new game
+                        restored = offsets
+                        offsets = index[name] = array('q')
+                        offsets.frombytes(restored.cast('B'))
+                    offsets.append(offset)
+
+    def _scan(self, start: int, end: Optional[int], index) -> int:
+        """Call index(game, offset) for each game from byte start to end (None: end of file); returns the end."""
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if end is not None and offset >= end:
+                    break
+                game = self._parse(next(csv.reader((line.decode(),)), []))
+                if game is not None:
+                    index(game, offset)
+                offset += len(line)
+        return offset
+
+    def _refresh(self) -> None:
+        """Extend the index over rows written to the file since the last scan."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if size < self.indexed_bytes:
+            # The file was rewritten or truncated, start over (in the same pass for a player index in use)
+            by_player = self.player_offsets is not None
+            self._reset_index()
+            if by_player:
+                self.player_offsets = {}
+        if size == self.indexed_bytes:
+            return
+        self.indexed_bytes = self._scan(self.indexed_bytes, None, self._index_game)
+
+    def _players_index(self) -> Dict[str, Union[array, memoryview]]:
+        """The per-player index, restored or built over the indexed part of the file on first use."""
+        if self.player_offsets is None and self._load_player_offsets is not None:
+            self.player_offsets, self._load_player_offsets = self._load_player_offsets(), None
+        elif self.player_offsets is None:
+            self.player_offsets = {}
+            if self.indexed_bytes:
+                self._scan(0, self.indexed_bytes, self._index_players)
+        # Rows not indexed yet go into both indexes in one pass
+        self._refresh()
+        return self.player_offsets
+
+    def _read_block(self, f, block: int, players: Sequence[str] = ()) -> List[dict]:
+        """Games in one index block, in file order (only lines mentioning all of players)."""
+        start = self.block_offsets[block]
+        end = self.block_offsets[block + 1] if block + 1 < len(self.block_offsets) else self.indexed_bytes
+        f.seek(start)
+        lines = f.read(end - start).decode().splitlines()
+        if players:
+            # Cheap substring filter before parsing (on names as csv writes them, quotes
+            # doubled); exact membership is checked by the caller
+            quoted = [name.replace('"', '""') for name in players]
+            lines = [line for line in lines if all(name in line for name in quoted)]
+        return [game for game in map(self._parse, csv.reader(lines)) if game is not None]
+
+    def _read_games(self, f, offsets) -> Iterator[dict]:
+        """Games whose lines start at the given byte offsets, in the order given."""
+        for offset in offsets:
+            f.seek(offset)
+            game = self._parse(next(csv.reader((f.readline().decode(),)), []))
+            if game is not None:
+                yield game
+
+    def iter_games(self, since: Optional[date] = None, until: Optional[date] = None,
+                   player: Optional[str] = None, reverse: bool = False, with_player: Optional[str] = None):
+        """
+        Yield games one at a time, parsed on demand.
+
+        Args:
+            since: Only games on or after this date
+            until: Only games on or before this date
+            player: Only games this player took part in
+            reverse: Newest first (file order reversed) instead of oldest first
+            with_player: Only games this player took part in too (together with player)
+
+        Yields:
+            Dicts with date, team1, team2 (lists of names), score1 and score2
+        """
+        if isinstance(since, datetime):
+            since = since.date()
+        if isinstance(until, datetime):
+            until = until.date()
+        players = [name for name in (player, with_player) if name is not None]
+        by_player = players and self.index_players
+        if by_player:
+            index = self._players_index()  # refreshes both indexes, in one pass the first time
+        else:
+            self._refresh()
+
+        def wanted(game):
+            return ((since is None or game['date'] >= since) and (until is None or game['date'] <= until)
+                    and all(name in game['team1'] or name in game['team2'] for name in players))
+
+        first = bisect.bisect_left(self.block_max_dates, since) if since is not None else 0
+        last = len(self.block_offsets)
+        if until is not None and self.in_order:
+            last = bisect.bisect_right(self.block_first_dates, until)
+        if players:
+            positions = set.intersection(*(set(self.pending_players.get(name, ())) for name in players))
+            pending = [self._parse(self.pending[i]) for i in sorted(positions)]
+        else:
+            pending = map(self._parse, self.pending)
+        pending = [game for game in pending if game is not None and wanted(game)]
+
+        if reverse:
+            yield from reversed(pending)
+        if first < last and by_player:
+            # Only the lines of the players' games, between the first and last wanted block
+            offsets = index.get(players[0], ())
+            if len(players) > 1:
+                offsets = sorted(set(offsets).intersection(index.get(players[1], ())))
+            start = bisect.bisect_left(offsets, self.block_offsets[first])
+            end = (bisect.bisect_left(offsets, self.block_offsets[last]) if last < len(self.block_offsets)
+                   else len(offsets))
+            with open(self.path, 'rb') as f:
+                lines = range(end - 1, start - 1, -1) if reverse else range(start, end)
+                yield from filter(wanted, self._read_games(f, map(offsets.__getitem__, lines)))
+        elif first < last:
+            with open(self.path, 'rb') as f:
+                blocks = range(last - 1, first - 1, -1) if reverse else range(first, last)
+                for block in blocks:
+                    games = [game for game in self._read_block(f, block, players) if wanted(game)]
+                    yield from (reversed(games) if reverse else games)
+        if not reverse:
+            yield from pending
+
+    def append(self, game_time: datetime, team1: List[str], team2: List[str], score1: int, score2: int) -> int:
+        """Queue a game for the next flush() and return its game id (position in the log)."""
+        game_id = len(self)
+        for name in dict.fromkeys(team1 + team2):
+            self.pending_players.setdefault(name, []).append(len(self.pending))
+        self.pending.append([game_time.strftime("%Y-%m-%d %H:%M"), ",".join(team1), ",".join(team2),
+                             score1, score2])
+        return game_id
+
+    def flush(self) -> int:
+        """Append queued games to the file, indexing them; returns the number of bytes written."""
+        if not self.pending:
+            return 0
+        lines = []
+        for row in self.pending:
+            text = io.StringIO()
+            csv.writer(text).writerow(row)
+            lines.append(text.getvalue().encode())
+        with open(self.path, 'ab') as f:
+            start = f.tell()
+            f.write(b''.join(lines))
+        if start == self.indexed_bytes:
+            # The index is up to date, so the written games are indexed without reading them back
+            offset = start
+            for row, line in zip(self.pending, lines):
+                game = self._parse(row)
+                if game is not None:
+                    self._index_game(game, offset)
+                offset += len(line)
+            self.indexed_bytes = offset
+        self.pending = []
+        self.pending_players = {}
+        return sum(map(len, lines))
+
+
+def player_team(game: dict, player_name: str) -> int:
+    """1 or 2: the team a player was on in a game they played."""
+    return 1 if player_name in game['team1'] else 2
+
+
+def game_won(game: dict, team_number: int) -> bool:
+    """Whether the given team won the game."""
+    return game['score1'] > game['score2'] if team_number == 1 else game['score2'] > game['score1']
+
+
+def recent_games(log: GameLog, player_name: str, limit: int = 10) -> List[Dict]:
+    """Most recent games for a player, newest first, as dicts with date, team, score and won."""
+    games = []
+    for game in itertools.islice(log.iter_games(player=player_name, reverse=True), limit):
+        team_number = player_team(game, player_name)
+        games.append({
+            'date': game['date'],
+            'team': team_number,
+            'score': f"{game['score1']}-{game['score2']}",
+            'won': game_won(game, team_number)
+        })
+    return games
+
+
+def current_streak(log: GameLog, player_name: str) -> Tuple[str, int]:
+    """Current run of wins or losses as ('W' or 'L', length), or ('', 0) without games."""
+    last_won = None
+    length = 0
+    for game in log.iter_games(player=player_name, reverse=True):
+        won = game_won(game, player_team(game, player_name))
+        if last_won is None:
+            last_won = won
+        elif won != last_won:
+            break
+        length += 1
+    if last_won is None:
+        return '', 0
+    return ('W' if last_won else 'L'), length
+
+
+def head_to_head(log: GameLog, player_a: str, player_b: str) -> Dict:
+    """Games and wins of player_a together with and against player_b."""
+    record = {'games_together': 0, 'wins_together': 0, 'games_against': 0, 'wins_against': 0}
+    for game in log.iter_games(player=player_a, with_player=player_b):
+        team_a = player_team(game, player_a)
+        won = game_won(game, team_a)
+        if team_a == player_team(game, player_b):
+            record['games_together'] += 1
+            record['wins_together'] += won
+        else:
+            record['games_against'] += 1
+            record['wins_against'] += won
+    return record
+
+
+def best_teammates(chemistry: Dict[str, float], limit: int = 5) -> List[Tuple[str, float]]:
+    """Highest chemistry scores, equal scores in chemistry order."""
+    return sorted(chemistry.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def player_stats(player: Dict, teammates: List[Tuple[str, float]], log: GameLog,
+                 rating_trend: List[float]) -> Dict:
+    """
+    The stats reported for one player (VolleyballMatchmaker.get_player_stats and 'main.py stats').
+
+    Args:
+        player: Dict with name, skill_group, z_score, sigma, games_played, wins,
+            points_scored and points_allowed (as storage.parse_player_row returns)
+        teammates: Best teammates as (name, score)
+        log: Game history to take recent games and the current streak from
+        rating_trend: Ratings after the player's last recorded games, oldest first
+    """
+    rating, sigma = player['z_score'], player['sigma']
+    games_played, wins = player['games_played'], player['wins']
+    return {
+        'name': player['name'],
+        'skill_group': player['skill_group'],
+        'rating': rating,
+        'uncertainty': sigma,
+        'confidence_interval': (rating - 2 * sigma, rating + 2 * sigma),
+        'games_played': games_played,
+        'wins': wins,
+        'win_percentage': wins / games_played * 100 if games_played > 0 else 0,
+        'points_scored': player['points_scored'],
+        'points_allowed': player['points_allowed'],
+        'best_teammates': teammates,
+        'recent_games': recent_games(log, player['name']),
+        'streak': current_streak(log, player['name']),
+        'rating_trend': rating_trend
+    }
+
+
+# Layout of one rating snapshot, matching matchmaker.RATING_RECORD_DTYPE
+# (player id, game id, z_score, sigma, weighted rating)
+RATING_RECORD = struct.Struct('<iiddd')
+
+
+def recent_ratings(path: str, player_name: str, limit: int = 10,
+                   chunk_records: int = 4096) -> List[Tuple[int, float, float, float]]:
+    """
+    A player's last rating snapshots from a RatingHistory file, oldest first.
+
+    Player ids are line numbers of '<path>.names'. The log is read backwards a chunk at
+    a time, so the cost depends on how recently the player played, not on the log size.
+
+    Returns:
+        Up to limit (game id, z_score, sigma, weighted) tuples
+    """
+    player_id = None
+    try:
+        with open(path + '.names', 'r') as f:
+            for line_number, line in enumerate(f):
+                if line.rstrip('\n') == player_name:
+                    player_id = line_number
+                    break
+    except FileNotFoundError:
+        pass
+    if player_id is None or limit <= 0:
+        return []
+
+    found = []
+    try:
+        with open(path, 'rb') as f:
+            end = os.path.getsize(path) // RATING_RECORD.size * RATING_RECORD.size
+            while end > 0 and len(found) < limit:
+                start = max(0, end - chunk_records * RATING_RECORD.size)
+                f.seek(start)
+                chunk = [record for record in RATING_RECORD.iter_unpack(f.read(end - start))
+                         if record[0] == player_id]
+                found.extend(reversed(chunk))
+                end = start
+    except FileNotFoundError:
+        return []
+    return [record[1:] for record in reversed(found[:limit])]
@@ -1,6 +1,361 @@
-def main():
-    print("Hello from matchmaker!")
+"""
+Command line for the volleyball matchmaker.
+
+Each subcommand reads its options from arguments (or a JSON object given with --input,
+'-' for stdin) and writes a single JSON document to stdout; progress messages go to
+stderr. On failure {"error": ...} is written and the exit status is 1. Without a
+subcommand the interactive menu runs.
+
+    python main.py stats "Drew Michael"
+    python main.py teams --method anneal --time-budget 0.5
+    echo '{"team1": [...], "team2": [...], "score1": 25, "score2": 21}' | python main.py record
+    python main.py --database league.db migrate
+
+'stats' reads the files (or database) directly through the standard library; only the
+subcommands that rate or search players import the matchmaker (and with it NumPy).
+With --database the league is kept in SQLite instead of players.csv and games.csv;
+'migrate' creates that database from the CSV files. 'snapshot' writes players.csv.snapshot,
+a binary copy of the CSV league that later loads map instead of parsing; it is then kept
+up to date whenever players.csv is rewritten.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from history import GameLog, best_teammates, player_stats, recent_ratings
+from storage import SqliteStorage, journal_rows, migrate, parse_chemistry, parse_player_row
+
+
+class CommandError(Exception):
+    """A bad request, reported as {"error": ...}."""
+
+
+def json_default(value):
+    """json.dumps fallback for dates and NumPy scalars."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _read_input(path: Optional[str]):
+    """Parse the JSON document at path ('-' for stdin), or None without a path."""
+    if path is None:
+        return None
+    try:
+        if path == '-':
+            return json.load(sys.stdin)
+        with open(path, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        raise CommandError(f"Invalid JSON input: {e}")
+
+
+def _apply_input(args: argparse.Namespace, defaults: Dict) -> None:
+    """Fill options not given on the command line from --input, then from defaults."""
+    payload = _read_input(args.input)
+    if payload is not None and not isinstance(payload, dict):
+        raise CommandError("Input must be a JSON object")
+    for key, value in (payload or {}).items():
+        key = key.replace('-', '_')
+        if key not in defaults:
+            raise CommandError(f"Unknown input field: {key}")
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    for key, value in defaults.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+
+
+def _player_rows(player_file: str, names: List[str]) -> Dict[str, List[list]]:
+    """
+    All players.csv rows of the given players, in file order, then their journaled rows.
+
+    Lines are matched as text first, so only lines that mention a wanted name are parsed.
+    """
+    wanted = set(names)
+    rows: Dict[str, List[List[str]]] = {}
+    try:
+        with open(player_file, 'r', newline='') as f:
+            next(f, None)  # Header
+            for line in f:
+                if any(name in line for name in wanted):
+                    for row in csv.reader([line]):
+                        if row and row[0] in wanted:
+                            rows.setdefault(row[0], []).append(row)
+    except FileNotFoundError:
+        pass
+    for row in journal_rows(player_file):
+        if row[0] in wanted:
+            rows.setdefault(row[0], []).append(row)
+    return rows
+
+
+def _stats(args: argparse.Namespace, player_name: str, rows: List[list],
+           storage: Optional[SqliteStorage] = None) -> Dict:
+    """VolleyballMatchmaker.get_player_stats, computed without loading the league (from storage if given)."""
+    if not rows:
+        return {"error": "Player not found", "name": player_name}
+
+    # A repeated name keeps its last row, as in load_players
+    player = parse_player_row(rows[-1][:9])
+    if storage:
+        teammates = storage.best_teammates(player_name)
+    else:
+        # Chemistry columns load in file order, then journal order, as into the chemistry matrix
+        chemistry: Dict[str, float] = {}
+        for row in rows:
+            if len(row) > 9 and row[9]:
+                parse_chemistry(row[9], chemistry)
+        teammates = best_teammates(chemistry)
+    rating_trend = [z_score for _, z_score, _, _ in recent_ratings(args.ratings_file, player_name)]
+    # A one-off read: filtering the game file's blocks beats building its per-player index
+    log = storage.game_log() if storage else GameLog(args.games_file, index_players=False)
+    return player_stats(player, teammates, log, rating_trend)
+
+
+def cmd_stats(args: argparse.Namespace):
+    names = list(args.names)
+    payload = _read_input(args.input)
+    if isinstance(payload, dict):
+        payload = payload.get('names', [])
+    if payload is not None:
+        if not isinstance(payload, list):
+            raise CommandError("Input must be a list of names or {\"names\": [...]}")
+        names.extend(payload)
+    if not names:
+        raise CommandError("No player names given")
+    if args.database:
+        storage = SqliteStorage(args.database)
+        try:
+            return [_stats(args, name, [row] if row else [], storage)
+                    for name, row in zip(names, map(storage.player, names))]
+        finally:
+            storage.close()
+    rows = _player_rows(args.players_file, names)
+    return [_stats(args, name, rows.get(name, [])) for name in names]
+
+
+def _open_matchmaker(args: argparse.Namespace):
+    """The full matchmaker over the configured files (imports NumPy)."""
+    from matchmaker import VolleyballMatchmaker
+    storage = SqliteStorage(args.database) if args.database else None
+    return VolleyballMatchmaker(args.players_file, args.games_file, args.attendance_file,
+                                rating_history_file=args.ratings_file, storage=storage)
+
+
+def _load_attendees(matchmaker, attendees: Optional[List[str]]) -> None:
+    if attendees:
+        matchmaker.set_attendance(attendees)
+    else:
+        matchmaker.load_attendance()
+    if len(matchmaker.attending_players) < 2:
+        raise CommandError("Need at least 2 attending players")
+
+
+def team_json(matchmaker, team) -> Dict:
+    """A team's players, average weighted rating and chemistry."""
+    return {
+        'players': [{'name': p.name, 'skill_group': p.skill_group, 'rating': p.weighted_rating(),
+                     'sigma': p.sigma} for p in team],
+        'average_rating': sum(p.weighted_rating() for p in team) / len(team),
+        'chemistry': matchmaker.team_chemistry_score(team),
+    }
+
+
+def cmd_teams(args: argparse.Namespace):
+    _apply_input(args, {'attendees': None, 'team_size': 6, 'method': 'random', 'iterations': None,
+                        'seed': None, 'time_budget': None, 'workers': None})
+    if args.method not in ('random', 'anneal', 'exact'):
+        raise CommandError(f"Unknown team creation method: {args.method}")
+    matchmaker = _open_matchmaker(args)
+    _load_attendees(matchmaker, args.attendees)
+    team1, team2 = matchmaker.create_teams(args.team_size, args.iterations, args.method, seed=args.seed,
+                                           workers=args.workers, time_budget=args.time_budget)
+    return {
+        'teams': [team_json(matchmaker, team1), team_json(matchmaker, team2)],
+        'quality': matchmaker.predict_match_quality(team1, team2),
+        'search': matchmaker.last_search_stats,
+    }
+
+
+def cmd_multi_teams(args: argparse.Namespace):
+    _apply_input(args, {'attendees': None, 'team_size': 6, 'num_teams': None, 'rounds': None,
+                        'iterations': 200, 'seed': None, 'time_budget': None, 'workers': None})
+    matchmaker = _open_matchmaker(args)
+    _load_attendees(matchmaker, args.attendees)
+    teams = matchmaker.create_multiple_teams(args.team_size, args.num_teams, args.iterations,
+                                             schedule_rounds=args.rounds, workers=args.workers,
+                                             seed=args.seed, time_budget=args.time_budget)
+    result = {'teams': [team_json(matchmaker, team) for team in teams]}
+    if args.rounds:
+        result['schedule'] = matchmaker.last_schedule_stats
+    else:
+        result['matchups'] = matchmaker.last_matchup_stats
+    return result
+
+
+def game_from_json(matchmaker, game) -> tuple:
+    """(team1, team2, score1, score2) from {"team1": [names], "team2": [names], "score1", "score2"}."""
+    if not isinstance(game, dict):
+        raise CommandError("Each game must be a JSON object")
+    try:
+        team1, team2 = game['team1'], game['team2']
+        score1, score2 = int(game['score1']), int(game['score2'])
+    except KeyError as e:
+        raise CommandError(f"Game is missing {e.args[0]}")
+    except (TypeError, ValueError):
+        raise CommandError("Scores must be integers")
+    unknown = [name for name in list(team1) + list(team2) if name not in matchmaker.players]
+    if unknown:
+        raise CommandError(f"Unknown players: {', '.join(unknown)}")
+    if not team1 or not team2:
+        raise CommandError("Both teams need players")
+    return ([matchmaker.players[name] for name in team1], [matchmaker.players[name] for name in team2],
+            score1, score2)
+
+
+def cmd_record(args: argparse.Namespace):
+    if args.team1 or args.team2 or args.score:
+        if not (args.team1 and args.team2 and args.score):
+            raise CommandError("--team1, --team2 and --score are needed together")
+        games = [{'team1': args.team1, 'team2': args.team2, 'score1': args.score[0], 'score2': args.score[1]}]
+    else:
+        games = _read_input(args.input)
+        if isinstance(games, dict):
+            games = [games]
+        if not isinstance(games, list):
+            raise CommandError("Input must be a game object or a list of games")
+
+    matchmaker = _open_matchmaker(args)
+    # Check every game before any is recorded
+    results = [game_from_json(matchmaker, game) for game in games]
+    matchmaker.record_games(results)
+    players = {p.name: p for team1, team2, _, _ in results for p in team1 + team2}
+    return {
+        'recorded': len(results),
+        'players': [{'name': p.name, 'rating': p.z_score, 'sigma': p.sigma, 'games_played': p.games_played,
+                     'wins': p.wins} for p in players.values()],
+    }
+
+
+def cmd_replay(args: argparse.Namespace):
+    matchmaker = _open_matchmaker(args)
+    return {'replayed': matchmaker.replay_game_history(save=not args.dry_run)}
+
+
+def cmd_migrate(args: argparse.Namespace):
+    if not args.database:
+        raise CommandError("migrate needs --database")
+    from matchmaker import VolleyballMatchmaker
+    csv_ratings = os.path.splitext(args.games_file)[0] + '_ratings.bin'
+    matchmaker = VolleyballMatchmaker(args.players_file, args.games_file, args.attendance_file,
+                                      rating_history_file=csv_ratings)
+    target = SqliteStorage(args.database)
+    try:
+        result = migrate(matchmaker, target)
+    finally:
+        target.close()
+    # Game ids are kept, so the rating snapshots stay valid for the database
+    if args.ratings_file != csv_ratings and not os.path.exists(args.ratings_file):
+        for suffix in ('', '.names'):
+            if os.path.exists(csv_ratings + suffix):
+                shutil.copyfile(csv_ratings + suffix, args.ratings_file + suffix)
+    return result
+
+
+def cmd_snapshot(args: argparse.Namespace):
+    if args.database:
+        raise CommandError("snapshot is for the CSV files; the database needs none")
+    matchmaker = _open_matchmaker(args)
+    games = len(matchmaker.game_log)  # index the whole game file, so the snapshot carries the index
+    # Folding the journal into players.csv also writes the snapshot
+    matchmaker.save_players()
+    path = matchmaker.storage.snapshot_file
+    return {'snapshot': path, 'players': len(matchmaker.players), 'games': games,
+            'bytes': os.path.getsize(path)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Volleyball matchmaker (JSON in, JSON out)")
+    parser.add_argument('--players-file', default='players.csv')
+    parser.add_argument('--games-file', default='games.csv')
+    parser.add_argument('--attendance-file', default='attendance.csv')
+    parser.add_argument('--ratings-file', default=None,
+                        help="Rating history log (default: <games file or database>_ratings.bin)")
+    parser.add_argument('--database', default=None,
+                        help="SQLite database holding players and games instead of the CSV files")
+    subparsers = parser.add_subparsers(dest='command')
+
+    stats = subparsers.add_parser('stats', help="Player stats, without loading the league")
+    stats.add_argument('names', nargs='*')
+    stats.add_argument('--input', help="JSON list of names ('-' for stdin)")
+    stats.set_defaults(handler=cmd_stats)
+
+    search = argparse.ArgumentParser(add_help=False)
+    search.add_argument('--input', help="JSON object of options ('-' for stdin); arguments take precedence")
+    search.add_argument('--attendees', nargs='+', help="Attending players (default: the attendance file)")
+    search.add_argument('--team-size', type=int)
+    search.add_argument('--iterations', type=int)
+    search.add_argument('--seed', type=int)
+    search.add_argument('--time-budget', type=float, help="Stop searching after this many seconds")
+    search.add_argument('--workers', type=int, help="Shard the random search across worker processes")
+
+    teams = subparsers.add_parser('teams', parents=[search], help="Two balanced teams")
+    teams.add_argument('--method', choices=('random', 'anneal', 'exact'))
+    teams.set_defaults(handler=cmd_teams)
+
+    multi = subparsers.add_parser('multi-teams', parents=[search], help="Balanced teams for every attendee")
+    multi.add_argument('--num-teams', type=int)
+    multi.add_argument('--rounds', type=int, help="Schedule this many rounds instead of one set of matchups")
+    multi.set_defaults(handler=cmd_multi_teams)
+
+    record = subparsers.add_parser('record', help="Record games and update ratings")
+    record.add_argument('--input', default='-', help="JSON game or list of games (default: stdin)")
+    record.add_argument('--team1', nargs='+')
+    record.add_argument('--team2', nargs='+')
+    record.add_argument('--score', type=int, nargs=2, metavar=('SCORE1', 'SCORE2'))
+    record.set_defaults(handler=cmd_record)
+
+    replay = subparsers.add_parser('replay', help="Rebuild all ratings from the game history")
+    replay.add_argument('--dry-run', action='store_true', help="Replay without saving")
+    replay.set_defaults(handler=cmd_replay)
+
+    migrate_cmd = subparsers.add_parser('migrate', help="Copy the CSV players and games into --database")
+    migrate_cmd.set_defaults(handler=cmd_migrate)
+
+    snapshot = subparsers.add_parser('snapshot', help="Write the binary snapshot that speeds up loading the CSV league")
+    snapshot.set_defaults(handler=cmd_snapshot)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        from matchmaker import main as interactive_main
+        interactive_main()
+        return 0
+    if args.ratings_file is None:
+        args.ratings_file = os.path.splitext(args.database or args.games_file)[0] + '_ratings.bin'
+
+    try:
+        # Matchmaker progress output would corrupt the JSON on stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            result = args.handler(args)
+    except (CommandError, OSError, ValueError, sqlite3.Error) as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    print(json.dumps(result, default=json_default))
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
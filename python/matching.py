@@ -0,0 +1,624 @@
+"""
+Maximum-weight matching on general graphs (Edmonds' blossom algorithm, O(n^3)).
+
+Used to pair up teams for simultaneous courts: vertices are teams, edge weights are
+match quality scores. Follows the primal-dual formulation of Galil, "Efficient
+algorithms for finding maximum matching in graphs" (1986), in the style of Joris van
+Rantwijk's reference implementation. Weights must be integers so that dual variables
+stay exact; callers with float scores should scale and round them first.
+
+Also holds the multi-round schedulers built on top of it (circle method baseline and
+the quality-maximising schedule search).
+"""
+import random
+import time
+from typing import List, Optional, Tuple
+
+# Restarts in a row without a new best after which optimize_schedule stops searching
+SCHEDULE_STALE_RESTARTS = 8
+
+
+def max_weight_matching(edges: List[Tuple[int, int, int]], max_cardinality: bool = False) -> List[int]:
+    """
+    Compute a maximum-weight matching of an undirected graph.
+
+    Args:
+        edges: (i, j, weight) tuples with vertex ids 0..n-1, i != j and integer weights
+        max_cardinality: Only consider matchings of maximum size (perfect when possible)
+
+    Returns:
+        mate list where mate[v] is the vertex matched to v, or -1 if v is unmatched
+    """
+    if not edges:
+        return []
+
+    nedge = len(edges)
+    nvertex = 1 + max(max(i, j) for i, j, _ in edges)
+    max_weight = max(0, max(weight for _, _, weight in edges))
+
+    # Edge k has endpoints 2k and 2k+1; endpoint[p] is the vertex at endpoint p
+    endpoint = [edges[p // 2][p % 2] for p in range(2 * nedge)]
+    # neighbend[v] lists the remote endpoints of the edges incident to v
+    neighbend: List[List[int]] = [[] for _ in range(nvertex)]
+    for k, (i, j, _) in enumerate(edges):
+        neighbend[i].append(2 * k + 1)
+        neighbend[j].append(2 * k)
+
+    # mate[v] is the remote endpoint of v's matched edge, or -1
+    mate = [-1] * nvertex
+    # Blossom labels: 0 free, 1 S (outer), 2 T (inner); bit 4 marks scanBlossom breadcrumbs
+    label = [0] * (2 * nvertex)
+    labelend = [-1] * (2 * nvertex)
+    # Top-level blossom containing each vertex; vertices are trivial blossoms 0..n-1
+    inblossom = list(range(nvertex))
+    blossomparent = [-1] * (2 * nvertex)
+    blossomchilds: List = [None] * (2 * nvertex)
+    blossombase = list(range(nvertex)) + [-1] * nvertex
+    blossomendps: List = [None] * (2 * nvertex)
+    # Least-slack edge to a different S-blossom, per vertex / top-level blossom
+    bestedge = [-1] * (2 * nvertex)
+    blossombestedges: List = [None] * (2 * nvertex)
+    unusedblossoms = list(range(nvertex, 2 * nvertex))
+    # Vertex duals start at max_weight, blossom duals at zero
+    dualvar = [max_weight] * nvertex + [0] * nvertex
+    allowedge = [False] * nedge
+    queue: List[int] = []
+
+    def slack(k: int) -> int:
+        i, j, weight = edges[k]
+        return dualvar[i] + dualvar[j] - 2 * weight
+
+    def blossom_leaves(b: int):
+        if b < nvertex:
+            yield b
+        else:
+            for t in blossomchilds[b]:
+                if t < nvertex:
+                    yield t
+                else:
+                    yield from blossom_leaves(t)
+
+    def assign_label(w: int, t: int, p: int) -> None:
+        # Label vertex w (and its blossom) S or T, reached through endpoint p
+        b = inblossom[w]
+        label[w] = label[b] = t
+        labelend[w] = labelend[b] = p
+        bestedge[w] = bestedge[b] = -1
+        if t == 1:
+            queue.extend(blossom_leaves(b))
+        elif t == 2:
+            # The mate of a T-blossom's base becomes an S-vertex
+            base = blossombase[b]
+            assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    def scan_blossom(v: int, w: int) -> int:
+        # Trace back from v and w to find a new blossom's base, or -1 for an augmenting path
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inblossom[v]
+            if label[b] & 4:
+                base = blossombase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelend[b] == -1:
+                v = -1
+            else:
+                v = endpoint[labelend[b]]
+                b = inblossom[v]
+                v = endpoint[labelend[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    def add_blossom(base: int, k: int) -> None:
+        # Contract the odd cycle closed by edge k into a new S-blossom
+        v, w, _ = edges[k]
+        bb = inblossom[base]
+        bv = inblossom[v]
+        bw = inblossom[w]
+        b = unusedblossoms.pop()
+        blossombase[b] = base
+        blossomparent[b] = -1
+        blossomparent[bb] = b
+        blossomchilds[b] = path = []
+        blossomendps[b] = endps = []
+        while bv != bb:
+            blossomparent[bv] = b
+            path.append(bv)
+            endps.append(labelend[bv])
+            v = endpoint[labelend[bv]]
+            bv = inblossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        while bw != bb:
+            blossomparent[bw] = b
+            path.append(bw)
+            endps.append(labelend[bw] ^ 1)
+            w = endpoint[labelend[bw]]
+            bw = inblossom[w]
+        label[b] = 1
+        labelend[b] = labelend[bb]
+        dualvar[b] = 0
+        for v in blossom_leaves(b):
+            if label[inblossom[v]] == 2:
+                # Former T-vertices are now S-vertices and need scanning
+                queue.append(v)
+            inblossom[v] = b
+
+        # Merge the children's least-slack edges to other S-blossoms
+        bestedgeto = [-1] * (2 * nvertex)
+        for bv in path:
+            if blossombestedges[bv] is None:
+                nblists = [[p // 2 for p in neighbend[v]] for v in blossom_leaves(bv)]
+            else:
+                nblists = [blossombestedges[bv]]
+            for nblist in nblists:
+                for k in nblist:
+                    i, j, _ = edges[k]
+                    if inblossom[j] == b:
+                        i, j = j, i
+                    bj = inblossom[j]
+                    if bj != b and label[bj] == 1 and (bestedgeto[bj] == -1 or slack(k) < slack(bestedgeto[bj])):
+                        bestedgeto[bj] = k
+            blossombestedges[bv] = None
+            bestedge[bv] = -1
+        blossombestedges[b] = [k for k in bestedgeto if k != -1]
+        bestedge[b] = -1
+        for k in blossombestedges[b]:
+            if bestedge[b] == -1 or slack(k) < slack(bestedge[b]):
+                bestedge[b] = k
+
+    def expand_blossom(b: int, endstage: bool) -> None:
+        # Undo a blossom whose dual reached zero (or all zero-dual blossoms at end of stage)
+        for s in blossomchilds[b]:
+            blossomparent[s] = -1
+            if s < nvertex:
+                inblossom[s] = s
+            elif endstage and dualvar[s] == 0:
+                expand_blossom(s, endstage)
+            else:
+                for v in blossom_leaves(s):
+                    inblossom[v] = s
+
+        if not endstage and label[b] == 2:
+            # Relabel the children along the even path from the entry child to the base
+            entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+            j = blossomchilds[b].index(entrychild)
+            if j & 1:
+                # Odd start index: go forward and wrap
+                j -= len(blossomchilds[b])
+                jstep = 1
+                endptrick = 0
+            else:
+                # Even start index: go backward
+                jstep = -1
+                endptrick = 1
+            p = labelend[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomendps[b][j - endptrick] ^ endptrick ^ 1]] = 0
+                assign_label(endpoint[p ^ 1], 2, p)
+                allowedge[blossomendps[b][j - endptrick] // 2] = True
+                j += jstep
+                p = blossomendps[b][j - endptrick] ^ endptrick
+                allowedge[p // 2] = True
+                j += jstep
+            # The base child becomes a T-blossom without relabelling its mate
+            bv = blossomchilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelend[endpoint[p ^ 1]] = labelend[bv] = p
+            bestedge[bv] = -1
+            j += jstep
+            # Children off the even path get T labels only if reachable from outside
+            while blossomchilds[b][j] != entrychild:
+                bv = blossomchilds[b][j]
+                if label[bv] == 1:
+                    j += jstep
+                    continue
+                for v in blossom_leaves(bv):
+                    if label[v] != 0:
+                        break
+                if label[v] != 0:
+                    label[v] = 0
+                    label[endpoint[mate[blossombase[bv]]]] = 0
+                    assign_label(v, 2, labelend[v])
+                j += jstep
+
+        label[b] = labelend[b] = -1
+        blossomchilds[b] = blossomendps[b] = None
+        blossombase[b] = -1
+        blossombestedges[b] = None
+        bestedge[b] = -1
+        unusedblossoms.append(b)
+
+    def augment_blossom(b: int, v: int) -> None:
+        # Swap matched/unmatched edges inside blossom b so that vertex v becomes its base
+        t = v
+        while blossomparent[t] != b:
+            t = blossomparent[t]
+        if t >= nvertex:
+            augment_blossom(t, v)
+        i = j = blossomchilds[b].index(t)
+        if i & 1:
+            j -= len(blossomchilds[b])
+            jstep = 1
+            endptrick = 0
+        else:
+            jstep = -1
+            endptrick = 1
+        while j != 0:
+            j += jstep
+            t = blossomchilds[b][j]
+            p = blossomendps[b][j - endptrick] ^ endptrick
+            if t >= nvertex:
+                augment_blossom(t, endpoint[p])
+            j += jstep
+            t = blossomchilds[b][j]
+            if t >= nvertex:
+                augment_blossom(t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+        # Rotate the child list so the new base comes first
+        blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+        blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+        blossombase[b] = blossombase[blossomchilds[b][0]]
+
+    def augment_matching(k: int) -> None:
+        # Flip the augmenting path through edge k back to both exposed roots
+        v, w, _ = edges[k]
+        for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inblossom[s]
+                if bs >= nvertex:
+                    augment_blossom(bs, s)
+                mate[s] = p
+                if labelend[bs] == -1:
+                    break
+                t = endpoint[labelend[bs]]
+                bt = inblossom[t]
+                s = endpoint[labelend[bt]]
+                j = endpoint[labelend[bt] ^ 1]
+                if bt >= nvertex:
+                    augment_blossom(bt, j)
+                mate[j] = labelend[bt]
+                p = labelend[bt] ^ 1
+
+    # Each stage either augments the matching by one edge or proves it optimal
+    for _ in range(nvertex):
+        label[:] = [0] * (2 * nvertex)
+        bestedge[:] = [-1] * (2 * nvertex)
+        blossombestedges[nvertex:] = [None] * nvertex
+        allowedge[:] = [False] * nedge
+        queue[:] = []
+
+        # Exposed vertices become S-vertex roots
+        for v in range(nvertex):
+            if mate[v] == -1 and label[inblossom[v]] == 0:
+                assign_label(v, 1, -1)
+
+        augmented = False
+        while True:
+            # Grow the alternating forest along tight edges
+            while queue and not augmented:
+                v = queue.pop()
+                for p in neighbend[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    if inblossom[v] == inblossom[w]:
+                        continue
+                    if not allowedge[k]:
+                        kslack = slack(k)
+                        if kslack <= 0:
+                            allowedge[k] = True
+                    if allowedge[k]:
+                        if label[inblossom[w]] == 0:
+                            assign_label(w, 2, p ^ 1)
+                        elif label[inblossom[w]] == 1:
+                            base = scan_blossom(v, w)
+                            if base >= 0:
+                                add_blossom(base, k)
+                            else:
+                                augment_matching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            # w is inside a T-blossom but not yet reached
+                            label[w] = 2
+                            labelend[w] = p ^ 1
+                    elif label[inblossom[w]] == 1:
+                        b = inblossom[v]
+                        if bestedge[b] == -1 or kslack < slack(bestedge[b]):
+                            bestedge[b] = k
+                    elif label[w] == 0:
+                        if bestedge[w] == -1 or kslack < slack(bestedge[w]):
+                            bestedge[w] = k
+
+            if augmented:
+                break
+
+            # No tight edge left: pick the smallest dual adjustment
+            deltatype = -1
+            delta = deltaedge = deltablossom = None
+            if not max_cardinality:
+                # Type 1: an S-vertex dual reaches zero
+                deltatype = 1
+                delta = min(dualvar[:nvertex])
+            for v in range(nvertex):
+                # Type 2: an edge from a free vertex to an S-vertex becomes tight
+                if label[inblossom[v]] == 0 and bestedge[v] != -1:
+                    d = slack(bestedge[v])
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 2
+                        deltaedge = bestedge[v]
+            for b in range(2 * nvertex):
+                # Type 3: an edge between two S-blossoms becomes tight (slack is even)
+                if blossomparent[b] == -1 and label[b] == 1 and bestedge[b] != -1:
+                    d = slack(bestedge[b]) // 2
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 3
+                        deltaedge = bestedge[b]
+            for b in range(nvertex, 2 * nvertex):
+                # Type 4: a T-blossom dual reaches zero and it must be expanded
+                if (blossombase[b] >= 0 and blossomparent[b] == -1 and label[b] == 2
+                        and (deltatype == -1 or dualvar[b] < delta)):
+                    delta = dualvar[b]
+                    deltatype = 4
+                    deltablossom = b
+            if deltatype == -1:
+                # Max cardinality reached; finish with a final dual adjustment
+                deltatype = 1
+                delta = max(0, min(dualvar[:nvertex]))
+
+            for v in range(nvertex):
+                if label[inblossom[v]] == 1:
+                    dualvar[v] -= delta
+                elif label[inblossom[v]] == 2:
+                    dualvar[v] += delta
+            for b in range(nvertex, 2 * nvertex):
+                if blossombase[b] >= 0 and blossomparent[b] == -1:
+                    if label[b] == 1:
+                        dualvar[b] += delta
+                    elif label[b] == 2:
+                        dualvar[b] -= delta
+
+            if deltatype == 1:
+                # Optimum reached
+                break
+            elif deltatype == 2:
+                allowedge[deltaedge] = True
+                i, j, _ = edges[deltaedge]
+                if label[inblossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltatype == 3:
+                allowedge[deltaedge] = True
+                i, j, _ = edges[deltaedge]
+                queue.append(i)
+            elif deltatype == 4:
+                expand_blossom(deltablossom, False)
+
+        if not augmented:
+            break
+
+        # End of stage: expand S-blossoms whose dual dropped to zero
+        for b in range(nvertex, 2 * nvertex):
+            if blossomparent[b] == -1 and blossombase[b] >= 0 and label[b] == 1 and dualvar[b] == 0:
+                expand_blossom(b, True)
+
+    # Convert remote endpoints to vertex ids
+    return [endpoint[p] if p >= 0 else -1 for p in mate]
+
+
+def greedy_matching(weights: List[List[float]]) -> List[Tuple[int, int]]:
+    """
+    Pair vertices by repeatedly taking the heaviest edge between two unused vertices.
+
+    Args:
+        weights: Symmetric n x n weight matrix (diagonal ignored)
+
+    Returns:
+        List of (i, j) pairs with i < j, in the order they were chosen
+    """
+    n = len(weights)
+    candidates = sorted(((weights[i][j], i, j) for i in range(n) for j in range(i + 1, n)),
+                        key=lambda x: x[0], reverse=True)
+    used = set()
+    pairs = []
+    for _, i, j in candidates:
+        if i not in used and j not in used:
+            pairs.append((i, j))
+            used.add(i)
+            used.add(j)
+            if len(used) >= n - (n % 2):
+                break
+    return pairs
+
+
+def optimal_pairing(weights: List[List[float]], scale: float = 1e6) -> List[Tuple[int, int]]:
+    """
+    Pair vertices to maximise the total weight, leaving one out when n is odd.
+
+    Float weights are scaled and rounded to integers for the exact solver. With an odd
+    count a dummy vertex joined to everyone by zero-weight edges takes the bye, so the
+    vertex left out is the one whose absence gives the best total.
+
+    Args:
+        weights: Symmetric n x n weight matrix (diagonal ignored)
+        scale: Multiplier applied before rounding weights to integers
+
+    Returns:
+        List of (i, j) pairs with i < j, sorted by i
+    """
+    n = len(weights)
+    if n < 2:
+        return []
+    edges = [(i, j, round(weights[i][j] * scale)) for i in range(n) for j in range(i + 1, n)]
+    if n % 2:
+        edges.extend((i, n, 0) for i in range(n))
+    mate = max_weight_matching(edges, max_cardinality=True)
+    return [(i, mate[i]) for i in range(n) if i < mate[i] < n]
+
+
+def circle_schedule(n: int, num_rounds: int) -> List[List[Tuple[int, int]]]:
+    """
+    Round-robin rounds from the circle method: vertex 0 stays fixed and the rest rotate.
+
+    Args:
+        n: Number of teams (an odd count gets a dummy bye slot)
+        num_rounds: Number of rounds to generate (capped at the number of distinct rounds)
+
+    Returns:
+        List of rounds of (i, j) pairs with i < j; byes are left out
+    """
+    slots = list(range(n + n % 2))
+    rounds = []
+    for round_num in range(min(num_rounds, len(slots) - 1)):
+        if round_num > 0:
+            slots = [slots[0]] + [slots[-1]] + slots[1:-1]
+        pairs = []
+        for i in range(len(slots) // 2):
+            a, b = sorted((slots[i], slots[len(slots) - 1 - i]))
+            if b < n:
+                pairs.append((a, b))
+        rounds.append(pairs)
+    return rounds
+
+
+def schedule_score(weights: List[List[float]], schedule: List[List[Tuple[int, int]]],
+                   objective: str = 'min') -> Tuple[float, float]:
+    """
+    Score a schedule for comparison; higher is better.
+
+    Returns:
+        (worst match, total) for objective 'min', (total, worst match) for 'sum'
+    """
+    scores = [weights[i][j] for pairs in schedule for i, j in pairs]
+    if not scores:
+        return 0.0, 0.0
+    worst, total = min(scores), sum(scores)
+    return (worst, total) if objective == 'min' else (total, worst)
+
+
+def _greedy_rounds(weights: List[List[float]], num_rounds: int) -> Optional[List[List[Tuple[int, int]]]]:
+    """Build rounds one at a time as exact max-weight matchings over the unused pairs, or None if stuck."""
+    n = len(weights)
+    used = set()
+    rounds = []
+    for _ in range(num_rounds):
+        edges = [(i, j, round(weights[i][j] * 1e6)) for i in range(n) for j in range(i + 1, n) if (i, j) not in used]
+        if n % 2:
+            edges.extend((i, n, 0) for i in range(n) if (i, n) not in used)
+        mate = max_weight_matching(edges, max_cardinality=True)
+        pairs = [(i, mate[i]) for i in range(len(mate)) if i < mate[i]]
+        if len(pairs) < (n + 1) // 2:
+            return None
+        used.update(pairs)
+        rounds.append([(i, j) for i, j in pairs if j < n])
+    return rounds
+
+
+def optimize_schedule(weights: List[List[float]], num_rounds: int, objective: str = 'min',
+                      time_budget: float = 0.5, seed: Optional[int] = None,
+                      trace: Optional[list] = None,
+                      stale_restarts: int = SCHEDULE_STALE_RESTARTS) -> List[List[Tuple[int, int]]]:
+    """
+    Search for a no-repeat multi-round schedule with the best match qualities.
+
+    Candidates are relabelled circle-method round robins (any permutation of teams onto
+    circle positions is a valid 1-factorization) improved by random label swaps, plus a
+    greedy construction taking the best remaining matching each round. From a full
+    round robin the num_rounds best rounds are kept. Rounds come back best first, which
+    is all that changes when every round is played.
+
+    The search stops once stale_restarts restarts in a row have not found a better
+    schedule, or when time_budget runs out, whichever comes first.
+
+    Args:
+        weights: Symmetric n x n match quality matrix
+        num_rounds: Rounds to schedule (capped at the maximum without repeats)
+        objective: 'min' to maximise the worst match (ties on total) or 'sum' for the total
+        time_budget: Most seconds to spend on the label-swap search
+        seed: Optional seed for a reproducible search
+        trace: If given, (candidates scored, best objective value) is appended for the
+               first candidate and every improvement
+        stale_restarts: Restarts without a new best after which the search stops
+
+    Returns:
+        List of rounds of (i, j) pairs with i < j
+    """
+    if objective not in ('min', 'sum'):
+        raise ValueError(f"Unknown schedule objective: {objective}")
+    n = len(weights)
+    slot_rounds = circle_schedule(n, n)
+    num_rounds = min(num_rounds, len(slot_rounds))
+    if n < 2 or num_rounds <= 0:
+        return []
+    rng = random.Random(seed)
+
+    def round_key(pairs):
+        scores = [weights[i][j] for i, j in pairs]
+        return (min(scores), sum(scores)) if objective == 'min' else (sum(scores), min(scores))
+
+    def relabel(labels):
+        # Map circle positions to teams, keep the best rounds and score them
+        rounds = [[tuple(sorted((labels[a], labels[b]))) for a, b in pairs] for pairs in slot_rounds]
+        rounds.sort(key=round_key, reverse=True)
+        chosen = rounds[:num_rounds]
+        return schedule_score(weights, chosen, objective), chosen
+
+    labels = list(range(n))
+    best_score, best = relabel(labels)
+    current_score = best_score
+    evaluations = 1
+    if trace is not None:
+        trace.append((evaluations, best_score[0]))
+    if num_rounds == len(slot_rounds):
+        # A full round robin plays every pair once, so the score is fixed; only the order matters
+        return best
+
+    greedy = _greedy_rounds(weights, num_rounds)
+    if greedy is not None:
+        greedy.sort(key=round_key, reverse=True)
+        greedy_score = schedule_score(weights, greedy, objective)
+        evaluations += 1
+        if greedy_score > best_score:
+            best_score, best = greedy_score, greedy
+            if trace is not None:
+                trace.append((evaluations, best_score[0]))
+
+    # Hill-climb on label swaps, restarting from a random labelling when stuck
+    deadline = time.perf_counter() + time_budget
+    stale = 0
+    restarts_since_best = 0
+    while n > 2 and restarts_since_best < stale_restarts and time.perf_counter() < deadline:
+        i, j = rng.sample(range(n), 2)
+        labels[i], labels[j] = labels[j], labels[i]
+        score, rounds = relabel(labels)
+        evaluations += 1
+        if score >= current_score:
+            stale = 0 if score > current_score else stale + 1
+            current_score = score
+            if score > best_score:
+                best_score, best = score, rounds
+                restarts_since_best = 0
+                if trace is not None:
+                    trace.append((evaluations, best_score[0]))
+        else:
+            labels[i], labels[j] = labels[j], labels[i]
+            stale += 1
+        if stale > 20 * n:
+            rng.shuffle(labels)
+            current_score, _ = relabel(labels)
+            evaluations += 1
+            stale = 0
+            restarts_since_best += 1
+
+    return best
@@ -1,22 +1,155 @@
 import csv
+import os
 import random
 import numpy as np
-from typing import List, Dict, Tuple, Optional, Set
+from typing import Callable, List, Dict, Tuple, Optional, Set
 from datetime import datetime, date, timedelta
 import math
 import itertools
+import functools
+import gc
+import operator
+import time
+import warnings
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import MutableMapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from matching import circle_schedule, greedy_matching, optimal_pairing, optimize_schedule, schedule_score
+from history import best_teammates, current_streak, head_to_head, player_stats, recent_games
+from metrics import Metrics, phase, timed_phase
+from snapshot import read_snapshot, write_snapshot
+from storage import (COUNT_FIELDS, CsvStorage, chemistry_loader, parse_chemistry, parse_count, parse_date,
+                     parse_rating)
+
+def _table_field(field: str, doc: str) -> property:
+    """Property reading and writing one PlayerTable array at the view's row."""
+    column = operator.attrgetter(field)
+
+    def get(self):
+        return column(self.table).item(self.row)
+
+    def set(self, value):
+        column(self.table)[self.row] = value
+
+    return property(get, set, doc=doc)
+
+
+# Base rating of each skill group letter (unknown groups rate as C)
+SKILL_GROUP_RATINGS = {
+    'A': 160.0,
+    'B': 120.0,
+    'C': 100.0,
+    'D': 80.0,
+    'E': 40.0,
+    'F': 0.0
+}
+
+
+# Rating and chemistry math of one game, shared by record_game and replay_game_history
+
+def blend_rating(skill_rating: float, z_score: float, games_played: int) -> float:
+    """
+    Blend a skill group rating with a computed rating.
+    - With 0 games: 100% skill group based
+    - With 30+ games: 20% skill group based (maintains some influence)
+    """
+    # Skill group weight decreases linearly with more games, from 100% to 20% after 30 games
+    skill_weight = max(0.2, min(1.0, 1.0 - (games_played * 0.8 / 30)))
+    return skill_weight * skill_rating + (1 - skill_weight) * z_score
+
+
+def game_rating_updates(team1_ratings: List[float], team1_sigmas: List[float],
+                        team2_ratings: List[float], team2_sigmas: List[float],
+                        team1_won: bool, score1: int, score2: int,
+                        beta: float, dynamic_factor: float) -> Tuple[float, float, float, float]:
+    """
+    Team-level rating changes for one game, TrueSkill-inspired.
+
+    Args:
+        team1_ratings, team2_ratings: Weighted ratings of each team's players
+        team1_sigmas, team2_sigmas: Uncertainties of each team's players
+        team1_won: Whether team 1 won
+        score1, score2: Final score
+        beta, dynamic_factor: The matchmaker's rating parameters
+
+    Returns:
+        Tuple of (team1 skill, team2 skill, team1 update, team2 update); each player then
+        moves as player_rating_update says
+    """
+    # Team skills from weighted ratings
+    team1_skill = sum(team1_ratings) / len(team1_ratings)
+    team2_skill = sum(team2_ratings) / len(team2_ratings)
+
+    # Team uncertainties
+    team1_uncertainty = math.sqrt(sum(sigma ** 2 for sigma in team1_sigmas)) / len(team1_sigmas)
+    team2_uncertainty = math.sqrt(sum(sigma ** 2 for sigma in team2_sigmas)) / len(team2_sigmas)
+
+    # Performance based on actual outcome and score difference
+    score_diff = abs(score1 - score2)
+    perf_diff = score_diff * (1 if team1_won else -1)
+
+    # Surprise factor - how unexpected was the outcome given the expected difference
+    expected_diff = team1_skill - team2_skill
+    surprise = perf_diff - expected_diff / beta
+
+    # Dynamic adjustment factor - higher for:
+    # 1. Close games (small score_diff)
+    # 2. Unexpected outcomes (high surprise)
+    # 3. High confidence/low uncertainty (small team_uncertainty)
+    adjustment = dynamic_factor * (1.0 / (1.0 + 0.1 * score_diff)) * (1.0 + abs(surprise) / 10.0)
+
+    # Scale by uncertainty - more certain ratings change less
+    total_uncertainty = team1_uncertainty + team2_uncertainty
+    adjustment *= min(1, total_uncertainty / 100)
+
+    # Teams with fewer players get larger individual adjustments
+    team1_update = adjustment * surprise / len(team1_ratings)
+    team2_update = -adjustment * surprise / len(team2_ratings)
+    return team1_skill, team2_skill, team1_update, team2_update
+
+
+def player_rating_update(z_score: float, sigma: float, team_skill: float, team_update: float,
+                         uncertainty_factor: float) -> Tuple[float, float]:
+    """A player's (z_score, sigma) after a game, given their team's skill and update."""
+    # Players further from team average get adjusted more (regression to mean)
+    skill_diff = z_score - team_skill
+    individual_update = team_update - uncertainty_factor * (skill_diff / 100)
+    # Uncertainty decreases with more games, but never below the minimum
+    return z_score + individual_update, max(25, sigma * 0.95)
+
+
+def chemistry_boost(won: bool) -> int:
+    """Chemistry change between teammates for a won or lost game."""
+    return 5 if won else -2
+
+
+def boosted_chemistry(score: float, boost: float) -> float:
+    """Chemistry after one more game together: diminishing returns on the old score, plus the boost."""
+    return score * 0.95 + boost
+
 
 class Player:
+    """A view onto one row of a PlayerTable (the matchmaker's shared table, or a private one)."""
+
+    __slots__ = ('table', 'row', 'chemistry_matrix', 'index')
+
     def __init__(self, name: str, skill_group: str, z_score: float = 100.0, 
-                sigma: float = 100.0, last_played: Optional[date] = None):
-        self.name = name
+                sigma: float = 100.0, last_played: Optional[date] = None,
+                chemistry_matrix: Optional['ChemistryMatrix'] = None,
+                table: Optional['PlayerTable'] = None):
+        # Stats live in the table's arrays
+        self.table = table if table is not None else PlayerTable(capacity=4)
+        self.row = self.table.add(name)
         self.skill_group = skill_group  # A-F where A is best
         self.z_score = z_score  # TrueSkill rating (mu)
         self.sigma = sigma      # Uncertainty/confidence interval
         self.last_played = last_played or date.today()
         
-        # Player chemistry tracking
-        self.chemistry: Dict[str, float] = {}  # player_name -> chemistry score
+        # Player chemistry tracking (shared matrix owned by the matchmaker)
+        self.chemistry_matrix = chemistry_matrix if chemistry_matrix is not None else ChemistryMatrix()
+        self.index = self.chemistry_matrix.add(name)
         
         # Historical performance
         self.games_played = 0
@@ -27,22 +160,101 @@ class Player:
         # Calculate skill group base rating
         self.skill_group_rating = self._get_skill_group_base_rating()
 
+    @classmethod
+    def view(cls, table: 'PlayerTable', row: int, chemistry_matrix: 'ChemistryMatrix', index: int) -> 'Player':
+        """A Player over an existing table row and chemistry index, leaving the stats as they are."""
+        player = cls.__new__(cls)
+        player.table = table
+        player.row = row
+        player.chemistry_matrix = chemistry_matrix
+        player.index = index
+        return player
+
+    z_score = _table_field('z_score', "TrueSkill rating (mu)")
+    sigma = _table_field('sigma', "Uncertainty/confidence interval")
+    skill_group_rating = _table_field('skill_rating', "Base rating of the skill group")
+    games_played = _table_field('games_played', "Games played")
+    wins = _table_field('wins', "Games won")
+    points_scored = _table_field('points_scored', "Team points when player is on team")
+    points_allowed = _table_field('points_allowed', "Opponent points when player is on team")
+
+    @property
+    def name(self) -> str:
+        return self.table.names[self.row]
+
+    @property
+    def id(self) -> int:
+        """
+        Integer id of the player's name (see NameRegistry): its chemistry matrix index and,
+        when the table shares the matrix's registry as the matchmaker's does, its row.
+        """
+        return self.index
+
+    @property
+    def skill_group(self) -> str:
+        """Skill group letter, A-F where A is best."""
+        return self.table.group_names[self.table.skill_group.item(self.row)]
+
+    @skill_group.setter
+    def skill_group(self, group: str) -> None:
+        self.table.skill_group[self.row] = self.table.group_code(group)
+
+    @property
+    def last_played(self) -> date:
+        return date.fromordinal(self.table.last_played.item(self.row))
+
+    @last_played.setter
+    def last_played(self, day: date) -> None:
+        self.table.last_played[self.row] = day.toordinal()
+
+    @property
+    def chemistry(self) -> 'PlayerChemistry':
+        """Chemistry with other players (player_name -> chemistry score)."""
+        return self.chemistry_matrix.row(self.index)
+
+    @chemistry.setter
+    def chemistry(self, scores: Dict[str, float]) -> None:
+        row = self.chemistry_matrix.row(self.index)
+        row.clear()
+        row.update(scores)
+
     def _get_skill_group_base_rating(self) -> float:
         """Convert letter skill group to a base rating value."""
-        skill_map = {
-            'A': 160.0,
-            'B': 120.0,
-            'C': 100.0,
-            'D': 80.0,
-            'E': 40.0,
-            'F': 0.0
-        }
-        return skill_map.get(self.skill_group, 100.0)
+        return SKILL_GROUP_RATINGS.get(self.skill_group, 100.0)
 
-    def effective_rating(self) -> float:
-        """Conservative rating estimate (rating - 2*sigma)"""
-        return self.z_score - 2 * self.sigma
+    def decayed_rating(self, on: Optional[date] = None) -> Tuple[float, float]:
+        """
+        Rating and uncertainty after inactivity decay, without changing the player.
+        
+        Decay is measured from last_played, which acts as the decay anchor: after
+        more than 30 idle days the rating drifts toward the mean (up to 25%) and
+        sigma grows with the length of the gap.
+        
+        Args:
+            on: Date to evaluate decay at (default today)
+            
+        Returns:
+            Tuple of (z_score, sigma)
+        """
+        days_inactive = ((on or date.today()) - self.last_played).days
+        if days_inactive <= 30:  # Active within the last month
+            return self.z_score, self.sigma
+        
+        # Decay rate increases with inactivity, toward the mean rating
+        decay_factor = min(days_inactive / 200, 0.25)  # Max 25% decay
+        mean_rating = 100.0
+        z_score = self.z_score * (1 - decay_factor) + mean_rating * decay_factor
+        
+        # Increase uncertainty
+        sigma = min(self.sigma + days_inactive / 30 * 10, 150)
+        return z_score, sigma
     
+    def apply_decay(self, on: Optional[date] = None) -> None:
+        """Fold inactivity decay into the stored rating and move the decay anchor to `on`."""
+        on = on or date.today()
+        self.z_score, self.sigma = self.decayed_rating(on)
+        self.last_played = on
+
     def rating_range(self) -> Tuple[float, float]:
         """Returns 95% confidence interval of player rating"""
         return (self.z_score - 2 * self.sigma, self.z_score + 2 * self.sigma)
@@ -53,13 +265,8 @@ class Player:
         - With 0 games: 100% skill group based
         - With 30+ games: 20% skill group based (maintains some influence)
         """
-        # Calculate skill group weight (decreases linearly with more games)
-        # Starts at 100%, reduces to 20% after 30 games
-        skill_weight = max(0.2, min(1.0, 1.0 - (self.games_played * 0.8 / 30)))
-        
-        # Blend the ratings
-        return (skill_weight * self.skill_group_rating + 
-                (1 - skill_weight) * self.z_score)
+        table, row = self.table, self.row
+        return blend_rating(table.skill_rating.item(row), table.z_score.item(row), table.games_played.item(row))
     
 
     def effective_rating(self) -> float:
@@ -78,226 +285,1363 @@ class Player:
             # At 30+ games, we maintain 20% skill group influence
             weighted = self.weighted_rating()
             return f"{self.name} ({self.skill_group}, {self.z_score:.1f}±{self.sigma:.1f}, w:{weighted:.1f}, 20%sg, {self.games_played}g)"
-    
+
+
+class PlayerChemistry(MutableMapping):
+    """Dict-like view of one player's row in a ChemistryMatrix (teammate name -> chemistry score)."""
+
+    __slots__ = ('_matrix', '_index')
+
+    def __init__(self, matrix: 'ChemistryMatrix', index: int):
+        self._matrix = matrix
+        self._index = index
+
+    def _row(self) -> Dict[int, float]:
+        return self._matrix.rows.get(self._index, {})
+
+    def _other(self, name: str) -> int:
+        other = self._matrix.index.get(name)
+        if other is None or other not in self._row():
+            raise KeyError(name)
+        return other
+
+    def __getitem__(self, name: str) -> float:
+        return self._row()[self._other(name)]
+
+    def __setitem__(self, name: str, score: float) -> None:
+        self._matrix.set(self._index, self._matrix.add(name), float(score))
+
+    def __delitem__(self, name: str) -> None:
+        del self._matrix.rows[self._index][self._other(name)]
+
+    def __iter__(self):
+        names = self._matrix.names
+        return (names[j] for j in list(self._row()))
+
+    def __len__(self) -> int:
+        return len(self._row())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class NameRegistry:
+    """
+    Stable integer ids for player names, assigned in first-seen order.
+
+    The matchmaker keys its internal state (chemistry, pair performances, changed
+    players) on these ids and turns them back into names only when reading or writing
+    files and when reporting.
+    """
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}  # player_name -> id
+        self.names: List[str] = []       # id -> player_name
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str) -> int:
+        """Id for a player name, assigning the next one if it is new."""
+        idx = self.index.get(name)
+        if idx is None:
+            idx = self.index[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def add_many(self, names: List[str]) -> List[int]:
+        """Ids for many names at once (new names are assigned in order)."""
+        start = len(self.names)
+        new = list(dict.fromkeys(names if not self.index else (name for name in names if name not in self.index)))
+        self.index.update(zip(new, range(start, start + len(new))))
+        self.names.extend(new)
+        if new == names:
+            return list(range(start, start + len(new)))
+        return list(map(self.index.__getitem__, names))
+
+
+class ChemistryMatrix:
+    """
+    Pairwise player chemistry as sparse rows: one dict per player, not a dense matrix.
+
+    Players are the ids of a NameRegistry (shared with the matchmaker); rows[i][j] is
+    player i's chemistry with player j, present once that pair has a score (the
+    equivalent of the name being present in the old per-player dict). Memory grows with
+    the number of teammate pairs rather than the square of the roster.
+
+    Only submatrix() is dense: it builds the values/known block for the players in play,
+    which the team searches vectorize over. Per-team operations (team_score,
+    update_team) walk the team's pairs in the rows, a few dozen dict lookups for a team.
+
+    Chemistry from storage can be queued with defer(); the first access to rows (or a
+    call to load()) runs the queued loaders, so loading a roster does not pay for
+    chemistry parsing.
+    """
+
+    def __init__(self, registry: Optional[NameRegistry] = None):
+        self.registry = registry if registry is not None else NameRegistry()
+        self.index = self.registry.index  # player_name -> id
+        self.names = self.registry.names  # id -> player_name
+        self._rows: Dict[int, Dict[int, float]] = {}
+        self.metrics: Optional[Metrics] = None  # counts pair lookups when set
+        self._deferred: List[Callable[['ChemistryMatrix'], None]] = []  # loaders waiting to fill the matrix
+        self._loading = False
+
+    @property
+    def rows(self) -> Dict[int, Dict[int, float]]:
+        """Player id -> {teammate id: chemistry score}, for players with any chemistry."""
+        if self._deferred and not self._loading:
+            self.load()
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str) -> int:
+        """Return the id for a player name, assigning a new one if needed."""
+        return self.registry.add(name)
+
+    def add_many(self, names: List[str]) -> List[int]:
+        """Ids for many names at once."""
+        return self.registry.add_many(names)
+
+    def defer(self, loader: Callable[['ChemistryMatrix'], None]) -> None:
+        """Queue loader(matrix) to fill in chemistry on first use of the matrix."""
+        self._deferred.append(loader)
+
+    def load(self) -> None:
+        """
+        Run any deferred chemistry loaders now rather than on first use.
+
+        Each loader leaves the queue only once it has run, so if one fails the next
+        access retries from that loader instead of finding the chemistry half loaded.
+        """
+        if self._loading:
+            return  # a loader is reading the rows it is filling
+        self._loading = True
+        try:
+            while self._deferred:
+                self._deferred[0](self)
+                del self._deferred[0]
+        finally:
+            self._loading = False
+
+    def row(self, idx: int) -> PlayerChemistry:
+        """Dict-like view of one player's chemistry."""
+        return PlayerChemistry(self, idx)
+
+    def get(self, i: int, j: int) -> Optional[float]:
+        """Player i's chemistry with player j, or None if the pair has no score."""
+        row = self.rows.get(i)
+        return None if row is None else row.get(j)
+
+    def set(self, i: int, j: int, score: float) -> None:
+        """Set player i's chemistry with player j."""
+        row = self.rows.get(i)
+        if row is None:
+            row = self._rows[i] = {}
+        row[j] = score
+
+    def entries(self):
+        """Yield (player id, teammate id, score) for every recorded score."""
+        for i, row in self.rows.items():
+            for j, score in row.items():
+                yield i, j, score
+
+    def submatrix(self, indices: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Dense chemistry values and known mask between the given players, in the given order."""
+        size = len(indices)
+        if self.metrics is not None:
+            self.metrics.count('chemistry_pair_lookups', size * (size - 1) // 2)
+        position = {idx: k for k, idx in enumerate(indices)}
+        first, second, scores = [], [], []
+        rows = self.rows
+        for k, idx in enumerate(indices):
+            row = rows.get(idx)
+            if not row:
+                continue
+            if len(row) <= size:
+                # Walk the player's own teammates ...
+                for other, score in row.items():
+                    m = position.get(other)
+                    if m is not None:
+                        first.append(k)
+                        second.append(m)
+                        scores.append(score)
+            else:
+                # ... or the players asked for, whichever is shorter
+                for m, other in enumerate(indices):
+                    score = row.get(other)
+                    if score is not None:
+                        first.append(k)
+                        second.append(m)
+                        scores.append(score)
+        values = np.zeros((size, size))
+        known = np.zeros((size, size), dtype=bool)
+        values[first, second] = scores
+        known[first, second] = True
+        return values, known
+
+    def team_score(self, indices: List[int]) -> float:
+        """Average chemistry over teammate pairs (i before j in team order) that have a score, pair by pair."""
+        if len(indices) <= 1:
+            return 0
+        if self.metrics is not None:
+            self.metrics.count('chemistry_pair_lookups', len(indices) * (len(indices) - 1) // 2)
+
+        total_chemistry = 0.0
+        pair_count = 0
+        rows = self.rows
+        for k, i in enumerate(indices):
+            row = rows.get(i)
+            if row:
+                for j in indices[k + 1:]:
+                    score = row.get(j)
+                    if score is not None:
+                        total_chemistry += score
+                        pair_count += 1
+        return total_chemistry / max(1, pair_count)
+
+    def update_team(self, indices: List[int], boost: float) -> None:
+        """Decay and boost chemistry between every pair of teammates (both directions), pair by pair."""
+        rows = self.rows
+        for i in indices:
+            row = rows.get(i)
+            if row is None:
+                row = rows[i] = {}
+            for j in indices:
+                if j != i:
+                    row[j] = boosted_chemistry(row.get(j, 0.0), boost)
+
+    def load_field(self, idx: int, field: str) -> None:
+        """Load a player's chemistry from the players.csv 'Name:score;...' column."""
+        parse_chemistry(field, self.row(idx))
+
+    def load_scores(self, scores) -> None:
+        """Set (player name, teammate name, score) entries in bulk, adding unknown names."""
+        add = self.add
+        for name, teammate, score in scores:
+            self.set(add(name), add(teammate), score)
+
+    def load_arrays(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> None:
+        """Set entries from parallel arrays of player ids, teammate ids and scores."""
+        if not len(rows):
+            return
+        # Runs of the same player become one dict update each
+        starts = np.flatnonzero(np.diff(rows)) + 1
+        bounds = zip([0] + starts.tolist(), starts.tolist() + [len(rows)])
+        cols, values = cols.tolist(), values.tolist()
+        matrix_rows = self.rows
+        for idx, (start, end) in zip(rows[np.r_[0, starts]].tolist(), bounds):
+            row = matrix_rows.get(idx)
+            if row is None:
+                row = matrix_rows[idx] = {}
+            row.update(zip(cols[start:end], values[start:end]))
+
+    def format_field(self, idx: int) -> str:
+        """Format a player's chemistry for the players.csv 'Name:score;...' column."""
+        names = self.names
+        return ';'.join([f"{names[j]}:{score}" for j, score in self.rows.get(idx, {}).items()])
+
+
+class PlayerTable:
+    """
+    Struct-of-arrays storage for player stats, one row per player id.
+
+    Rows are the ids of a NameRegistry, shared with the chemistry matrix in the
+    matchmaker, so a player's row is its id. Ids of names that only appear as
+    teammates have a row of zeros. Player objects are lightweight views onto a row,
+    so whole-roster rating passes can run as NumPy expressions
+    (weighted_ratings/effective_ratings) instead of Python loops. Skill groups are
+    stored as codes into group_names.
+    """
+
+    # Per-row arrays and their dtypes; last_played holds date ordinals
+    FIELDS = {
+        'skill_group': np.int16,
+        'skill_rating': np.float64,
+        'z_score': np.float64,
+        'sigma': np.float64,
+        'last_played': np.int32,
+        'games_played': np.int64,
+        'wins': np.int64,
+        'points_scored': np.int64,
+        'points_allowed': np.int64,
+    }
+
+    def __init__(self, capacity: int = 64, registry: Optional[NameRegistry] = None):
+        self.registry = registry if registry is not None else NameRegistry()
+        self.index = self.registry.index  # player_name -> row (id)
+        self.names = self.registry.names  # row (id) -> player_name
+        self.size = 0  # rows in use: one past the highest row added through the table
+        self.group_names: List[str] = []
+        self.group_index: Dict[str, int] = {}
+        for field, dtype in self.FIELDS.items():
+            setattr(self, field, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, name: str) -> int:
+        """Row for a player name, adding (and growing the arrays) if it is new."""
+        row = self.registry.add(name)
+        if row >= self.size:
+            self._reserve(row + 1)
+            self.size = row + 1
+        return row
+
+    def add_many(self, names: List[str]) -> np.ndarray:
+        """Rows for many names at once (new names are appended), growing the arrays at most once."""
+        rows = np.array(self.registry.add_many(names), dtype=np.int64)
+        if len(rows):
+            size = int(rows.max()) + 1
+            if size > self.size:
+                self._reserve(size)
+                self.size = size
+        return rows
+
+    def _reserve(self, size: int) -> None:
+        """Grow the arrays by doubling until size rows fit."""
+        capacity = len(self.z_score)
+        if size <= capacity:
+            return
+        capacity = max(4, capacity)
+        while capacity < size:
+            capacity *= 2
+        for field in self.FIELDS:
+            old = getattr(self, field)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, field, grown)
+
+    def group_code(self, group: str) -> int:
+        """Code for a skill group name, registering it if new."""
+        code = self.group_index.get(group)
+        if code is None:
+            code = len(self.group_names)
+            self.group_index[group] = code
+            self.group_names.append(group)
+        return code
+
+    def _rows(self, rows) -> slice:
+        return slice(0, self.size) if rows is None else rows
+
+    def weighted_ratings(self, rows=None) -> np.ndarray:
+        """Player.weighted_rating for every row (or the given rows) at once."""
+        rows = self._rows(rows)
+        skill_weight = np.clip(1.0 - (self.games_played[rows] * 0.8 / 30), 0.2, 1.0)
+        return skill_weight * self.skill_rating[rows] + (1 - skill_weight) * self.z_score[rows]
+
+    def effective_ratings(self, rows=None) -> np.ndarray:
+        """Player.effective_rating (weighted rating - 2*sigma) for every row (or the given rows)."""
+        return self.weighted_ratings(rows) - 2 * self.sigma[self._rows(rows)]
+
+
+class Team(Sequence):
+    """
+    A team of players with running sums of weighted rating, sigma, sigma squared and chemistry.
+
+    Sums are snapshots of the members' stats when they were added, so add/remove/swap cost
+    O(team size) for the chemistry pairs and O(1) otherwise. version records the owner's
+    rating version at that point; refresh() recomputes the sums once ratings have moved.
+    Chemistry follows ChemistryMatrix.team_score: pair (i, j) with i before j in team order.
+    """
+
+    __slots__ = ('players', 'chemistry_matrix', 'version', 'rating_sum', 'sigma_sum',
+                 'sigma_sq_sum', 'chemistry_sum', 'chemistry_pairs')
+
+    def __init__(self, chemistry_matrix: ChemistryMatrix, players=(), version: int = 0):
+        self.chemistry_matrix = chemistry_matrix
+        self.players: List[Player] = []
+        self.refresh(version, players)
+
+    def refresh(self, version: int, players=None) -> None:
+        """Recompute all sums from the members' current stats (optionally replacing the members)."""
+        members = list(self.players if players is None else players)
+        self.players = []
+        self.version = version
+        self.rating_sum = 0.0
+        self.sigma_sum = 0.0
+        self.sigma_sq_sum = 0.0
+        self.chemistry_sum = 0.0
+        self.chemistry_pairs = 0
+        for player in members:
+            self.add(player)
+
+    def _chemistry_with(self, player: Player, position: int, sign: int) -> None:
+        # Add (sign=1) or remove (sign=-1) the chemistry pairs between player at position and the rest
+        rows = self.chemistry_matrix.rows
+        metrics = self.chemistry_matrix.metrics
+        if metrics is not None:
+            # One lookup per other member (the player may already sit at position)
+            metrics.count('chemistry_pair_lookups', len(self.players) - (position < len(self.players)))
+        idx = player.index
+        own = rows.get(idx, {})
+        for k, other in enumerate(self.players):
+            if k == position:
+                continue
+            score = rows.get(other.index, {}).get(idx) if k < position else own.get(other.index)
+            if score is not None:
+                self.chemistry_sum += sign * score
+                self.chemistry_pairs += sign
+
+    def _stats(self, player: Player, sign: int) -> None:
+        sigma = player.sigma
+        self.rating_sum += sign * player.weighted_rating()
+        self.sigma_sum += sign * sigma
+        self.sigma_sq_sum += sign * sigma * sigma
+
+    def add(self, player: Player) -> None:
+        """Append a player."""
+        self._chemistry_with(player, len(self.players), 1)
+        self._stats(player, 1)
+        self.players.append(player)
+
+    def remove(self, player: Player) -> None:
+        """Remove a player, keeping the others in order."""
+        position = self.players.index(player)
+        self._chemistry_with(player, position, -1)
+        self._stats(player, -1)
+        del self.players[position]
+
+    def swap(self, old: Player, new: Player) -> None:
+        """Replace old with new in the same position."""
+        position = self.players.index(old)
+        self._chemistry_with(old, position, -1)
+        self._stats(old, -1)
+        self.players[position] = new
+        self._chemistry_with(new, position, 1)
+        self._stats(new, 1)
+
+    def average_rating(self) -> float:
+        """Average weighted rating."""
+        return self.rating_sum / len(self.players)
+
+    def average_sigma(self) -> float:
+        """Average uncertainty."""
+        return self.sigma_sum / len(self.players)
+
+    def uncertainty(self) -> float:
+        """Combined team uncertainty, sqrt(sum of sigma^2) / size."""
+        return math.sqrt(self.sigma_sq_sum) / len(self.players)
+
+    def chemistry_score(self) -> float:
+        """Average chemistry over teammate pairs that have a score."""
+        return self.chemistry_sum / max(1, self.chemistry_pairs)
+
+    def __getitem__(self, position):
+        return self.players[position]
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(self.players)
+
+    def __contains__(self, player) -> bool:
+        return player in self.players
+
+    def __add__(self, other) -> List[Player]:
+        return self.players + list(other)
+
+    def __radd__(self, other) -> List[Player]:
+        return list(other) + self.players
+
+    def __repr__(self):
+        return f"Team({self.players!r})"
+
+
+# One rating snapshot per player per recorded game (32 bytes, little-endian)
+RATING_RECORD_DTYPE = np.dtype([
+    ('player', '<i4'),
+    ('game', '<i4'),
+    ('z_score', '<f8'),
+    ('sigma', '<f8'),
+    ('weighted', '<f8'),
+])
+
+
+class RatingHistory:
+    """
+    Append-only binary log of player rating snapshots, queried through numpy.memmap.
+
+    Records are RATING_RECORD_DTYPE rows in game order. Player ids are line numbers in a
+    sidecar '<path>.names' file, which is only ever appended to so ids stay stable.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.names_path = path + '.names'
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._new_names: List[str] = []
+        self._pending: List[Tuple[int, int, float, float, float]] = []
+        self._mmap: Optional[np.ndarray] = None
+        self._mmap_size = 0
+
+        try:
+            with open(self.names_path, 'r') as f:
+                for line in f:
+                    name = line.rstrip('\n')
+                    self.ids[name] = len(self.names)
+                    self.names.append(name)
+        except FileNotFoundError:
+            pass
+
+    def player_id(self, name: str) -> int:
+        """Id for a player name, assigning the next free id if it is new."""
+        player_id = self.ids.get(name)
+        if player_id is None:
+            player_id = len(self.names)
+            self.ids[name] = player_id
+            self.names.append(name)
+            self._new_names.append(name)
+        return player_id
+
+    def append(self, game_id: int, players: List['Player']) -> None:
+        """Queue a snapshot of each player's current rating after game game_id."""
+        for player in players:
+            self._pending.append((self.player_id(player.name), game_id,
+                                  player.z_score, player.sigma, player.weighted_rating()))
+
+    def flush(self) -> None:
+        """Append queued names and snapshots to disk."""
+        if self._new_names:
+            with open(self.names_path, 'a') as f:
+                f.writelines(name + '\n' for name in self._new_names)
+            self._new_names = []
+        if self._pending:
+            with open(self.path, 'ab') as f:
+                f.write(np.array(self._pending, dtype=RATING_RECORD_DTYPE).tobytes())
+            self._pending = []
+
+    def records(self) -> np.ndarray:
+        """All flushed snapshots as a read-only memory-mapped record array."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        count = size // RATING_RECORD_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=RATING_RECORD_DTYPE)
+        if self._mmap is None or self._mmap_size != count:
+            # Remap only when the file has grown
+            self._mmap = np.memmap(self.path, dtype=RATING_RECORD_DTYPE, mode='r', shape=(count,))
+            self._mmap_size = count
+        return self._mmap
+
+    def player_history(self, name: str) -> np.ndarray:
+        """
+        Rating snapshots for one player, oldest first.
+
+        Returns:
+            Record array with game, z_score, sigma and weighted fields (empty if unknown)
+        """
+        player_id = self.ids.get(name)
+        records = self.records()
+        if player_id is None:
+            return records[:0]
+        return records[records['player'] == player_id]
+
+    def league_percentiles(self, percentiles: Tuple[float, ...] = (10, 50, 90), bucket: int = 50,
+                           field: str = 'z_score') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        League rating percentiles over time, from the snapshots in each bucket of games.
+
+        Args:
+            percentiles: Percentiles to compute (0-100)
+            bucket: Number of consecutive game ids per time bucket
+            field: Snapshot field to summarise (z_score, sigma or weighted)
+
+        Returns:
+            Tuple of (first game id of each bucket, array of shape (buckets, len(percentiles)))
+        """
+        records = self.records()
+        if len(records) == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(percentiles)))
+
+        # Records are appended in game order, so each bucket is a contiguous slice
+        games = records['game']
+        starts = np.arange(int(games[0]) // bucket * bucket, int(games[-1]) + 1, bucket)
+        bounds = np.searchsorted(games, np.append(starts, starts[-1] + bucket))
+        values = records[field]
+
+        keep = bounds[1:] > bounds[:-1]
+        result = np.array([np.percentile(values[lo:hi], percentiles)
+                           for lo, hi in zip(bounds[:-1][keep], bounds[1:][keep])])
+        return starts[keep], result
+
+
+class TeamCache:
+    """
+    LRU cache for team aggregates and matchup qualities, keyed by team signature.
+
+    A signature is the tuple of the members' chemistry indices in team order, since
+    ChemistryMatrix.team_score depends on that order. Keys also carry the owner's rating
+    version, so bumping the version invalidates every cached value at once and stale
+    entries simply age out.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value for key (moved to most recently used), or None on a miss."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the hit counters."""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counts, hit rate and current size."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.entries)
+        }
+
+
+# Candidate partitions scored together per NumPy batch
+SEARCH_BATCH_SIZE = 1024
+
+# Default search budget per create_teams method
+DEFAULT_TEAM_ITERATIONS = {
+    'random': 500,
+    'anneal': 2000,
+    'exact': 2000,  # anneal proposals used to seed the branch and bound
+}
+
+
+def random_team_assignments(rng: np.random.Generator, is_a_tier: np.ndarray, num_teams: int,
+                            base_size: int, extra_players: int, count: int) -> np.ndarray:
+    """
+    Generate candidate partitions the same way the create_multiple_teams loop does.
+
+    A-tier players are spread one per team (up to num_teams of them), then everyone
+    else is shuffled and dealt out so team i ends up with base_size (+1 if i < extra_players).
+
+    Returns:
+        (count, num_players) integer matrix of team indices, -1 for unassigned players
+    """
+    num_players = len(is_a_tier)
+    a_tier_idx = np.flatnonzero(is_a_tier)
+    other_idx = np.flatnonzero(~is_a_tier)
+    num_seeded = min(len(a_tier_idx), num_teams)
+    rows = np.arange(count)[:, None]
+
+    assignments = np.full((count, num_players), -1, dtype=np.int64)
+
+    # Random order of A-tier players per candidate, the first num_teams of them seed the teams
+    a_tier_order = a_tier_idx[np.argsort(rng.random((count, len(a_tier_idx))), axis=1)]
+    assignments[rows, a_tier_order[:, :num_seeded]] = np.arange(num_seeded)
+
+    # Everyone left over (including surplus A-tier players) is shuffled and dealt out
+    rest = np.concatenate([a_tier_order[:, num_seeded:],
+                           np.broadcast_to(other_idx, (count, len(other_idx)))], axis=1)
+    rest = np.take_along_axis(rest, np.argsort(rng.random(rest.shape), axis=1), axis=1)
+
+    # Team slots to fill, in dealing order
+    slot_teams = []
+    for i in range(num_teams):
+        target_size = base_size + (1 if i < extra_players else 0)
+        spots_needed = target_size - (1 if i < num_seeded else 0)
+        if spots_needed > 0 and len(slot_teams) + spots_needed <= rest.shape[1]:
+            slot_teams.extend([i] * spots_needed)
+
+    assignments[rows, rest[:, :len(slot_teams)]] = np.array(slot_teams, dtype=np.int64)
+    return assignments
+
+
+def random_two_team_assignments(rng: np.random.Generator, num_players: int, players_per_team: int,
+                                count: int) -> np.ndarray:
+    """
+    Generate random two-team splits the same way the create_teams shuffle loop does.
+
+    Returns:
+        (count, num_players) integer matrix: 0 = team 1, 1 = team 2, -1 = sitting out
+    """
+    order = np.argsort(rng.random((count, num_players)), axis=1)
+    rows = np.arange(count)[:, None]
+    assignments = np.full((count, num_players), -1, dtype=np.int64)
+    assignments[rows, order[:, :players_per_team]] = 0
+    assignments[rows, order[:, players_per_team:2 * players_per_team]] = 1
+    return assignments
+
+
+def _batch_team_totals(ratings: np.ndarray, sigmas: np.ndarray, chemistry: np.ndarray,
+                       chemistry_known: np.ndarray, assignments: np.ndarray,
+                       num_teams: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Team sizes, rating sums, sigma sums and chemistry scores, each (candidates, teams)."""
+    # One-hot team membership, shape (candidates, teams, players)
+    membership = (assignments[:, None, :] == np.arange(num_teams)[None, :, None]).astype(np.float64)
+    counts = membership.sum(axis=2)
+    rating_sums = membership @ ratings
+    sigma_sums = membership @ sigmas
+
+    # Chemistry over teammate pairs (i before j), matching itertools.combinations order
+    pair_values = np.triu(np.where(chemistry_known, chemistry, 0.0), 1)
+    pair_known = np.triu(chemistry_known, 1).astype(np.float64)
+    chem_sums = np.einsum('ktn,ktn->kt', membership @ pair_values, membership)
+    chem_pairs = np.einsum('ktn,ktn->kt', membership @ pair_known, membership)
+    team_chemistry = chem_sums / np.maximum(1, chem_pairs)
+
+    return counts, rating_sums, sigma_sums, team_chemistry
+
+
+def _batch_pair_quality(counts: np.ndarray, rating_sums: np.ndarray, sigma_sums: np.ndarray,
+                        team_chemistry: np.ndarray) -> np.ndarray:
+    """Match quality for every (i, j) team pair of every candidate, see predict_match_quality."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        team_skill = rating_sums / counts
+        team_uncertainty = sigma_sums / counts
+
+    effective = team_skill + team_chemistry * 0.2
+    skill_diff = np.abs(effective[:, :, None] - effective[:, None, :])
+    quality = 100 * (1 / (1 + skill_diff / 2.5 / 3))
+    avg_uncertainty = (team_uncertainty[:, :, None] + team_uncertainty[:, None, :]) / 2
+    return quality * (100 / (100 + avg_uncertainty))
+
+
+def batch_match_quality(ratings: np.ndarray, sigmas: np.ndarray, chemistry: np.ndarray,
+                        chemistry_known: np.ndarray, assignments: np.ndarray) -> np.ndarray:
+    """
+    Predicted match quality of many two-team splits at once (higher is better).
+
+    Args:
+        ratings, sigmas, chemistry, chemistry_known: As for batch_balance_scores
+        assignments: (candidates, n) matrix with 0 = team 1, 1 = team 2, -1 = sitting out
+
+    Returns:
+        Array of match qualities, one per candidate
+    """
+    totals = _batch_team_totals(ratings, sigmas, chemistry, chemistry_known, assignments, 2)
+    return _batch_pair_quality(*totals)[:, 0, 1]
+
+
+def batch_balance_scores(ratings: np.ndarray, sigmas: np.ndarray, chemistry: np.ndarray,
+                         chemistry_known: np.ndarray, assignments: np.ndarray,
+                         num_teams: int, team_size: int) -> np.ndarray:
+    """
+    Score many candidate partitions at once (lower is better).
+
+    Computes the same balance_score as VolleyballMatchmaker._balance_score for every row
+    of the assignment matrix: normalized rating variance and range, average pairwise match
+    quality and average team chemistry.
+
+    Args:
+        ratings: Weighted rating per player
+        sigmas: Uncertainty per player
+        chemistry: (n, n) matrix where [i, j] is player i's chemistry with player j
+        chemistry_known: (n, n) mask of which chemistry entries exist
+        assignments: (candidates, n) integer matrix of team indices (-1 = unassigned)
+        num_teams: Number of teams in each candidate
+        team_size: Target team size used to normalize smaller teams
+
+    Returns:
+        Array of balance scores, one per candidate (inf where a team is empty)
+    """
+    counts, rating_sums, sigma_sums, team_chemistry = _batch_team_totals(
+        ratings, sigmas, chemistry, chemistry_known, assignments, num_teams)
+
+    # Smaller teams get "virtual players" at the global average rating
+    global_avg_rating = ratings.mean()
+    normalized = (rating_sums + (team_size - counts) * global_avg_rating) / team_size
+    rating_variance = normalized.var(axis=1)
+    rating_range = normalized.max(axis=1) - normalized.min(axis=1)
+
+    # Average quality across all possible matchups
+    quality = _batch_pair_quality(counts, rating_sums, sigma_sums, team_chemistry)
+    first, second = np.triu_indices(num_teams, 1)
+    if len(first):
+        avg_quality = quality[:, first, second].mean(axis=1)
+    else:
+        avg_quality = np.zeros(len(assignments))
+    avg_chemistry = team_chemistry.mean(axis=1)
+
+    balance_scores = (rating_variance * 10.0) + \
+                     (rating_range * 3.0) - \
+                     (avg_quality / 100) - \
+                     (avg_chemistry / 10)
+    balance_scores[(counts == 0).any(axis=1)] = np.inf
+    return balance_scores
+
+
+# Player arrays shipped once to each search worker process by _init_search_worker
+_worker_arrays: Dict[str, np.ndarray] = {}
+
+
+def _init_search_worker(arrays: Dict[str, np.ndarray]) -> None:
+    """Process pool initializer: keep the player arrays for the lifetime of the worker."""
+    _worker_arrays.update(arrays)
+
+
+def _run_search_shard(shard_fn, *args, **kwargs):
+    """Run a search shard inside a worker against the arrays shipped by the initializer."""
+    return shard_fn(_worker_arrays, *args, **kwargs)
+
+
+def _two_team_search_shard(arrays: Dict[str, np.ndarray], seed: int, shard: int, iterations: int,
+                           players_per_team: int, batch_size: int, trace: Optional[list] = None,
+                           time_budget: Optional[float] = None) -> Tuple[float, Optional[np.ndarray]]:
+    """
+    Best random two-team split out of one shard's iterations, with its own seeded RNG.
+
+    If trace is given, (candidates scored, best quality) is appended whenever the best improves.
+    With a time_budget (seconds), the shard stops after the first batch that ends past it.
+    """
+    rng = np.random.default_rng([seed, shard])
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    best_quality, best_assignment = -1.0, None
+    remaining = iterations
+    while remaining > 0:
+        count = min(batch_size, remaining)
+        remaining -= count
+        assignments = random_two_team_assignments(rng, len(arrays['ratings']), players_per_team, count)
+        qualities = batch_match_quality(arrays['ratings'], arrays['sigmas'], arrays['chemistry'],
+                                        arrays['chemistry_known'], assignments)
+        best_idx = int(np.argmax(qualities))
+        if qualities[best_idx] > best_quality:
+            best_quality, best_assignment = float(qualities[best_idx]), assignments[best_idx]
+            if trace is not None:
+                trace.append((iterations - remaining - count + best_idx + 1, best_quality))
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+    return best_quality, best_assignment
+
+
+def _multi_team_search_shard(arrays: Dict[str, np.ndarray], seed: int, shard: int, iterations: int,
+                             num_teams: int, base_size: int, extra_players: int, team_size: int,
+                             batch_size: int, trace: Optional[list] = None,
+                             time_budget: Optional[float] = None) -> Tuple[float, Optional[np.ndarray]]:
+    """
+    Best partition (lowest balance score) out of one shard's iterations, with its own seeded RNG.
+
+    If trace is given, (candidates scored, best score) is appended whenever the best improves.
+    With a time_budget (seconds), the shard stops after the first batch that ends past it.
+    """
+    rng = np.random.default_rng([seed, shard])
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    best_score, best_assignment = float('inf'), None
+    remaining = iterations
+    while remaining > 0:
+        count = min(batch_size, remaining)
+        remaining -= count
+        assignments = random_team_assignments(rng, arrays['is_a_tier'], num_teams, base_size,
+                                              extra_players, count)
+        scores = batch_balance_scores(arrays['ratings'], arrays['sigmas'], arrays['chemistry'],
+                                      arrays['chemistry_known'], assignments, num_teams, team_size)
+        best_idx = int(np.argmin(scores))
+        if scores[best_idx] < best_score:
+            best_score, best_assignment = float(scores[best_idx]), assignments[best_idx]
+            if trace is not None:
+                trace.append((iterations - remaining - count + best_idx + 1, best_score))
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+    return best_score, best_assignment
+
+
+def parallel_search(shard_fn, arrays: Dict[str, np.ndarray], iterations: int, workers: int,
+                    seed: int, *args, minimize: bool = True,
+                    time_budget: Optional[float] = None) -> Tuple[float, Optional[np.ndarray]]:
+    """
+    Shard a random search across a process pool and keep the best result.
+
+    The player arrays are shipped to each worker once through the pool initializer.
+    Shard i draws from np.random.default_rng([seed, i]) and results are reduced in shard
+    order (earlier shard wins ties), so a given seed and worker count always gives the same
+    answer. A time_budget is passed to every shard and bounds each one from its own start.
+    """
+    shard_iterations = [iterations // workers + (1 if i < iterations % workers else 0) for i in range(workers)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_search_worker,
+                             initargs=(arrays,)) as pool:
+        futures = [pool.submit(_run_search_shard, shard_fn, seed, shard, count, *args, time_budget=time_budget)
+                   for shard, count in enumerate(shard_iterations) if count > 0]
+        results = [future.result() for future in futures]
+
+    best_value, best_assignment = (float('inf'), None) if minimize else (-float('inf'), None)
+    for value, assignment in results:
+        if assignment is not None and (value < best_value if minimize else value > best_value):
+            best_value, best_assignment = value, assignment
+    return best_value, best_assignment
+
+
+def _match_quality_from_totals(rating_sum1: float, sigma_sum1: float, chemistry1: float, size1: int,
+                               rating_sum2: float, sigma_sum2: float, chemistry2: float, size2: int) -> float:
+    """predict_match_quality computed from team rating/sigma sums and team chemistry scores."""
+    team1_effective = rating_sum1 / size1 + chemistry1 * 0.2
+    team2_effective = rating_sum2 / size2 + chemistry2 * 0.2
+    pred_score_diff = abs(team1_effective - team2_effective) / 2.5
+    quality = 100 * (1 / (1 + pred_score_diff/3))
+    avg_uncertainty = (sigma_sum1 / size1 + sigma_sum2 / size2) / 2
+    return quality * (100 / (100 + avg_uncertainty))
+
+
+def _symmetric_chemistry(chemistry: np.ndarray, chemistry_known: np.ndarray) -> Tuple[List[List[float]], List[List[int]]]:
+    """
+    Pairwise chemistry between players as nested lists, for incremental search.
+
+    Chemistry is updated symmetrically by record_game, so the value for a pair is the
+    average of whichever directions are present. Returns (values, known) where known[i][j]
+    is 1 if either player has chemistry recorded for the other.
+    """
+    known = chemistry_known & ~np.eye(len(chemistry_known), dtype=bool)
+    totals = np.where(known, chemistry, 0.0)
+    totals = totals + totals.T
+    counts = known.astype(np.int64) + known.T
+    values = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+    return values.tolist(), (counts > 0).astype(np.int64).tolist()
+
+
+@contextmanager
+def _gc_paused():
+    """Suspend cyclic garbage collection for the duration of the block."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _parse_column(values: Sequence[str], convert, parse, dtype) -> np.ndarray:
+    """
+    Convert a column of CSV strings to an array.
+
+    The column is converted with convert while every value is well-formed, otherwise
+    with parse, the storage parser that falls back to the default for bad values.
+    """
+    try:
+        return np.fromiter(map(convert, values), dtype=dtype, count=len(values))
+    except (ValueError, OverflowError):
+        return np.fromiter(map(parse, values), dtype=dtype, count=len(values))
+
+
+# players.csv columns as NumPy's CSV reader parses them (see _read_player_file)
+PLAYER_FILE_DTYPE = np.dtype([
+    ('name', object),
+    ('skill_group', object),
+    ('z_score', np.float64),
+    ('sigma', np.float64),
+    ('last_played', object),
+    ('games_played', np.int64),
+    ('wins', np.int64),
+    ('points_scored', np.int64),
+    ('points_allowed', np.int64),
+    ('chemistry', object),
+])
+
+
+def _read_player_file(path: str) -> Optional[np.ndarray]:
+    """
+    A well-formed player file as a PLAYER_FILE_DTYPE array, parsed by NumPy's C reader.
+
+    The reader raises on anything the tolerant row-by-row path would patch up (short
+    rows, empty or malformed numbers, counts outside int64), so None is returned for
+    such files, as for missing or empty ones and ones with unnamed or repeated players,
+    and they are left to that path.
+    """
+    try:
+        with open(path, 'r', newline='') as f, warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # loadtxt warns about a file with no rows
+            columns = np.loadtxt(f, dtype=PLAYER_FILE_DTYPE, delimiter=',', quotechar='"', comments=None,
+                                 skiprows=1, ndmin=1)
+    except (OSError, ValueError, OverflowError):
+        return None
+    names = set(columns['name'].tolist())
+    if not len(columns) or len(names) < len(columns) or '' in names:
+        return None
+    return columns
+
+
+def _packed_names(names) -> np.ndarray:
+    """Names concatenated as UTF-8 bytes, for a snapshot (see _unpacked_names)."""
+    return np.frombuffer(''.join(names).encode(), dtype=np.uint8)
+
+
+def _name_ends(names) -> np.ndarray:
+    """Character (not byte) offsets where each name ends, for slicing the decoded text."""
+    return np.cumsum([len(name) for name in names], dtype=np.int64)
+
+
+def _unpacked_names(packed: np.ndarray, ends: np.ndarray) -> List[str]:
+    """Names from the arrays of _packed_names and _name_ends."""
+    text = packed.tobytes().decode()
+    ends = ends.tolist()
+    return list(map(text.__getitem__, map(slice, [0] + ends[:-1], ends)))
+
+
 class VolleyballMatchmaker:
-    def __init__(self, player_file: str, game_file: str, attendance_file: str):
+    def __init__(self, player_file: str, game_file: str, attendance_file: str,
+                 rating_history_file: Optional[str] = None, metrics: Optional[Metrics] = None,
+                 storage=None):
         self.player_file = player_file
         self.game_file = game_file
         self.attendance_file = attendance_file
+        # Where players, chemistry and games are kept (CsvStorage or SqliteStorage)
+        self.storage = storage or CsvStorage(player_file, game_file)
         self.players: Dict[str, Player] = {}  # All players in system
         self.attending_players: List[Player] = []  # Players for current session
         
-        # Chemistry tracking
-        self.pair_performances: Dict[Tuple[str, str], List[float]] = {}
+        # Player stats (rows viewed by Player objects) and chemistry tracking, both keyed
+        # on the ids of one name registry: a player's table row is its id
+        self.ids = NameRegistry()
+        self.player_table = PlayerTable(registry=self.ids)
+        self.chemistry = ChemistryMatrix(registry=self.ids)
+        # Win (1) / loss (0) results of each teammate pair, keyed by (lower id, higher id)
+        self.pair_performances: Dict[Tuple[int, int], List[int]] = {}
+        
+        # Memoized team aggregates and match qualities; bump rating_version when ratings,
+        # games played or chemistry change (see invalidate_team_cache)
+        self.team_cache = TeamCache()
+        self.rating_version = 0
         
         # TrueSkill parameters
         self.beta = 20.0  # How much difference in skill translates to score difference
         self.dynamic_factor = 5.0  # Base adjustment factor
         self.uncertainty_factor = 0.5  # How much uncertainty to maintain in the system
         
-        # Historical game data
-        self.historical_games: List[dict] = []
+        # Game history, read from storage on demand (see iter_games)
+        self.game_log = None
+        # Per-game rating snapshots, stored next to the game file (or database) by default
+        self.rating_history = RatingHistory(rating_history_file or self.storage.ratings_file)
+
+        # Stats from the most recent create_teams search (method, nodes, seconds, quality, timed_out)
+        self.last_search_stats: Dict = {}
+        # Stats from the most recent create_optimal_matchups call (with its matchups), compared against greedy
+        self.last_matchup_stats: Dict = {}
+        # Stats from the most recent create_match_schedule call (with its schedule), compared against the circle method
+        self.last_schedule_stats: Dict = {}
+
+        # Deferred persistence while inside batch(): game rows wait in game_log.pending
+        self._batch_depth = 0
+        # Ids of the players and teammate pairs changed by games since the last save, for
+        # storage that writes only changed rows
+        self._changed_players: Set[int] = set()
+        self._changed_pairs: Set[Tuple[int, int]] = set()
+
+        # Optional instrumentation (counters, phase timings, search traces); None costs nothing
+        self.metrics = metrics
+        self.chemistry.metrics = metrics
+        self.storage.metrics = metrics
+        # Keep the binary snapshot in step with each rewrite of the player file
+        self._snapshot_game_index = None  # (meta, arrays) of a loaded snapshot's game index
+        if self.storage.snapshot_file is not None:
+            self.storage.on_player_file_written = self.save_snapshot
+        if metrics is not None:
+            metrics.register('team_cache', self.team_cache.stats)
         
         # Load existing player data and game history
         self.load_players()
         self.load_game_history()
     
+    @timed_phase('load')
     def load_players(self) -> None:
-        """Load all players from the player file."""
+        """
+        Load all players from storage.
+        
+        A well-formed players.csv is parsed by NumPy's CSV reader straight into typed
+        columns. Otherwise rows are read in one pass and each column is parsed in bulk,
+        with missing or malformed values falling back to the usual defaults (rating and
+        sigma 100, skill group C, LastPlayed today, counts 0), and a repeated name keeps
+        its last row. Chemistry is loaded on first use of the matrix.
+        
+        If the storage has a binary snapshot matching its player file (see save_snapshot),
+        the table and chemistry are mapped from it instead. Journaled rows are applied last.
+        """
+        # A bulk load allocates millions of small, acyclic objects; cyclic GC passes would only slow it down
+        with _gc_paused():
+            snapshot = self._read_snapshot()
+            if snapshot is not None:
+                # The snapshot holds the player file; only the journal remains to be applied
+                self._load_snapshot(*snapshot)
+                rows, load_chemistry = self.storage.read_players(include_file=False)
+            else:
+                parsed = None
+                if self.storage.player_file is not None:
+                    parsed = _read_player_file(self.storage.player_file)
+                if parsed is None:
+                    rows, load_chemistry = self.storage.read_players()
+                else:
+                    names = parsed['name'].tolist()
+                    self.chemistry.defer(chemistry_loader(names, parsed['chemistry'].tolist()))
+                    self._add_players(names, parsed['skill_group'].tolist(), parsed['z_score'],
+                                      parsed['sigma'], parsed['last_played'].tolist(),
+                                      [parsed[field] for field in COUNT_FIELDS])
+                    rows, load_chemistry = self.storage.read_players(include_file=False)
+            if not rows:
+                return
+        
+            names = [row[0] for row in rows]
+            if len(set(names)) < len(names):
+                # A repeated name keeps its last row, in first-seen order
+                last_rows = {row[0]: row for row in rows}
+                names, rows = list(last_rows), list(last_rows.values())
+            if min(map(len, rows)) < 9:
+                # Pad short rows with empty (missing) values
+                rows = [row if len(row) >= 9 else row + [''] * (9 - len(row)) for row in rows]
+            columns = list(zip(*rows))
+            self.chemistry.defer(load_chemistry)
+            self._add_players(names, columns[1], _parse_column(columns[2], float, parse_rating, np.float64),
+                              _parse_column(columns[3], float, parse_rating, np.float64), columns[4],
+                              [_parse_column(column, int, parse_count, np.int64) for column in columns[5:9]])
+
+    def _add_players(self, names: List[str], skill_groups: Sequence[str], z_scores: np.ndarray,
+                     sigmas: np.ndarray, last_played: Sequence[str], counts: List[np.ndarray]) -> None:
+        """
+        Add or overwrite players from parsed columns.
+        
+        Args:
+            names: Player names, each once
+            skill_groups: Skill group column as read ('' for group C)
+            z_scores, sigmas: Ratings and uncertainties
+            last_played: LastPlayed column as read (today where it is not a date)
+            counts: Arrays of games played, wins, points scored and points allowed
+        """
+        table = self.player_table
+        # Rows are ids of the registry the chemistry matrix shares
+        table_rows = table.add_many(names)
+        
+        groups = {group: group or 'C' for group in set(skill_groups)}
+        codes = {group: table.group_code(name) for group, name in groups.items()}
+        base_ratings = {group: SKILL_GROUP_RATINGS.get(name, 100.0) for group, name in groups.items()}
+        table.skill_group[table_rows] = list(map(codes.__getitem__, skill_groups))
+        table.skill_rating[table_rows] = list(map(base_ratings.__getitem__, skill_groups))
+        table.z_score[table_rows] = z_scores
+        table.sigma[table_rows] = sigmas
+        
+        # Few distinct LastPlayed values, so each is parsed once
+        today = date.today()
+        ordinals = {value: (parse_date(value) or today).toordinal() for value in set(last_played)}
+        table.last_played[table_rows] = list(map(ordinals.__getitem__, last_played))
+        
+        for field, column in zip(COUNT_FIELDS, counts):
+            getattr(table, field)[table_rows] = column
+        
+        indices = table_rows.tolist()
+        self.players.update(zip(names, map(Player.view, itertools.repeat(table), indices,
+                                           itertools.repeat(self.chemistry), indices)))
+        self.invalidate_team_cache()
+    
+    def _read_snapshot(self) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+        """The storage's snapshot, if there is one of this version matching the current player file."""
+        path = self.storage.snapshot_file
+        if path is None or not os.path.exists(path):
+            return None
+        snapshot = read_snapshot(path)
         try:
-            with open(self.player_file, 'r', newline='') as f:
-                reader = csv.reader(f)
-                try:
-                    header = next(reader)  # Try to read header
-                except StopIteration:
-                    # Empty file, create with header
-                    self._create_player_file()
-                    return
-                
-                for row in reader:
-                    if not row:  # Skip empty rows
-                        continue
-                        
-                    try:
-                        # Extract required fields with defaults for missing data
-                        name = row[0] if len(row) > 0 else ""
-                        if not name:  # Skip rows without names
-                            continue
-                            
-                        # Default to 'C' skill group if missing
-                        skill_group = row[1] if len(row) > 1 and row[1] else 'C'
-                        
-                        # Handle missing numeric fields with defaults
-                        z_score = 100.0  # Default rating
-                        if len(row) > 2 and row[2]:
-                            try:
-                                z_score = float(row[2])
-                            except ValueError:
-                                pass  # Use default if conversion fails
-                        
-                        sigma = 100.0  # Default uncertainty
-                        if len(row) > 3 and row[3]:
-                            try:
-                                sigma = float(row[3])
-                            except ValueError:
-                                pass
-                        
-                        # Create player with available data
-                        player = Player(name, skill_group, z_score, sigma)
-                        
-                        # Add more fields if available
-                        if len(row) > 4 and row[4]:
-                            try:
-                                player.last_played = datetime.strptime(row[4], "%Y-%m-%d").date()
-                            except ValueError:
-                                player.last_played = date.today()
-                        
-                        # Load game stats if available
-                        if len(row) > 5 and row[5]:
-                            try:
-                                player.games_played = int(row[5])
-                            except ValueError:
-                                player.games_played = 0
-                        
-                        if len(row) > 6 and row[6]:
-                            try:
-                                player.wins = int(row[6])
-                            except ValueError:
-                                player.wins = 0
-                                
-                        if len(row) > 7 and row[7]:
-                            try:
-                                player.points_scored = int(row[7])
-                            except ValueError:
-                                player.points_scored = 0
-                                
-                        if len(row) > 8 and row[8]:
-                            try:
-                                player.points_allowed = int(row[8])
-                            except ValueError:
-                                player.points_allowed = 0
-                        
-                        # Load chemistry data if available
-                        if len(row) > 9 and row[9]:
-                            chemistry_data = row[9]
-                            try:
-                                pairs = chemistry_data.split(';')
-                                for pair in pairs:
-                                    if ':' in pair:
-                                        other_player, score = pair.split(':')
-                                        player.chemistry[other_player] = float(score)
-                            except:
-                                # If chemistry data is malformed, just skip it
-                                pass
-                        
-                        self.players[name] = player
-                        
-                    except Exception as e:
-                        print(f"Error loading player data: {row}. Error: {e}")
-                        # Continue loading other players even if one fails
+            stat = os.stat(self.storage.player_file)
         except FileNotFoundError:
-            # Create file with header if it doesn't exist
-            self._create_player_file()
-    
-    def _create_player_file(self) -> None:
-        """Create the player file with header."""
-        with open(self.player_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Name', 'Skill_Group', 'Z_Score', 'Sigma', 'LastPlayed', 
-                            'GamesPlayed', 'Wins', 'PointsScored', 'PointsAllowed', 'Chemistry'])
-    
-    def save_players(self) -> None:
-        """Save all players to the player file."""
-        with open(self.player_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Name', 'Skill_Group', 'Z_Score', 'Sigma', 'LastPlayed', 
-                            'GamesPlayed', 'Wins', 'PointsScored', 'PointsAllowed', 'Chemistry'])
-            for player in self.players.values():
-                # Format chemistry data
-                chemistry_str = ';'.join([f"{p}:{score}" for p, score in player.chemistry.items()])
-                
-                writer.writerow([
-                    player.name, 
-                    player.skill_group, 
-                    player.z_score,
-                    player.sigma,
-                    player.last_played.strftime("%Y-%m-%d"),
-                    player.games_played,
-                    player.wins,
-                    player.points_scored,
-                    player.points_allowed,
-                    chemistry_str
-                ])
+            return None
+        if snapshot is None or snapshot[0]['source'] != [stat.st_size, stat.st_mtime_ns]:
+            print(f"Ignoring out of date snapshot {path}")
+            return None
+        return snapshot
+
+    def _load_snapshot(self, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+        """Fill the (empty) player table and chemistry matrix from a snapshot."""
+        names = _unpacked_names(arrays['names'], arrays['name_ends'])
+        player_index = arrays['player_index']
+        rows, cols, values = arrays['chemistry_rows'], arrays['chemistry_cols'], arrays['chemistry_values']
+
+        def load_chemistry(matrix: ChemistryMatrix) -> None:
+            matrix.load_arrays(rows, cols, values)
+
+        chemistry = self.chemistry
+        chemistry.defer(load_chemistry)
+        chemistry.add_many(names)
+        table = self.player_table
+        for group in meta['groups']:
+            table.group_code(group)
+        for field in PlayerTable.FIELDS:
+            # Copy-on-write pages of the file, until the table next grows
+            setattr(table, field, arrays[field])
+        # Table rows are registry ids, added above with the chemistry names, and the field
+        # arrays hold exactly the saved rows, so the table only needs its size
+        table.size = len(arrays['z_score'])
+        indices = player_index.tolist()
+        self.players.update(zip(map(names.__getitem__, indices),
+                                map(Player.view, itertools.repeat(table), indices, itertools.repeat(chemistry), indices)))
+        self._snapshot_game_index = (meta['games'], arrays)
+        self.invalidate_team_cache()
+
+    def save_snapshot(self) -> Optional[int]:
+        """
+        Write the player table, chemistry and game index to the storage's snapshot file.
+        
+        The snapshot records the size and modification time of the player file, and is
+        only loaded while the player file is unchanged, so call it right after the player
+        file is written (CsvStorage does this through on_player_file_written).
+        
+        Returns:
+            Bytes written, or None if the storage keeps no snapshot
+        """
+        path = self.storage.snapshot_file
+        if path is None:
+            return None
+        stat = os.stat(self.storage.player_file)
+        chemistry = self.chemistry
+        table = self.player_table
+        # Entries grouped by player, in each player's own order
+        entries = chemistry.rows
+        counts = [len(row) for row in entries.values()]
+        total = sum(counts)
+        rows = np.repeat(np.fromiter(entries, dtype=np.int32, count=len(entries)), counts)
+        cols = np.fromiter(itertools.chain.from_iterable(entries.values()), dtype=np.int32, count=total)
+        values = np.fromiter(itertools.chain.from_iterable(map(dict.values, entries.values())),
+                             dtype=np.float64, count=total)
+        arrays = {
+            'names': _packed_names(chemistry.names),
+            'name_ends': _name_ends(chemistry.names),
+            'player_index': np.array([player.index for player in self.players.values()], dtype=np.int64),
+            'chemistry_rows': rows,
+            'chemistry_cols': cols,
+            'chemistry_values': values,
+        }
+        arrays.update((field, getattr(table, field)[:len(table)]) for field in PlayerTable.FIELDS)
+
+        log = self.game_log
+        games = {'stride': 0, 'indexed_bytes': 0, 'indexed_games': 0, 'in_order': True}
+        if log is not None and log.indexed_bytes:
+            games.update(source=log.file_state(), stride=log.stride, indexed_bytes=log.indexed_bytes, indexed_games=log.indexed_games,
+                         in_order=log.in_order)
+            arrays['game_block_offsets'] = np.array(log.block_offsets, dtype=np.int64)
+            arrays['game_block_first_dates'] = np.array([day.toordinal() for day in log.block_first_dates], dtype=np.int32)
+            arrays['game_block_max_dates'] = np.array([day.toordinal() for day in log.block_max_dates], dtype=np.int32)
+            if log.player_offsets is not None:
+                # Each player's game line offsets, one run per player
+                runs = log.player_offsets
+                arrays['game_player_names'] = _packed_names(runs)
+                arrays['game_player_name_ends'] = _name_ends(runs)
+                arrays['game_player_ends'] = np.cumsum([len(run) for run in runs.values()], dtype=np.int64)
+                arrays['game_player_offsets'] = np.concatenate(
+                    [np.frombuffer(run, dtype=np.int64) for run in runs.values()] + [np.empty(0, dtype=np.int64)])
+        meta = {'source': [stat.st_size, stat.st_mtime_ns], 'groups': self.player_table.group_names, 'games': games}
+        written = write_snapshot(path, arrays, meta)
+        if self.metrics is not None:
+            self.metrics.count('snapshot_bytes_written', written)
+        return written
+
+    @timed_phase('save')
+    def save_players(self, changed_only: bool = False) -> None:
+        """
+        Save players and chemistry to storage.
+        
+        Args:
+            changed_only: Only write the players and teammate pairs changed by games since
+                the last save, if the storage can update rows in place
+        """
+        changed = None
+        if changed_only and self.storage.partial_writes:
+            changed = (self._changed_players, self._changed_pairs)
+        self.storage.save_players(self.players, self.chemistry, changed)
+        self._changed_players, self._changed_pairs = set(), set()
     
+    @timed_phase('load')
     def load_game_history(self) -> None:
-        """Load past game results for historical analysis."""
-        try:
-            with open(self.game_file, 'r', newline='') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if len(row) >= 5:  # Date, Team1, Team2, Score1, Score2
-                        game_date = datetime.strptime(row[0], "%Y-%m-%d %H:%M").date()
-                        team1_names = row[1].split(',')
-                        team2_names = row[2].split(',')
-                        score1 = int(row[3])
-                        score2 = int(row[4])
-                        
-                        # Store the game data
-                        self.historical_games.append({
-                            'date': game_date,
-                            'team1': team1_names,
-                            'team2': team2_names,
-                            'score1': score1,
-                            'score2': score2
-                        })
-        except FileNotFoundError:
-            # Create file if it doesn't exist
-            with open(self.game_file, 'w', newline='') as f:
-                pass  # Just create an empty file
+        """Open the game history; games are parsed on demand by iter_games, not loaded here."""
+        self.game_log = self.storage.game_log()
+        if self._snapshot_game_index is not None:
+            # The index of the game file as of the snapshot; GameLog indexes newer rows itself
+            games, arrays = self._snapshot_game_index
+            self._snapshot_game_index = None
+            if games['indexed_bytes'] and games['stride'] == self.game_log.stride:
+                player_offsets = None
+                if 'game_player_offsets' in arrays:
+                    def player_offsets() -> Dict[str, memoryview]:
+                        # Read-only slices of the mapped file; GameLog copies a player's
+                        # offsets only when it indexes a new game of theirs
+                        names = _unpacked_names(arrays['game_player_names'], arrays['game_player_name_ends'])
+                        offsets = memoryview(arrays['game_player_offsets']).cast('B').cast('q')
+                        ends = arrays['game_player_ends'].tolist()
+                        return dict(zip(names, map(offsets.__getitem__, map(slice, [0] + ends[:-1], ends))))
+                restored = self.game_log.restore_index(
+                    arrays['game_block_offsets'].tolist(),
+                    list(map(date.fromordinal, arrays['game_block_first_dates'].tolist())),
+                    list(map(date.fromordinal, arrays['game_block_max_dates'].tolist())),
+                    games['indexed_bytes'], games['indexed_games'], games['in_order'], games['source'],
+                    self.storage.journaled_games_start(), player_offsets)
+                if not restored:
+                    print(f"Ignoring out of date game index in {self.storage.snapshot_file}")
+    
+    def iter_games(self, since: Optional[date] = None, until: Optional[date] = None,
+                   player: Optional[str] = None, reverse: bool = False):
+        """
+        Stream recorded games, oldest first (see GameLog.iter_games).
+        
+        Args:
+            since: Only games on or after this date
+            until: Only games on or before this date
+            player: Only games this player took part in
+            reverse: Newest first instead
+            
+        Yields:
+            Dicts with date, team1, team2 (lists of names), score1 and score2
+        """
+        return self.game_log.iter_games(since, until, player, reverse)
     
     def load_attendance(self) -> None:
         """Load the list of attending players."""
         self.attending_players = []
         try:
             with open(self.attendance_file, 'r', newline='') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if row and row[0] in self.players:
-                        player = self.players[row[0]]
-                        player.last_played = date.today()  # Update last played date
-                        self.attending_players.append(player)
-                    elif row:
-                        # Add new player if they don't exist
-                        name = row[0]
-                        new_player = Player(name, 'C', 100.0, 100.0, date.today())
-                        self.players[name] = new_player
-                        self.attending_players.append(new_player)
+                names = [row[0] for row in csv.reader(f) if row]
         except FileNotFoundError:
             print(f"Attendance file {self.attendance_file} not found.")
+            return
+        self.set_attendance(names)
+    
+    def set_attendance(self, names: List[str]) -> None:
+        """
+        Set the attending players by name, adding unknown names as new C group players.
+        
+        Args:
+            names: Attending player names, in attendance order
+        """
+        self.attending_players = []
+        for name in names:
+            if name in self.players:
+                player = self.players[name]
+                player.apply_decay()  # Catch up on inactivity decay, last played is now today
+                self.invalidate_team_cache()
+                self.attending_players.append(player)
+            else:
+                # Add new player if they don't exist
+                new_player = Player(name, 'C', 100.0, 100.0, date.today(), chemistry_matrix=self.chemistry,
+                                    table=self.player_table)
+                self.players[name] = new_player
+                self.attending_players.append(new_player)
+        # Decay moved last played to today, saved with the next game
+        self._changed_players.update(player.index for player in self.attending_players)
     
-    def apply_skill_decay(self) -> None:
-        """Apply skill decay for players who haven't played recently."""
-        today = date.today()
-        for name, player in self.players.items():
-            if player.last_played:
-                days_inactive = (today - player.last_played).days
-                if days_inactive > 30:  # Inactive for more than a month
-                    # Decay rate increases with inactivity
-                    decay_factor = min(days_inactive / 200, 0.25)  # Max 25% decay
-                    
-                    # Apply decay toward the mean rating
-                    mean_rating = 100.0
-                    player.z_score = player.z_score * (1 - decay_factor) + mean_rating * decay_factor
-                    
-                    # Increase uncertainty
-                    player.sigma = min(player.sigma + days_inactive / 30 * 10, 150)
-
     def record_game(self, team1: List[Player], team2: List[Player], 
                    score1: int, score2: int) -> None:
         """Record game results and update player ratings."""
-        # Update last played date for all players
+        self._indices(team1 + team2)
+        # Fold any pending inactivity decay and update last played date, only for players in this game
         for player in team1 + team2:
-            player.last_played = date.today()
+            player.apply_decay()
             player.games_played += 1
             
             # Update win count
@@ -327,134 +1671,153 @@ class VolleyballMatchmaker:
         self._update_chemistry(team1, team1_won)
         self._update_chemistry(team2, not team1_won)
         
-        # Save game result to history
-        with open(self.game_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            date_str = datetime.now().strftime("%Y-%m-%d %H:%M")
-            team1_str = ",".join([p.name for p in team1])
-            team2_str = ",".join([p.name for p in team2])
-            writer.writerow([date_str, team1_str, team2_str, score1, score2])
-        
-        # Add to historical games
-        self.historical_games.append({
-            'date': date.today(),
-            'team1': [p.name for p in team1],
-            'team2': [p.name for p in team2],
-            'score1': score1,
-            'score2': score2
-        })
-        
-        # Apply skill decay to all players
-        self.apply_skill_decay()
+        # Queue game result for the history file
+        game_id = self.game_log.append(datetime.now(), [p.name for p in team1], [p.name for p in team2],
+                                       score1, score2)
         
-        # Save updated player ratings
-        self.save_players()
+        # Snapshot the new ratings, keyed by the game's position in the history
+        self.rating_history.append(game_id, team1 + team2)
+        
+        self._changed_players.update(p.index for p in team1 + team2)
+        for team in (team1, team2):
+            self._changed_pairs.update(itertools.combinations([p.index for p in team], 2))
+        
+        if self.metrics is not None:
+            self.metrics.count('games_recorded')
+        
+        # Persist now unless a batch is open
+        if self._batch_depth == 0:
+            self._flush_games()
+
+    def record_games(self, results: List[Tuple[List[Player], List[Player], int, int]]) -> None:
+        """
+        Record several game results in order with a single write of each file.
+        
+        Args:
+            results: (team1, team2, score1, score2) tuples in the order they were played
+        """
+        with self.batch():
+            for team1, team2, score1, score2 in results:
+                self.record_game(team1, team2, score1, score2)
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer persistence of recorded games until the outermost batch exits.
+        
+        Ratings and chemistry update immediately; the game rows are appended and the
+        player file is saved once on exit.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush_games()
+
+    def flush(self) -> None:
+        """Persist games recorded so far, even inside an open batch (no-op if none are pending)."""
+        self._flush_games()
+
+    @timed_phase('save')
+    def _flush_games(self) -> None:
+        """Append pending game rows and save the players they changed, in one storage transaction."""
+        if not self.game_log.pending:
+            return
+        with self.storage.transaction():
+            written = self.game_log.flush()
+            if self.metrics is not None and written:
+                self.metrics.count('csv_bytes_written', written)
+            
+            # Save updated player ratings
+            self.save_players(changed_only=True)
+        # Snapshots are keyed by game id, so they follow the games to disk
+        self.rating_history.flush()
     
-    def _update_chemistry(self, team: List[Player], won: bool) -> None:
-        """Update chemistry scores between teammates based on game outcome."""
-        # Adjust chemistry for all pairs in the team
-        for p1, p2 in itertools.combinations(team, 2):
-            # Chemistry is bidirectional
-            chem_boost = 5 if won else -2
-            
-            # Initialize chemistry if not present
-            if p2.name not in p1.chemistry:
-                p1.chemistry[p2.name] = 0
-            if p1.name not in p2.chemistry:
-                p2.chemistry[p1.name] = 0
-            
-            # Update chemistry with diminishing returns
-            p1.chemistry[p2.name] = p1.chemistry[p2.name] * 0.95 + chem_boost
-            p2.chemistry[p1.name] = p2.chemistry[p1.name] * 0.95 + chem_boost
-            
-            # Track pair performance for analysis
-            pair_key = tuple(sorted([p1.name, p2.name]))
-            if pair_key not in self.pair_performances:
-                self.pair_performances[pair_key] = []
-            
-            self.pair_performances[pair_key].append(1 if won else 0)
+    def _update_chemistry(self, team: List[Player], won: bool) -> None:
+        """Update chemistry scores between teammates based on game outcome."""
+        # Chemistry is bidirectional, updated with diminishing returns for all pairs at once
+        self.chemistry.update_team([p.index for p in team], chemistry_boost(won))
+        self.invalidate_team_cache()
+
+        # Track pair performance for analysis
+        result = 1 if won else 0
+        for pair_key in itertools.combinations(sorted(p.index for p in team), 2):
+            self.pair_performances.setdefault(pair_key, []).append(result)
     
     def _update_ratings(self, team1: List[Player], team2: List[Player], 
                     team1_won: bool, score1: int, score2: int) -> None:
         """Update player z-scores using a TrueSkill-inspired bayesian approach."""
-        # Calculate team skills using weighted ratings
-        team1_skill = sum(p.weighted_rating() for p in team1) / len(team1)
-        team2_skill = sum(p.weighted_rating() for p in team2) / len(team2)
-        
-        # Calculate team uncertainties
-        team1_uncertainty = math.sqrt(sum(p.sigma ** 2 for p in team1)) / len(team1)
-        team2_uncertainty = math.sqrt(sum(p.sigma ** 2 for p in team2)) / len(team2)
-        
-        # Calculate performance based on actual outcome and score difference
-        score_diff = abs(score1 - score2)
-        perf_diff = score_diff * (1 if team1_won else -1)
-        
-        # Expected performance difference based on ratings
-        expected_diff = team1_skill - team2_skill
-        
-        # Surprise factor - how unexpected was the outcome
-        surprise = perf_diff - expected_diff / self.beta
-        
-        # Dynamic adjustment factor - higher for:
-        # 1. Close games (small score_diff)
-        # 2. Unexpected outcomes (high surprise)
-        # 3. High confidence/low uncertainty (small team_uncertainty)
-        adjustment = self.dynamic_factor * (1.0 / (1.0 + 0.1 * score_diff)) * (1.0 + abs(surprise) / 10.0)
-        
-        # Scale by uncertainty - more certain ratings change less
-        total_uncertainty = team1_uncertainty + team2_uncertainty
-        adjustment *= min(1, total_uncertainty / 100)
-        
-        # Calculate team updates - teams with fewer players get larger individual adjustments
-        team1_update = adjustment * surprise / len(team1)
-        team2_update = -adjustment * surprise / len(team2)
-        
-        # Update individual players, accounting for their current skill relative to team average
-        for player in team1:
-            # Players further from team average get adjusted more (regression to mean)
-            skill_diff = player.z_score - team1_skill
-            individual_update = team1_update - self.uncertainty_factor * (skill_diff / 100)
-            
-            # Update player rating
-            player.z_score += individual_update
-            
-            # Update uncertainty - decrease with more games, but never below minimum
-            player.sigma = max(25, player.sigma * 0.95)
-        
-        for player in team2:
-            skill_diff = player.z_score - team2_skill
-            individual_update = team2_update - self.uncertainty_factor * (skill_diff / 100)
-            
-            # Update player rating
-            player.z_score += individual_update
-            
-            # Update uncertainty
-            player.sigma = max(25, player.sigma * 0.95)
+        team1_skill, team2_skill, team1_update, team2_update = game_rating_updates(
+            [p.weighted_rating() for p in team1], [p.sigma for p in team1],
+            [p.weighted_rating() for p in team2], [p.sigma for p in team2],
+            team1_won, score1, score2, self.beta, self.dynamic_factor)
+        for team, team_skill, team_update in ((team1, team1_skill, team1_update), (team2, team2_skill, team2_update)):
+            for player in team:
+                player.z_score, player.sigma = player_rating_update(player.z_score, player.sigma, team_skill,
+                                                                    team_update, self.uncertainty_factor)
+        
+        self.invalidate_team_cache()
+    
+    def invalidate_team_cache(self) -> None:
+        """Start a new rating version so cached team aggregates and qualities are recomputed."""
+        self.rating_version += 1
+    
+    def _indices(self, players: List[Player]) -> List[int]:
+        """
+        Chemistry ids of players, which must index into this matchmaker's chemistry.
+
+        A Player built without the matchmaker's chemistry matrix numbers its name in a
+        matrix of its own, so its id would point at some other player here.
+        """
+        chemistry = self.chemistry
+        for player in players:
+            if player.chemistry_matrix is not chemistry:
+                raise ValueError(f"{player.name} is not a player of this matchmaker (use matchmaker.players)")
+        return [player.index for player in players]
+
+    def _team_aggregates(self, team: List[Player], signature: Optional[tuple] = None) -> Tuple[float, float, float]:
+        """Cached (average weighted rating, average sigma, chemistry score) for a team."""
+        if isinstance(team, Team):
+            # Teams keep running sums; refresh them once after ratings or chemistry change
+            if team.version != self.rating_version:
+                team.refresh(self.rating_version)
+            return team.average_rating(), team.average_sigma(), team.chemistry_score()
+        
+        indices = self._indices(team)
+        key = (self.rating_version, signature or tuple(indices))
+        aggregates = self.team_cache.get(key)
+        if aggregates is None:
+            aggregates = (sum(p.weighted_rating() for p in team) / len(team),
+                          sum(p.sigma for p in team) / len(team),
+                          self.chemistry.team_score(indices))
+            self.team_cache.put(key, aggregates)
+        return aggregates
     
     def team_chemistry_score(self, team: List[Player]) -> float:
         """Calculate overall team chemistry score."""
-        if len(team) <= 1:
-            return 0
-        
-        total_chemistry = 0
-        pair_count = 0
-        
-        for p1, p2 in itertools.combinations(team, 2):
-            if p2.name in p1.chemistry:
-                total_chemistry += p1.chemistry[p2.name]
-                pair_count += 1
-        
-        return total_chemistry / max(1, pair_count)
+        return self._team_aggregates(team)[2]
     
     def predict_match_quality(self, team1: List[Player], team2: List[Player]) -> float:
         """Predict match quality/closeness (higher is better)."""
-        # Base prediction on weighted skill difference
-        team1_skill = sum(p.weighted_rating() for p in team1) / len(team1)
-        team2_skill = sum(p.weighted_rating() for p in team2) / len(team2)
-        
-        # Add chemistry bonus
-        team1_chemistry = self.team_chemistry_score(team1)
-        team2_chemistry = self.team_chemistry_score(team2)
+        if self.metrics is not None:
+            self.metrics.count('quality_evaluations')
+        # Two Teams already carry their sums; plain player lists go through the cache
+        key = None
+        signature1 = signature2 = None
+        if not (isinstance(team1, Team) and isinstance(team2, Team)):
+            # Quality is symmetric in the two teams, so the pair is keyed without their order
+            signature1 = tuple(self._indices(team1))
+            signature2 = tuple(self._indices(team2))
+            key = (self.rating_version, frozenset((signature1, signature2)))
+            quality = self.team_cache.get(key)
+            if quality is not None:
+                return quality
+        
+        # Base prediction on weighted skill difference, with a chemistry bonus
+        team1_skill, team1_uncertainty, team1_chemistry = self._team_aggregates(team1, signature1)
+        team2_skill, team2_uncertainty, team2_chemistry = self._team_aggregates(team2, signature2)
         
         # Adjust skills based on chemistry
         team1_effective = team1_skill + team1_chemistry * 0.2
@@ -468,18 +1831,41 @@ class VolleyballMatchmaker:
         quality = 100 * (1 / (1 + pred_score_diff/3))
         
         # Account for team uncertainties - less confident predictions get a penalty
-        team1_uncertainty = sum(p.sigma for p in team1) / len(team1)
-        team2_uncertainty = sum(p.sigma for p in team2) / len(team2)
         avg_uncertainty = (team1_uncertainty + team2_uncertainty) / 2
         
         # Reduce quality if uncertainty is high
         confidence_factor = 100 / (100 + avg_uncertainty)
         quality *= confidence_factor
         
+        if key is not None:
+            self.team_cache.put(key, quality)
         return quality
     
-    def create_teams(self, team_size: int = 6, iterations: int = 500) -> Tuple[List[Player], List[Player]]:
-        """Create balanced teams from attending players using optimization."""
+    @timed_phase('search')
+    def create_teams(self, team_size: int = 6, iterations: Optional[int] = None, method: str = 'random',
+                     seed: Optional[int] = None, exact_max_players: int = 24,
+                     workers: Optional[int] = None,
+                     time_budget: Optional[float] = None) -> Tuple[List[Player], List[Player]]:
+        """
+        Create balanced teams from attending players using optimization.
+
+        Args:
+            team_size: Target number of players per team
+            iterations: Number of random shuffles ('random', default 500) or swap
+                        proposals ('anneal', default 2000; each costs O(1) to score)
+            method: 'random' keeps the best of many random shuffles, 'anneal' improves a
+                    snake-drafted split by swapping players (simulated annealing), 'exact'
+                    finds the provably best split with branch and bound
+            seed: Optional seed for a reproducible search (defaults to the global random state)
+            exact_max_players: Above this many attending players, 'exact' falls back to 'anneal'
+            workers: If set, the 'random' search is sharded across this many worker processes
+                     and scored in NumPy batches (same seed and workers, same teams)
+            time_budget: Optional limit in seconds; the search stops early and keeps the
+                         best teams found so far (reproducible only if it is not reached)
+
+        Returns:
+            Tuple of (team1, team2)
+        """
         if len(self.attending_players) < team_size * 2:
             print(f"Warning: Not enough players for two teams of size {team_size}")
             team_size = min(team_size, len(self.attending_players) // 2)
@@ -489,26 +1875,83 @@ class VolleyballMatchmaker:
         
         # Determine how many players per team
         players_per_team = min(team_size, len(available_players) // 2)
-        
-        # Try multiple random combinations and keep the best one
-        best_teams = None
-        best_quality = -1
-        
-        for _ in range(iterations):
-            # Create random teams
-            random.shuffle(available_players)
-            team1 = available_players[:players_per_team]
-            team2 = available_players[players_per_team:players_per_team*2]
-            
-            # Calculate match quality
-            quality = self.predict_match_quality(team1, team2)
-            
-            # Keep track of the best match
-            if quality > best_quality:
-                best_quality = quality
-                best_teams = (team1, team2)
-        
-        team1, team2 = best_teams
+
+        rng = random.Random(seed) if seed is not None else random
+        if method == 'exact' and len(available_players) > exact_max_players:
+            print(f"Note: {len(available_players)} players is above the exact search limit "
+                  f"({exact_max_players}), using anneal instead")
+            method = 'anneal'
+        if iterations is None:
+            iterations = DEFAULT_TEAM_ITERATIONS.get(method, 500)
+
+        # Deferred chemistry is parsed here so that it does not count against the time budget
+        self.chemistry.load()
+        start_time = time.perf_counter()
+        deadline = start_time + time_budget if time_budget is not None else None
+        nodes = None
+        # Convergence trace: (iteration, or nodes for 'exact', best quality so far)
+        trace = self.metrics.trace('create_teams') if self.metrics is not None else None
+
+        if method == 'exact':
+            # A quick anneal gives the branch and bound a strong incumbent to prune against
+            incumbent = self._anneal_teams(available_players, players_per_team, iterations, rng,
+                                           deadline=deadline)
+            team1, team2, nodes = self._exact_teams(available_players, players_per_team, incumbent, trace,
+                                                    deadline=deadline)
+            best_quality = self.predict_match_quality(team1, team2)
+        elif method == 'anneal':
+            team1, team2 = self._anneal_teams(available_players, players_per_team, iterations, rng, trace=trace,
+                                              deadline=deadline)
+            best_quality = self.predict_match_quality(team1, team2)
+        elif method == 'random' and workers:
+            search_seed = seed if seed is not None else random.getrandbits(64)
+            best_value, best_assignment = parallel_search(
+                _two_team_search_shard, self._search_worker_arrays(available_players), iterations,
+                workers, search_seed, players_per_team, SEARCH_BATCH_SIZE, minimize=False,
+                time_budget=time_budget)
+            if self.metrics is not None:
+                # Shards run in worker processes, so only the final result is traced
+                self.metrics.count('quality_evaluations', iterations)
+                trace.append((iterations, best_value))
+            team1 = [available_players[j] for j in np.flatnonzero(best_assignment == 0)]
+            team2 = [available_players[j] for j in np.flatnonzero(best_assignment == 1)]
+            best_quality = self.predict_match_quality(team1, team2)
+        elif method == 'random':
+            # Try multiple random combinations and keep the best one
+            best_teams = None
+            best_quality = -1
+
+            for iteration in range(iterations):
+                # Create random teams
+                rng.shuffle(available_players)
+                team1 = available_players[:players_per_team]
+                team2 = available_players[players_per_team:players_per_team*2]
+
+                # Calculate match quality
+                quality = self.predict_match_quality(team1, team2)
+
+                # Keep track of the best match
+                if quality > best_quality:
+                    best_quality = quality
+                    best_teams = (team1, team2)
+                    if trace is not None:
+                        trace.append((iteration + 1, quality))
+
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+
+            team1, team2 = best_teams
+        else:
+            raise ValueError(f"Unknown team creation method: {method}")
+
+        self.last_search_stats = {
+            'method': method,
+            'iterations': iterations,
+            'nodes': nodes,
+            'seconds': time.perf_counter() - start_time,
+            'quality': best_quality,
+            'timed_out': deadline is not None and time.perf_counter() > deadline,
+        }
         
         # Calculate team statistics for display
         team1_skill = sum(p.weighted_rating() for p in team1) / len(team1)
@@ -519,9 +1962,363 @@ class VolleyballMatchmaker:
         print(f"Team 1 - Avg Rating: {team1_skill:.1f}, Chemistry: {team1_chem:.1f}")
         print(f"Team 2 - Avg Rating: {team2_skill:.1f}, Chemistry: {team2_chem:.1f}")
         print(f"Match Quality: {best_quality:.1f}/100")
-        
+        if nodes is not None:
+            print(f"Exact search: {nodes} nodes explored in {self.last_search_stats['seconds'] * 1000:.1f} ms")
+
         return team1, team2
-    
+
+    def _anneal_teams(self, players: List[Player], players_per_team: int, iterations: int,
+                      rng: random.Random, chain_length: int = 100, start_temperature: float = 5.0,
+                      end_temperature: float = 0.05, trace: Optional[list] = None,
+                      deadline: Optional[float] = None) -> Tuple[List[Player], List[Player]]:
+        """
+        Simulated annealing over two-team splits.
+
+        The first chain starts from a snake draft by weighted rating, later chains restart
+        from random splits. Each step proposes a swap between team 1, team 2 and the bench
+        (players who sit out). Team rating sums, sigma sums and chemistry sums are updated
+        incrementally, so each proposal is scored in O(1). If trace is given, (proposals
+        scored, best quality) is appended whenever the best improves. Chains stop once
+        time.perf_counter() passes deadline; at least the seeded split is always scored.
+        """
+        participants = players.copy()
+        rng.shuffle(participants)
+        n = len(participants)
+        ratings = [p.weighted_rating() for p in participants]
+        sigmas = [p.sigma for p in participants]
+        pair_chem, pair_known = _symmetric_chemistry(*self.chemistry.submatrix([p.index for p in participants]))
+
+        def quality_of(r1, s1, c1, k1, r2, s2, c2, k2):
+            return _match_quality_from_totals(r1, s1, c1 / max(1, k1), players_per_team,
+                                              r2, s2, c2 / max(1, k2), players_per_team)
+
+        best_quality = -1
+        best_members = None
+        evaluations = 0
+        num_chains = max(1, iterations // chain_length)
+        steps_per_chain = max(1, iterations // num_chains)
+        cooling = (end_temperature / start_temperature) ** (1 / max(1, steps_per_chain - 1))
+
+        for chain in range(num_chains):
+            if chain > 0 and deadline is not None and time.perf_counter() > deadline:
+                break
+            order = list(range(n))
+            if chain == 0:
+                # Seeded split: snake draft by rating, the rest sit on the bench
+                drafted = sorted(order[:2 * players_per_team], key=lambda i: ratings[i], reverse=True)
+                members = [[], [], order[2 * players_per_team:]]  # team1, team2, bench
+                for rank, i in enumerate(drafted):
+                    members[0 if rank % 4 in (0, 3) else 1].append(i)
+            else:
+                rng.shuffle(order)
+                members = [order[:players_per_team], order[players_per_team:2 * players_per_team],
+                           order[2 * players_per_team:]]
+
+            # Running team totals, and each player's chemistry with each team
+            rating_sums = [sum(ratings[i] for i in members[t]) for t in range(2)]
+            sigma_sums = [sum(sigmas[i] for i in members[t]) for t in range(2)]
+            chem_to = [[sum(pair_chem[i][j] for j in members[t]) for i in range(n)] for t in range(2)]
+            known_to = [[sum(pair_known[i][j] for j in members[t]) for i in range(n)] for t in range(2)]
+            chem_sums = [sum(chem_to[t][i] for i in members[t]) / 2 for t in range(2)]
+            chem_pairs = [sum(known_to[t][i] for i in members[t]) / 2 for t in range(2)]
+
+            quality = quality_of(rating_sums[0], sigma_sums[0], chem_sums[0], chem_pairs[0],
+                                 rating_sums[1], sigma_sums[1], chem_sums[1], chem_pairs[1])
+            evaluations += 1
+            if quality > best_quality:
+                best_quality = quality
+                best_members = (members[0].copy(), members[1].copy())
+                if trace is not None:
+                    trace.append((evaluations, quality))
+
+            temperature = start_temperature
+            for step in range(steps_per_chain):
+                if deadline is not None and step % 256 == 0 and time.perf_counter() > deadline:
+                    break
+                # Swap a player on team x with a player on the other team or on the bench
+                x = rng.randrange(2)
+                y = 1 - x if not members[2] or rng.random() < 0.5 else 2
+                a_pos = rng.randrange(len(members[x]))
+                b_pos = rng.randrange(len(members[y]))
+                a = members[x][a_pos]
+                b = members[y][b_pos]
+
+                totals = [rating_sums[0], sigma_sums[0], chem_sums[0], chem_pairs[0],
+                          rating_sums[1], sigma_sums[1], chem_sums[1], chem_pairs[1]]
+                # Team x loses a and gains b
+                ox = 4 * x
+                totals[ox] += ratings[b] - ratings[a]
+                totals[ox + 1] += sigmas[b] - sigmas[a]
+                totals[ox + 2] += chem_to[x][b] - pair_chem[a][b] - chem_to[x][a]
+                totals[ox + 3] += known_to[x][b] - pair_known[a][b] - known_to[x][a]
+                if y < 2:
+                    # Team y loses b and gains a
+                    oy = 4 * y
+                    totals[oy] += ratings[a] - ratings[b]
+                    totals[oy + 1] += sigmas[a] - sigmas[b]
+                    totals[oy + 2] += chem_to[y][a] - pair_chem[a][b] - chem_to[y][b]
+                    totals[oy + 3] += known_to[y][a] - pair_known[a][b] - known_to[y][b]
+
+                new_quality = quality_of(*totals)
+                evaluations += 1
+                delta = new_quality - quality
+                if delta >= 0 or rng.random() < math.exp(delta / temperature):
+                    rating_sums = [totals[0], totals[4]]
+                    sigma_sums = [totals[1], totals[5]]
+                    chem_sums = [totals[2], totals[6]]
+                    chem_pairs = [totals[3], totals[7]]
+                    members[x][a_pos] = b
+                    members[y][b_pos] = a
+
+                    chem_a, chem_b = pair_chem[a], pair_chem[b]
+                    known_a, known_b = pair_known[a], pair_known[b]
+                    chem_to[x] = [c - ca + cb for c, ca, cb in zip(chem_to[x], chem_a, chem_b)]
+                    known_to[x] = [k - ka + kb for k, ka, kb in zip(known_to[x], known_a, known_b)]
+                    if y < 2:
+                        chem_to[y] = [c + ca - cb for c, ca, cb in zip(chem_to[y], chem_a, chem_b)]
+                        known_to[y] = [k + ka - kb for k, ka, kb in zip(known_to[y], known_a, known_b)]
+
+                    quality = new_quality
+                    if quality > best_quality:
+                        best_quality = quality
+                        best_members = (members[0].copy(), members[1].copy())
+                        if trace is not None:
+                            trace.append((evaluations, quality))
+
+                temperature *= cooling
+
+        if self.metrics is not None:
+            self.metrics.count('quality_evaluations', evaluations)
+        return ([participants[i] for i in best_members[0]],
+                [participants[i] for i in best_members[1]])
+
+    def _exact_teams(self, players: List[Player], players_per_team: int,
+                     incumbent: Tuple[List[Player], List[Player]], trace: Optional[list] = None,
+                     deadline: Optional[float] = None) -> Tuple[List[Player], List[Player], int]:
+        """
+        Branch-and-bound search for the split with the highest predicted match quality.
+
+        Players are taken in descending rating order and each is placed on team 1, team 2
+        or the bench. A node is pruned when the best quality still reachable from it cannot
+        beat the incumbent: the reachable rating difference is bounded by filling the open
+        slots of one team with the strongest remaining players and the other with the
+        weakest (remaining players are a sorted suffix, so this is O(1) with prefix sums),
+        chemistry by the range of pair chemistry, and uncertainty by the lowest remaining sigmas.
+
+        If trace is given, (nodes explored, best quality) is appended for the incumbent and
+        every improvement. Past deadline (a time.perf_counter() value) the search stops and
+        the best split found so far is returned, which is then no longer proven optimal.
+
+        Returns:
+            Tuple of (team1, team2, nodes explored)
+        """
+        participants = sorted(players, key=lambda p: p.weighted_rating(), reverse=True)
+        n = len(participants)
+        ratings = [p.weighted_rating() for p in participants]
+        sigmas = [p.sigma for p in participants]
+        pair_chem, pair_known = _symmetric_chemistry(*self.chemistry.submatrix([p.index for p in participants]))
+        bench_slots = n - 2 * players_per_team
+
+        # Prefix sums of the (descending) ratings: the strongest k of suffix i are i..i+k-1
+        rating_prefix = [0.0]
+        for r in ratings:
+            rating_prefix.append(rating_prefix[-1] + r)
+        # For each suffix, prefix sums of its sigmas in ascending order
+        low_sigma_prefix = []
+        for i in range(n + 1):
+            sums = [0.0]
+            for s in sorted(sigmas[i:]):
+                sums.append(sums[-1] + s)
+            low_sigma_prefix.append(sums)
+
+        known_values = [pair_chem[i][j] for i in range(n) for j in range(i + 1, n) if pair_known[i][j]]
+        chem_low = min([0.0] + known_values)
+        chem_high = max([0.0] + known_values)
+
+        def split_quality(team1_idx, team2_idx):
+            totals = []
+            for team in (team1_idx, team2_idx):
+                chem_sum = sum(pair_chem[i][j] for i, j in itertools.combinations(team, 2))
+                chem_pairs = sum(pair_known[i][j] for i, j in itertools.combinations(team, 2))
+                totals.append((sum(ratings[i] for i in team), sum(sigmas[i] for i in team),
+                               chem_sum / max(1, chem_pairs)))
+            return _match_quality_from_totals(*totals[0], players_per_team, *totals[1], players_per_team)
+
+        positions = {id(p): i for i, p in enumerate(participants)}
+        best_members = ([positions[id(p)] for p in incumbent[0]], [positions[id(p)] for p in incumbent[1]])
+        best_quality = split_quality(*best_members)
+        if trace is not None:
+            trace.append((0, best_quality))
+
+        # Quality can never exceed a zero rating difference with the lowest possible uncertainty
+        ceiling = _match_quality_from_totals(0.0, low_sigma_prefix[0][2 * players_per_team], 0.0, players_per_team,
+                                             0.0, 0.0, 0.0, players_per_team)
+        tolerance = 1e-9
+        nodes = 0
+        timed_out = False
+        members = ([], [])
+        chem = [0.0, 0.0]
+        chem_pairs = [0, 0]
+        rating_sums = [0.0, 0.0]
+
+        def search(i, open1, open2, open_bench, sigma_sum):
+            nonlocal best_quality, best_members, nodes, timed_out
+            if timed_out:
+                return
+            nodes += 1
+            if deadline is not None and nodes % 1024 == 0 and time.perf_counter() > deadline:
+                timed_out = True
+                return
+
+            if open1 == 0 and open2 == 0:
+                quality = _match_quality_from_totals(
+                    rating_sums[0], sigma_sum, chem[0] / max(1, chem_pairs[0]), players_per_team,
+                    rating_sums[1], 0.0, chem[1] / max(1, chem_pairs[1]), players_per_team)
+                if quality > best_quality + tolerance:
+                    best_quality = quality
+                    best_members = (members[0].copy(), members[1].copy())
+                    if trace is not None:
+                        trace.append((nodes, quality))
+                return
+
+            # Bound the final rating difference (team1 - team2) reachable from here
+            top1 = rating_prefix[i + open1] - rating_prefix[i]
+            top2 = rating_prefix[i + open2] - rating_prefix[i]
+            bottom1 = rating_prefix[n] - rating_prefix[n - open1]
+            bottom2 = rating_prefix[n] - rating_prefix[n - open2]
+            high = (rating_sums[0] + top1 - rating_sums[1] - bottom2) / players_per_team
+            low = (rating_sums[0] + bottom1 - rating_sums[1] - top2) / players_per_team
+
+            # Chemistry is exact for a full team, otherwise anywhere in the pair chemistry range
+            chem1 = chem[0] / max(1, chem_pairs[0])
+            chem2 = chem[1] / max(1, chem_pairs[1])
+            high += 0.2 * ((chem1 if open1 == 0 else chem_high) - (chem2 if open2 == 0 else chem_low))
+            low += 0.2 * ((chem1 if open1 == 0 else chem_low) - (chem2 if open2 == 0 else chem_high))
+            min_diff = 0.0 if low <= 0.0 <= high else min(abs(low), abs(high))
+
+            # Same formula as predict_match_quality, inlined since it runs at every node
+            min_uncertainty = (sigma_sum + low_sigma_prefix[i][open1 + open2]) / (2 * players_per_team)
+            bound = 100 / (1 + min_diff / 7.5) * (100 / (100 + min_uncertainty))
+            if bound <= best_quality + tolerance:
+                return
+
+            # Try the weaker team first (Karmarkar-Karp style greedy ordering)
+            sides = (0, 1) if rating_sums[0] <= rating_sums[1] else (1, 0)
+            for t in sides:
+                if (open1, open2)[t] == 0:
+                    continue
+                # Teams are interchangeable, so the first player placed always joins team 1
+                if t == 1 and not members[0]:
+                    continue
+                chem_gain = sum(pair_chem[i][j] for j in members[t])
+                known_gain = sum(pair_known[i][j] for j in members[t])
+                members[t].append(i)
+                rating_sums[t] += ratings[i]
+                chem[t] += chem_gain
+                chem_pairs[t] += known_gain
+                search(i + 1, open1 - (t == 0), open2 - (t == 1), open_bench, sigma_sum + sigmas[i])
+                members[t].pop()
+                rating_sums[t] -= ratings[i]
+                chem[t] -= chem_gain
+                chem_pairs[t] -= known_gain
+                if best_quality >= ceiling - tolerance:
+                    return
+
+            if open_bench > 0:
+                search(i + 1, open1, open2, open_bench - 1, sigma_sum)
+
+        if best_quality < ceiling - tolerance:
+            search(0, players_per_team, players_per_team, bench_slots, 0.0)
+        if self.metrics is not None:
+            self.metrics.count('search_nodes', nodes)
+
+        return ([participants[i] for i in best_members[0]],
+                [participants[i] for i in best_members[1]], nodes)
+
+    def _search_arrays(self, players: List[Player]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Weighted ratings, sigmas and chemistry (values, known mask) of players as arrays."""
+        if all(p.table is self.player_table for p in players):
+            # Gather straight from the player table's arrays
+            rows = np.array([p.row for p in players], dtype=np.int64)
+            ratings = self.player_table.weighted_ratings(rows)
+            sigmas = self.player_table.sigma[rows]
+        else:
+            ratings = np.array([p.weighted_rating() for p in players], dtype=np.float64)
+            sigmas = np.array([p.sigma for p in players], dtype=np.float64)
+
+        chemistry, chemistry_known = self.chemistry.submatrix(self._indices(players))
+        return ratings, sigmas, chemistry, chemistry_known
+
+    def _search_worker_arrays(self, players: List[Player]) -> Dict[str, np.ndarray]:
+        """Compact per-player arrays shipped to search workers."""
+        ratings, sigmas, chemistry, chemistry_known = self._search_arrays(players)
+        return {
+            'ratings': ratings,
+            'sigmas': sigmas,
+            'chemistry': chemistry,
+            'chemistry_known': chemistry_known,
+            'is_a_tier': np.array([p.skill_group == 'A' for p in players], dtype=bool),
+        }
+
+    def evaluate_team_assignments(self, players: List[Player], assignments: np.ndarray,
+                                  num_teams: int, team_size: int) -> np.ndarray:
+        """
+        Score a batch of candidate partitions of players.
+
+        Args:
+            players: Players being partitioned (column j of assignments refers to players[j])
+            assignments: (candidates, len(players)) integer matrix of team indices, -1 for unassigned
+            num_teams: Number of teams in each candidate
+            team_size: Target team size used to normalize smaller teams
+
+        Returns:
+            Array of balance scores (lower is better), one per candidate
+        """
+        ratings, sigmas, chemistry, chemistry_known = self._search_arrays(players)
+        return batch_balance_scores(ratings, sigmas, chemistry, chemistry_known,
+                                    np.asarray(assignments), num_teams, team_size)
+
+    def _balance_score(self, teams: List[List[Player]], team_size: int, global_avg_rating: float) -> float:
+        """Balance score of one set of teams (lower is better)."""
+        # Calculate normalized team ratings to account for different team sizes
+        team_ratings = []
+        for team in teams:
+            if len(team) == team_size:
+                # For full-sized teams, use actual average
+                team_avg = sum(p.weighted_rating() for p in team) / len(team)
+            else:
+                # For smaller teams, add "virtual players" at the global average rating
+                total_rating = sum(p.weighted_rating() for p in team)
+                missing_players = team_size - len(team)
+                team_avg = (total_rating + (missing_players * global_avg_rating)) / team_size
+
+            team_ratings.append(team_avg)
+
+        # Calculate the range and variance of normalized ratings
+        rating_variance = np.var(team_ratings)
+        rating_range = max(team_ratings) - min(team_ratings)
+
+        # Also calculate average quality across all possible matchups
+        quality_sum = 0
+        matchup_count = 0
+
+        for i in range(len(teams)):
+            for j in range(i+1, len(teams)):
+                quality = self.predict_match_quality(teams[i], teams[j])
+                quality_sum += quality
+                matchup_count += 1
+
+        avg_quality = quality_sum / max(1, matchup_count)
+
+        # Calculate team chemistry factor
+        avg_chemistry = sum(self.team_chemistry_score(team) for team in teams) / len(teams)
+
+        # Combined balance score (heavily weighted towards rating balance)
+        return (rating_variance * 10.0) + \
+               (rating_range * 3.0) - \
+               (avg_quality / 100) - \
+               (avg_chemistry / 10)
+
     def manual_team_feedback(self, team1: List[Player], team2: List[Player], 
                             predicted_winner: int) -> None:
         """Update ratings based on user prediction of which team is stronger."""
@@ -534,6 +2331,7 @@ class VolleyballMatchmaker:
         # Update games played per player
         for player in team1 + team2:
             player.games_played += 1
+        self.invalidate_team_cache()
         
         # Save updated player ratings
         self.save_players()
@@ -545,55 +2343,52 @@ class VolleyballMatchmaker:
         
         player = self.players[player_name]
         
-        # Get recent games
-        recent_games = []
-        for game in reversed(self.historical_games):
-            if player_name in game['team1'] or player_name in game['team2']:
-                in_team1 = player_name in game['team1']
-                recent_games.append({
-                    'date': game['date'],
-                    'team': 1 if in_team1 else 2,
-                    'score': f"{game['score1']}-{game['score2']}",
-                    'won': (in_team1 and game['score1'] > game['score2']) or 
-                           (not in_team1 and game['score2'] > game['score1'])
-                })
-                if len(recent_games) >= 10:
-                    break
+        # Rating after each of the last 10 recorded games, oldest first
+        rating_trend = self.rating_history.player_history(player_name)['z_score'][-10:].tolist()
         
-        # Get best teammates (highest chemistry)
-        best_teammates = sorted(
-            [(name, score) for name, score in player.chemistry.items()],
-            key=lambda x: x[1], reverse=True
-        )[:5]
-        
-        # Calculate win percentage
-        win_pct = player.wins / player.games_played * 100 if player.games_played > 0 else 0
-        
-        # Rating trend
-        rating_history = []
-        for game in self.historical_games:
-            if player_name in game['team1'] or player_name in game['team2']:
-                # This would be approximate since we'd need to store historical ratings
-                # For a real implementation, we'd track rating after each game
-                pass
+        fields = ('name', 'skill_group', 'z_score', 'sigma') + COUNT_FIELDS
+        return player_stats({field: getattr(player, field) for field in fields},
+                            best_teammates(player.chemistry), self.game_log, rating_trend)
+    
+    def recent_games(self, player_name: str, limit: int = 10) -> List[Dict]:
+        """
+        Most recent games for a player, newest first.
         
-        return {
-            'name': player.name,
-            'skill_group': player.skill_group,
-            'rating': player.z_score,
-            'uncertainty': player.sigma,
-            'confidence_interval': player.rating_range(),
-            'games_played': player.games_played,
-            'wins': player.wins,
-            'win_percentage': win_pct,
-            'points_scored': player.points_scored,
-            'points_allowed': player.points_allowed,
-            'best_teammates': best_teammates,
-            'recent_games': recent_games
-        }
+        Args:
+            player_name: Player to look up
+            limit: Maximum number of games to return
+            
+        Returns:
+            List of dicts with date, team, score and won
+        """
+        return recent_games(self.game_log, player_name, limit)
+    
+    def current_streak(self, player_name: str) -> Tuple[str, int]:
+        """
+        Current run of consecutive wins or losses (ties count as losses, as in recent games).
+        
+        Returns:
+            Tuple of ('W' or 'L', length), or ('', 0) if the player has no games
+        """
+        return current_streak(self.game_log, player_name)
+    
+    def head_to_head(self, player_a: str, player_b: str) -> Dict:
+        """
+        Record of two players with and against each other.
+        
+        Args:
+            player_a: First player
+            player_b: Second player
+            
+        Returns:
+            Dict with games/wins as teammates and games/wins for player_a against player_b
+        """
+        return head_to_head(self.game_log, player_a, player_b)
     
     def create_multiple_teams(self, team_size: int = 6, num_teams: int = None, iterations: int = 200,
-                             schedule_rounds: int = None) -> List[List[Player]]:
+                             schedule_rounds: int = None, batch_size: int = SEARCH_BATCH_SIZE,
+                             workers: Optional[int] = None, seed: Optional[int] = None,
+                             time_budget: Optional[float] = None) -> List[Team]:
         """
         Create multiple balanced teams from all attending players.
         
@@ -602,154 +2397,110 @@ class VolleyballMatchmaker:
             num_teams: Specific number of teams to create (if None, creates maximum possible)
             iterations: Number of optimization attempts
             schedule_rounds: Number of rounds to schedule (if None, maximum possible)
+            batch_size: Number of candidate partitions scored together per NumPy batch
+            workers: If set, shard the iterations across this many worker processes
+            seed: Optional seed for a reproducible search (same seed and workers, same teams)
+            time_budget: Optional limit in seconds for the team search and the schedule together
             
         Returns:
-            List of teams, where each team is a list of players
+            List of teams, each a Team (a sequence of players with running rating sums)
         """
-        available_players = self.attending_players.copy()
-        total_players = len(available_players)
-        
-        # Determine how many teams to create
-        if num_teams is not None:
-            # User specified number of teams
-            if num_teams < 2:
-                print("Need at least 2 teams")
-                return []
-        else:
-            # Calculate optimal number of teams to include everyone
-            # Prefer teams of size [team_size] or [team_size-1]
-            num_teams = (total_players + team_size - 1) // team_size  # Ceiling division
-            
-        # Make sure we have enough players for the requested number of teams
-        min_players_needed = num_teams * (team_size - 1)  # Allow teams to be 1 player smaller
-        if total_players < min_players_needed:
-            print(f"Warning: Not enough players for {num_teams} teams with at least {team_size-1} players each")
-            # Reduce number of teams if necessary
-            num_teams = max(2, total_players // (team_size - 1))
-            print(f"Creating {num_teams} teams instead")
-        
-        print(f"Creating {num_teams} teams with approximately {total_players // num_teams} players each")
-        
-        # Calculate player distribution
-        base_size = total_players // num_teams  # Minimum players per team
-        extra_players = total_players % num_teams  # Teams that get an extra player
-        
-        if base_size < team_size - 1:
-            print(f"Note: Teams will have {base_size} players each")
-        elif extra_players > 0:
-            print(f"Note: {extra_players} teams will have {base_size + 1} players, the rest will have {base_size}")
-        
-        # Optimization approach to create balanced teams
-        best_teams = None
-        best_balance_score = float('inf')  # Lower is better (less variance)
-        
-        for _ in range(iterations):
-            # Shuffle the players for this iteration
-            random.shuffle(available_players)
-            
-            # Pre-sort A-tier players to distribute them
-            a_tier_players = [p for p in available_players if p.skill_group == 'A']
-            non_a_players = [p for p in available_players if p.skill_group != 'A']
-            
+        # The team search only; the schedule optimizer below times its own phase
+        with phase(self.metrics, 'search'):
+            self.chemistry.load()
+            deadline = time.perf_counter() + time_budget if time_budget is not None else None
+            available_players = self.attending_players.copy()
+            total_players = len(available_players)
+        
+            # Determine how many teams to create
+            if num_teams is not None:
+                # User specified number of teams
+                if num_teams < 2:
+                    print("Need at least 2 teams")
+                    return []
+            else:
+                # Calculate optimal number of teams to include everyone
+                # Prefer teams of size [team_size] or [team_size-1]
+                num_teams = (total_players + team_size - 1) // team_size  # Ceiling division
+            
+            # Make sure we have enough players for the requested number of teams
+            min_players_needed = num_teams * (team_size - 1)  # Allow teams to be 1 player smaller
+            if total_players < min_players_needed:
+                print(f"Warning: Not enough players for {num_teams} teams with at least {team_size-1} players each")
+                # Reduce number of teams if necessary
+                num_teams = max(2, total_players // (team_size - 1))
+                print(f"Creating {num_teams} teams instead")
+        
+            print(f"Creating {num_teams} teams with approximately {total_players // num_teams} players each")
+        
+            # Calculate player distribution
+            base_size = total_players // num_teams  # Minimum players per team
+            extra_players = total_players % num_teams  # Teams that get an extra player
+        
+            if base_size < team_size - 1:
+                print(f"Note: Teams will have {base_size} players each")
+            elif extra_players > 0:
+                print(f"Note: {extra_players} teams will have {base_size + 1} players, the rest will have {base_size}")
+        
+            # Optimization approach to create balanced teams
+            best_teams = None
+            best_balance_score = float('inf')  # Lower is better (less variance)
+
             # Check if we can distribute A players evenly
-            if len(a_tier_players) > num_teams:
-                print(f"Warning: More A-tier players ({len(a_tier_players)}) than teams ({num_teams})!")
-            
-            # Create teams with calculated distribution but ensure A-tier players are distributed
-            teams = [[] for _ in range(num_teams)]
-            
-            # First, distribute A-tier players (at most one per team)
-            for i, player in enumerate(a_tier_players):
-                if i < num_teams:  # Assign one A player per team until we run out of teams
-                    teams[i].append(player)
-                else:
-                    # If we have more A players than teams, add to non-A list to be distributed later
-                    non_a_players.append(player)
-            
-            # Shuffle the remaining players
-            random.shuffle(non_a_players)
-            
-            # Distribute remaining players to balance team sizes
-            player_index = 0
-            for i in range(num_teams):
-                # Calculate remaining spots needed
-                current_team_size = len(teams[i])
-                target_size = base_size + (1 if i < extra_players else 0)
-                spots_needed = target_size - current_team_size
-                
-                # Add remaining players
-                if spots_needed > 0 and player_index + spots_needed <= len(non_a_players):
-                    teams[i].extend(non_a_players[player_index:player_index + spots_needed])
-                    player_index += spots_needed
-            
-            # Skip if we couldn't create enough balanced teams
-            if any(len(team) < base_size - 1 for team in teams):
-                continue
-                
-            # Calculate normalized team ratings to account for different team sizes
-            team_ratings = []
-            all_player_ratings = [p.weighted_rating() for p in available_players]
-            global_avg_rating = sum(all_player_ratings) / len(all_player_ratings)
-            
-            for team in teams:
-                if len(team) == team_size:
-                    # For full-sized teams, use actual average
-                    team_avg = sum(p.weighted_rating() for p in team) / len(team)
-                else:
-                    # For smaller teams, add "virtual players" at the global average rating
-                    total_rating = sum(p.weighted_rating() for p in team)
-                    missing_players = team_size - len(team)
-                    normalized_rating = (total_rating + (missing_players * global_avg_rating)) / team_size
-                    team_avg = normalized_rating
-                
-                team_ratings.append(team_avg)
-            
-            # Calculate the range and variance of normalized ratings
-            rating_variance = np.var(team_ratings)
-            rating_range = max(team_ratings) - min(team_ratings)
-            
-            # Also calculate average quality across all possible matchups
-            quality_sum = 0
-            matchup_count = 0
-            
-            for i in range(len(teams)):
-                for j in range(i+1, len(teams)):
-                    quality = self.predict_match_quality(teams[i], teams[j])
-                    quality_sum += quality
-                    matchup_count += 1
-            
-            avg_quality = quality_sum / max(1, matchup_count)
-            
-            # Calculate team chemistry factor
-            avg_chemistry = sum(self.team_chemistry_score(team) for team in teams) / len(teams)
-            
-            # Combined balance score (heavily weighted towards rating balance)
-            # Lower score is better
-            balance_score = (rating_variance * 10.0) + \
-                           (rating_range * 3.0) - \
-                           (avg_quality / 100) - \
-                           (avg_chemistry / 10)
-            
-            if balance_score < best_balance_score:
-                best_balance_score = balance_score
-                best_teams = teams.copy()
-        
-        # If we couldn't create balanced teams, try with fewer iterations
-        if best_teams is None:
-            print("Failed to create balanced teams. Using simple division.")
-            random.shuffle(available_players)
-            best_teams = []
-            player_index = 0
-            
-            for i in range(num_teams):
-                # Determine team size (some teams get an extra player)
-                current_team_size = base_size + (1 if i < extra_players else 0)
+            is_a_tier = np.array([p.skill_group == 'A' for p in available_players], dtype=bool)
+            if is_a_tier.sum() > num_teams:
+                print(f"Warning: More A-tier players ({is_a_tier.sum()}) than teams ({num_teams})!")
+
+            # Candidates are scored in batches as rows of a team assignment matrix
+            arrays = self._search_worker_arrays(available_players)
+            search_seed = seed if seed is not None else random.getrandbits(64)
+            best_assignment = None
+
+            # Skip if we couldn't create enough balanced teams (team sizes are the same for every candidate)
+            template = random_team_assignments(np.random.default_rng(0), is_a_tier, num_teams,
+                                               base_size, extra_players, 1)[0]
+            team_sizes = np.bincount(template[template >= 0], minlength=num_teams)
+
+            # Convergence trace: (candidates scored, best balance score so far)
+            trace = self.metrics.trace('create_multiple_teams') if self.metrics is not None else None
+            if (team_sizes < base_size - 1).any() or iterations <= 0:
+                pass
+            elif workers:
+                best_balance_score, best_assignment = parallel_search(
+                    _multi_team_search_shard, arrays, iterations, workers, search_seed,
+                    num_teams, base_size, extra_players, team_size, batch_size, time_budget=time_budget)
+                if trace is not None:
+                    # Shards run in worker processes, so only the final result is traced
+                    trace.append((iterations, best_balance_score))
+            else:
+                best_balance_score, best_assignment = _multi_team_search_shard(
+                    arrays, search_seed, 0, iterations, num_teams, base_size, extra_players, team_size, batch_size,
+                    trace, time_budget)
+            if self.metrics is not None and best_assignment is not None:
+                self.metrics.count('balance_evaluations', iterations)
+
+            if best_assignment is not None:
+                best_teams = [Team(self.chemistry, [available_players[j] for j in np.flatnonzero(best_assignment == i)],
+                                   self.rating_version)
+                              for i in range(num_teams)]
+
+            # If we couldn't create balanced teams, try with fewer iterations
+            if best_teams is None:
+                print("Failed to create balanced teams. Using simple division.")
+                random.shuffle(available_players)
+                best_teams = []
+                player_index = 0
+            
+                for i in range(num_teams):
+                    # Determine team size (some teams get an extra player)
+                    current_team_size = base_size + (1 if i < extra_players else 0)
                 
-                # Create team
-                if player_index + current_team_size <= len(available_players):
-                    team = available_players[player_index:player_index + current_team_size]
-                    best_teams.append(team)
-                    player_index += current_team_size
+                    # Create team
+                    if player_index + current_team_size <= len(available_players):
+                        team = Team(self.chemistry, available_players[player_index:player_index + current_team_size],
+                                    self.rating_version)
+                        best_teams.append(team)
+                        player_index += current_team_size
         
         # For displaying team info, we'll show both actual and normalized ratings
         print("\nTeams created:")
@@ -760,14 +2511,14 @@ class VolleyballMatchmaker:
         
         for i, team in enumerate(best_teams):
             # Actual average rating
-            team_skill = sum(p.weighted_rating() for p in team) / len(team)
+            team_skill = team.average_rating()
             team_ratings.append(team_skill)
             
             # Normalized rating (for comparing teams of different sizes)
             if len(team) == team_size:
                 norm_rating = team_skill
             else:
-                total_rating = sum(p.weighted_rating() for p in team)
+                total_rating = team.rating_sum
                 missing_players = team_size - len(team)
                 norm_rating = (total_rating + (missing_players * global_avg_rating)) / team_size
             
@@ -783,18 +2534,32 @@ class VolleyballMatchmaker:
         print(f"\nTeam Balance Statistics:")
         print(f"  Normalized Rating Range: {min(normalized_ratings):.1f} - {max(normalized_ratings):.1f} (spread: {rating_range:.1f})")
         print(f"  Normalized Rating Variance: {rating_variance:.2f}")
+        print(f"  Balance Score: {self._balance_score(best_teams, team_size, global_avg_rating):.2f}")
         print(f"  Perfect Balance: {'Yes' if rating_range < 5.0 else 'No'}")
         
         # For matchups, we'll also update to show normalized ratings
         if schedule_rounds is not None and schedule_rounds > 0:
-            # Create the schedule first
-            schedule = self.create_match_schedule(best_teams, schedule_rounds)
+            # Create the schedule first; without a seed the same teams still get the same schedule
+            schedule_seed = seed if seed is not None else 0
+            if deadline is not None:
+                # The schedule optimizer gets at most whatever the team search left over
+                schedule = self.create_match_schedule(best_teams, schedule_rounds,
+                                                      time_budget=min(0.5, max(0.0, deadline - time.perf_counter())),
+                                                      seed=schedule_seed)
+            else:
+                schedule = self.create_match_schedule(best_teams, schedule_rounds, seed=schedule_seed)
+            stats = self.last_schedule_stats
+            print(f"\nSchedule quality: worst {stats['worst_quality']:.1f}, total {stats['total_quality']:.1f} "
+                  f"(circle method: worst {stats['circle_worst_quality']:.1f}, total {stats['circle_total_quality']:.1f})")
             # Then display it with normalized ratings
             self.display_match_schedule(best_teams, schedule, normalized_ratings)
         else:
             # Create matchups showing normalized ratings
             print("\nRecommended Matchups:")
             optimal_matchups = self.create_optimal_matchups(best_teams)
+            stats = self.last_matchup_stats
+            print(f"Total quality {stats['total_quality']:.1f} (worst {stats['worst_quality']:.1f}) vs greedy "
+                  f"{stats['greedy_total_quality']:.1f} (worst {stats['greedy_worst_quality']:.1f})")
             
             for i, (team1_idx, team2_idx) in enumerate(optimal_matchups):
                 team1 = best_teams[team1_idx]
@@ -827,87 +2592,54 @@ class VolleyballMatchmaker:
         
         return best_teams
 
-    def create_match_schedule(self, teams: List[List[Player]], num_rounds: int) -> List[List[Tuple[int, int]]]:
+    @timed_phase('schedule')
+    def create_match_schedule(self, teams: List[List[Player]], num_rounds: int, method: str = 'optimize',
+                              objective: str = 'min', time_budget: float = 0.5,
+                              seed: Optional[int] = None) -> List[List[Tuple[int, int]]]:
         """
         Create a fair match schedule for multiple rounds, ensuring teams don't play the same opponent twice.
         
         Args:
             teams: List of teams
             num_rounds: Number of rounds to schedule
+            method: 'optimize' to search for the best quality schedule or 'circle' for the
+                    fixed circle-method rotation
+            objective: 'min' to maximize the worst match quality or 'sum' for the total
+            time_budget: Most seconds the optimizer may spend searching (it usually stops sooner)
+            seed: Optional seed for a reproducible search
             
         Returns:
             List of rounds, where each round is a list of (team1_idx, team2_idx) matchups
         """
-        num_teams = len(teams)
-        
-        # Calculate maximum possible rounds where each team plays once per round
-        max_rounds = num_teams - 1 if num_teams % 2 == 0 else num_teams
-        
-        # Cap requested rounds to maximum possible without repeats
-        num_rounds = min(num_rounds, max_rounds)
+        if method not in ('optimize', 'circle'):
+            raise ValueError(f"Unknown schedule method: {method}")
         
-        # For odd number of teams, one team sits out each round
-        has_bye = num_teams % 2 == 1
+        quality = self._matchup_quality_matrix(teams)
         
-        # Track which teams have played each other
-        played_against = set()  # (team1_idx, team2_idx) pairs that have already played
-        
-        # Create schedule
-        schedule = []
-        
-        # Use circle method for round-robin tournament scheduling
-        if has_bye:
-            # With odd number of teams, we'll use a dummy team that represents a "bye"
-            virtual_teams = list(range(num_teams + 1))  # 0 to num_teams (inclusive)
-            max_rounds = num_teams  # With odd teams, max rounds equals team count
+        # Circle method round robin (one team sits out each round when the count is odd)
+        baseline = circle_schedule(len(teams), num_rounds)
+        if method == 'optimize':
+            trace = self.metrics.trace('create_match_schedule') if self.metrics is not None else None
+            schedule = optimize_schedule(quality, num_rounds, objective, time_budget, seed, trace)
         else:
-            virtual_teams = list(range(num_teams))  # 0 to num_teams-1
-        
-        # Fix team 0, rotate others for standard round-robin scheduling
-        for round_num in range(min(num_rounds, max_rounds)):
-            round_matchups = []
-            
-            # Rotate teams (except team 0)
-            if round_num > 0:
-                virtual_teams = [virtual_teams[0]] + [virtual_teams[-1]] + virtual_teams[1:-1]
-            
-            # Create matchups for this round
-            for i in range(len(virtual_teams) // 2):
-                team1_idx = virtual_teams[i]
-                team2_idx = virtual_teams[len(virtual_teams) - 1 - i]
-                
-                # Skip if this involves the dummy team (for odd number of teams)
-                if has_bye and (team1_idx == num_teams or team2_idx == num_teams):
-                    # One team gets a bye this round
-                    bye_team = team1_idx if team2_idx == num_teams else team2_idx
-                    if bye_team < num_teams:  # Only record real teams
-                        # No matchup needed - this team has a bye
-                        pass
-                else:
-                    # Ensure team1_idx < team2_idx for consistency
-                    if team1_idx > team2_idx:
-                        team1_idx, team2_idx = team2_idx, team1_idx
-                    
-                    # Only add if both are real teams
-                    if team1_idx < num_teams and team2_idx < num_teams:
-                        round_matchups.append((team1_idx, team2_idx))
-                        played_against.add((team1_idx, team2_idx))
-            
-            schedule.append(round_matchups)
-        
-        # Sort each round by match quality
-        for round_idx in range(len(schedule)):
-            # Calculate match quality for each matchup
-            matchups_with_quality = []
-            for team1_idx, team2_idx in schedule[round_idx]:
-                quality = self.predict_match_quality(teams[team1_idx], teams[team2_idx])
-                matchups_with_quality.append((team1_idx, team2_idx, quality))
-            
-            # Sort by quality (highest first)
-            matchups_with_quality.sort(key=lambda x: x[2], reverse=True)
-            
-            # Update schedule with sorted matchups
-            schedule[round_idx] = [(m[0], m[1]) for m in matchups_with_quality]
+            schedule = baseline
+        
+        # Sort each round by match quality (highest first)
+        schedule = [sorted(round_matchups, key=lambda m: quality[m[0]][m[1]], reverse=True)
+                    for round_matchups in schedule]
+        
+        # Report the result against the circle method baseline
+        worst, total = schedule_score(quality, schedule)
+        circle_worst, circle_total = schedule_score(quality, baseline)
+        self.last_schedule_stats = {
+            'method': method,
+            'objective': objective,
+            'total_quality': total,
+            'worst_quality': worst,
+            'circle_total_quality': circle_total,
+            'circle_worst_quality': circle_worst,
+            'schedule': schedule
+        }
         
         return schedule
 
@@ -947,40 +2679,55 @@ class VolleyballMatchmaker:
                           f"Team {team2_idx + 1} ({len(team2)} players, {team2_skill:.1f}) - " +
                           f"Diff: {rating_diff:.1f}, Quality: {quality:.1f}/100")
 
-    def create_optimal_matchups(self, teams: List[List[Player]]) -> List[Tuple[int, int]]:
+    def create_optimal_matchups(self, teams: List[List[Player]], method: str = 'exact') -> List[Tuple[int, int]]:
         """
         Create optimal non-duplicating matchups so all teams can play simultaneously.
-        Returns a list of (team1_idx, team2_idx) pairs.
+        
+        Args:
+            teams: Teams to pair up (one sits out if the count is odd)
+            method: 'exact' for a maximum total quality matching (blossom algorithm) or
+                    'greedy' to repeatedly take the best remaining matchup
+            
+        Returns:
+            List of (team1_idx, team2_idx) pairs
         """
-        # If odd number of teams, one team will sit out
-        matchups = []
+        if method not in ('exact', 'greedy'):
+            raise ValueError(f"Unknown matchup method: {method}")
         
+        # If odd number of teams, one team will sit out
         if len(teams) < 2:
-            return matchups
-            
-        # Create all possible matchups with their quality scores
-        possible_matchups = []
+            self.last_matchup_stats = {}
+            return []
+        
+        quality = self._matchup_quality_matrix(teams)
+        greedy = greedy_matching(quality)
+        matchups = optimal_pairing(quality) if method == 'exact' else greedy
+        
+        def summary(pairs):
+            scores = [quality[i][j] for i, j in pairs]
+            return sum(scores), min(scores)
+        
+        total, worst = summary(matchups)
+        greedy_total, greedy_worst = summary(greedy)
+        matched = {idx for pair in matchups for idx in pair}
+        self.last_matchup_stats = {
+            'method': method,
+            'total_quality': total,
+            'worst_quality': worst,
+            'greedy_total_quality': greedy_total,
+            'greedy_worst_quality': greedy_worst,
+            'bye': [idx for idx in range(len(teams)) if idx not in matched],
+            'matchups': matchups
+        }
+        return matchups
+
+    def _matchup_quality_matrix(self, teams: List[List[Player]]) -> List[List[float]]:
+        """Symmetric matrix of predict_match_quality for every pair of teams."""
+        quality = [[0.0] * len(teams) for _ in teams]
         for i in range(len(teams)):
             for j in range(i+1, len(teams)):
-                quality = self.predict_match_quality(teams[i], teams[j])
-                possible_matchups.append((i, j, quality))
-        
-        # Sort by quality (highest first)
-        possible_matchups.sort(key=lambda x: x[2], reverse=True)
-        
-        # Greedy algorithm: take highest quality matchups where teams haven't played yet
-        used_teams = set()
-        for team1_idx, team2_idx, _ in possible_matchups:
-            if team1_idx not in used_teams and team2_idx not in used_teams:
-                matchups.append((team1_idx, team2_idx))
-                used_teams.add(team1_idx)
-                used_teams.add(team2_idx)
-                
-                # If all teams are matched, we're done
-                if len(used_teams) >= len(teams) - (len(teams) % 2):
-                    break
-                    
-        return matchups
+                quality[i][j] = quality[j][i] = self.predict_match_quality(teams[i], teams[j])
+        return quality
 
     def reset_player_stats(self, reset_all: bool = False, player_name: str = None) -> None:
         """
@@ -1021,11 +2768,120 @@ class VolleyballMatchmaker:
             
             # Clear chemistry data
             player.chemistry = {}
+        self.invalidate_team_cache()
         
         # Save updated players
         self.save_players()
         print("Player statistics have been reset.")
 
+    def replay_game_history(self, save: bool = True) -> int:
+        """
+        Rebuild every player's rating, stats and chemistry by replaying the game history.
+
+        Players start from their skill group baseline (as after reset_player_stats) and each
+        game is applied in chronological order through the same rating and chemistry
+        helpers as record_game (game_rating_updates, player_rating_update,
+        boosted_chemistry). Skill decay is not replayed. Hot state is kept in flat
+        per-player arrays indexed by roster position and only written back to the Player
+        objects (and saved to storage, once) at the end. The in-memory pair_performances
+        log is left untouched, and rating_history is not rebuilt: after a replay its
+        snapshots no longer match the players' ratings.
+
+        Args:
+            save: Write the rebuilt players to storage when done
+
+        Returns:
+            Number of games replayed
+        """
+        games = self.storage.read_games()
+        if games is None:
+            return 0
+        complete = [game for game in games if game[1] and game[2]]
+        if len(complete) < len(games):
+            print(f"Skipping {len(games) - len(complete)} games with an empty team")
+            games = complete
+
+        # Stable sort keeps file order for games recorded in the same minute
+        games.sort(key=lambda game: game[0])
+
+        # Players who only appear in the game file join with default settings
+        for _, team1_names, team2_names, _, _ in games:
+            for name in team1_names + team2_names:
+                if name not in self.players:
+                    self.players[name] = Player(name, 'C', 100.0, 100.0, chemistry_matrix=self.chemistry,
+                                               table=self.player_table)
+
+        roster = list(self.players.values())
+        position = {player.name: i for i, player in enumerate(roster)}
+
+        # Flat per-player state, starting from the skill group baseline
+        skill_rating = [player._get_skill_group_base_rating() for player in roster]
+        z_score = skill_rating.copy()
+        sigma = [100.0] * len(roster)
+        games_played = [0] * len(roster)
+        wins = [0] * len(roster)
+        points_scored = [0] * len(roster)
+        points_allowed = [0] * len(roster)
+        last_played: List[Optional[date]] = [None] * len(roster)
+        # Teammate chemistry by (roster position, teammate roster position), for pairs that played together
+        chemistry: Dict[Tuple[int, int], float] = {}
+
+        for game_time, team1_names, team2_names, score1, score2 in games:
+            team1 = [position[name] for name in team1_names]
+            team2 = [position[name] for name in team2_names]
+            team1_won = score1 > score2
+            game_date = game_time.date()
+
+            for team, scored, allowed, won in ((team1, score1, score2, team1_won),
+                                               (team2, score2, score1, not team1_won)):
+                for i in team:
+                    last_played[i] = game_date
+                    games_played[i] += 1
+                    wins[i] += won
+                    points_scored[i] += scored
+                    points_allowed[i] += allowed
+
+            # The helpers behind _update_ratings, on the flat arrays
+            weighted = {i: blend_rating(skill_rating[i], z_score[i], games_played[i]) for i in team1 + team2}
+            team1_skill, team2_skill, team1_update, team2_update = game_rating_updates(
+                [weighted[i] for i in team1], [sigma[i] for i in team1],
+                [weighted[i] for i in team2], [sigma[i] for i in team2],
+                team1_won, score1, score2, self.beta, self.dynamic_factor)
+            for team, team_skill, team_update in ((team1, team1_skill, team1_update), (team2, team2_skill, team2_update)):
+                for i in team:
+                    z_score[i], sigma[i] = player_rating_update(z_score[i], sigma[i], team_skill, team_update,
+                                                                self.uncertainty_factor)
+
+            # The helpers behind _update_chemistry
+            for team, won in ((team1, team1_won), (team2, not team1_won)):
+                boost = chemistry_boost(won)
+                for i, j in itertools.combinations(team, 2):
+                    chemistry[i, j] = boosted_chemistry(chemistry.get((i, j), 0), boost)
+                    chemistry[j, i] = boosted_chemistry(chemistry.get((j, i), 0), boost)
+
+        # Write the rebuilt state back in one pass
+        for i, player in enumerate(roster):
+            player.skill_group_rating = skill_rating[i]
+            player.z_score = z_score[i]
+            player.sigma = sigma[i]
+            player.games_played = games_played[i]
+            player.wins = wins[i]
+            player.points_scored = points_scored[i]
+            player.points_allowed = points_allowed[i]
+            if last_played[i] is not None:
+                player.last_played = last_played[i]
+
+        rows = self.chemistry.rows
+        rows.clear()
+        for (a, b), score in chemistry.items():
+            rows.setdefault(roster[a].index, {})[roster[b].index] = score
+        self.invalidate_team_cache()
+
+        if save:
+            self.save_players()
+        return len(games)
+
+
 def main():
     """Main function to run the volleyball matchmaker."""
     matchmaker = VolleyballMatchmaker(
@@ -1060,8 +2916,11 @@ def main():
             
             team_size = input("Enter team size (default 6): ")
             team_size = int(team_size) if team_size.isdigit() else 6
-            
-            team1, team2 = matchmaker.create_teams(team_size)
+
+            method = input("Enter search method - random, anneal or exact (default random): ").strip().lower()
+            method = method if method in DEFAULT_TEAM_ITERATIONS else 'random'
+
+            team1, team2 = matchmaker.create_teams(team_size, method=method)
             
             print("\nTeam 1:")
             for player in team1:
@@ -1228,6 +3087,10 @@ def main():
                 print(f"95% Confidence: {stats['confidence_interval'][0]:.1f} - {stats['confidence_interval'][1]:.1f}")
                 print(f"Games: {stats['games_played']} Wins: {stats['wins']} ({stats['win_percentage']:.1f}%)")
                 print(f"Points: {stats['points_scored']} for, {stats['points_allowed']} against")
+                if stats['streak'][1]:
+                    print(f"Streak: {stats['streak'][0]}{stats['streak'][1]}")
+                if stats['rating_trend']:
+                    print("Rating trend: " + " -> ".join(f"{rating:.1f}" for rating in stats['rating_trend']))
                 
                 print("\nBest Teammates:")
                 for name, score in stats['best_teammates']:
@@ -1244,7 +3107,8 @@ def main():
             print("\nReset player statistics")
             print("1. Reset all players")
             print("2. Reset specific player")
-            print("3. Cancel")
+            print("3. Rebuild all stats from game history")
+            print("4. Cancel")
             
             reset_choice = input("Enter choice: ")
             
@@ -1267,6 +3131,14 @@ def main():
                     print(f"Player '{player_name}' not found.")
             
             elif reset_choice == "3":
+                confirm = input("Rebuild ALL player stats and chemistry by replaying the game history? (y/n): ")
+                if confirm.lower() == 'y':
+                    replayed = matchmaker.replay_game_history()
+                    print(f"Replayed {replayed} games.")
+                else:
+                    print("Reset cancelled.")
+            
+            elif reset_choice == "4":
                 print("Reset cancelled.")
             
             else:
@@ -0,0 +1,144 @@
+"""
+Optional instrumentation for the matchmaker: counters, phase timings and search traces.
+
+A Metrics instance collects everything and exports it as JSON or in the Prometheus text
+format. timed_phase and phase time a method or a block under a phase name, and cost only
+a None check when the matchmaker runs without metrics. Phases are named after what the
+matchmaker is doing (load, search, schedule, save), and a block only counts toward one
+phase: a search that goes on to schedule ends its 'search' block first.
+"""
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Metrics:
+    """
+    Opt-in counters, phase timings and search convergence traces for the matchmaker.
+
+    Pass an instance as VolleyballMatchmaker(..., metrics=Metrics()). Without one every
+    hook is a single 'is not None' check, so the hot paths cost nothing measurable.
+
+    counters: named event counts (quality evaluations, chemistry pair lookups, CSV bytes written)
+    phases: name -> [calls, seconds]; nested calls of the same phase are timed once
+    traces: search name -> [(iteration, best score)] for the most recent run of that search
+    sources: name -> callable returning a dict of stats, read when a snapshot is taken
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.phases: Dict[str, List[float]] = {}
+        self.traces: Dict[str, List[Tuple[int, float]]] = {}
+        self.sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._active: Dict[str, int] = {}  # phase name -> nesting depth
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add amount to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block under a phase name (load, search, schedule, save, ...)."""
+        depth = self._active.get(name, 0)
+        self._active[name] = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active[name] = depth
+            if depth == 0:
+                totals = self.phases.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += time.perf_counter() - start
+
+    def trace(self, name: str) -> List[Tuple[int, float]]:
+        """Start a new convergence trace for a search; append (iteration, best score) to it."""
+        self.traces[name] = []
+        return self.traces[name]
+
+    def register(self, name: str, stats: Callable[[], Dict[str, float]]) -> None:
+        """Include the dict returned by stats() in every snapshot (e.g. TeamCache.stats)."""
+        self.sources[name] = stats
+
+    def reset(self) -> None:
+        """Clear counters, phase timings and traces (registered sources stay)."""
+        self.counters.clear()
+        self.phases.clear()
+        self.traces.clear()
+
+    def snapshot(self) -> Dict:
+        """All metrics as a JSON-serializable dict."""
+        return {
+            'counters': dict(self.counters),
+            'phases': {name: {'calls': calls, 'seconds': seconds}
+                       for name, (calls, seconds) in self.phases.items()},
+            'traces': {name: [list(point) for point in trace] for name, trace in self.traces.items()},
+            'sources': {name: stats() for name, stats in self.sources.items()},
+        }
+
+    def dump_json(self, path: str) -> None:
+        """Write a snapshot as JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def prometheus_text(self, prefix: str = 'matchmaker') -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        if snapshot['phases']:
+            lines.append(f"# TYPE {prefix}_phase_calls_total counter")
+            for name, totals in sorted(snapshot['phases'].items()):
+                lines.append(f'{prefix}_phase_calls_total{{phase="{name}"}} {totals["calls"]}')
+            lines.append(f"# TYPE {prefix}_phase_seconds_total counter")
+            for name, totals in sorted(snapshot['phases'].items()):
+                lines.append(f'{prefix}_phase_seconds_total{{phase="{name}"}} {totals["seconds"]:.6f}')
+        traces = {name: trace for name, trace in snapshot['traces'].items() if trace}
+        if traces:
+            # Only the outcome of each trace; the full curve is in the JSON dump
+            lines.append(f"# TYPE {prefix}_search_best_score gauge")
+            for name, trace in sorted(traces.items()):
+                lines.append(f'{prefix}_search_best_score{{search="{name}"}} {trace[-1][1]}')
+            lines.append(f"# TYPE {prefix}_search_iterations_to_best gauge")
+            for name, trace in sorted(traces.items()):
+                lines.append(f'{prefix}_search_iterations_to_best{{search="{name}"}} {trace[-1][0]}')
+        for source, stats in sorted(snapshot['sources'].items()):
+            for name, value in sorted(stats.items()):
+                lines.append(f"# TYPE {prefix}_{source}_{name} gauge")
+                lines.append(f"{prefix}_{source}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def dump_prometheus(self, path: str, prefix: str = 'matchmaker') -> None:
+        """
+        Write a node_exporter textfile collector file.
+
+        The file is written next to path and renamed into place so the collector never
+        reads a partial file.
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text(prefix))
+        os.replace(tmp_path, path)
+
+
+def timed_phase(name: str):
+    """Method decorator: time the call under a phase when the owner has metrics enabled."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.metrics is None:
+                return method(self, *args, **kwargs)
+            with self.metrics.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def phase(metrics: Optional[Metrics], name: str):
+    """Context manager timing a block under a phase, or doing nothing without metrics."""
+    return metrics.phase(name) if metrics is not None else nullcontext()
@@ -0,0 +1,395 @@
+"""
+Local HTTP/JSON service that keeps one warm VolleyballMatchmaker per league.
+
+Leagues are loaded once at startup; requests then work on the in-memory state:
+
+    GET  /health
+    GET  /leagues/{league}/players/{name}      player stats
+    POST /leagues/{league}/checkin             {"name": ...} or {"names": [...]}
+    POST /leagues/{league}/checkout            {"name": ...} or {"names": [...]}
+    PUT  /leagues/{league}/attendance          {"names": [...]} replaces the attendance list
+    POST /leagues/{league}/teams               two teams (team_size, method, iterations, seed, time_budget)
+    POST /leagues/{league}/multi-teams         teams for everyone (team_size, num_teams, rounds, ...)
+    POST /leagues/{league}/games               a game or a list of games, as for 'main.py record'
+    POST /leagues/{league}/flush               persist now instead of waiting for the timer
+
+Searches, recorded games and player stats run in a thread pool so the event loop keeps serving check-ins
+and other leagues meanwhile. Per league, one lock serializes searches and everything that
+changes the matchmaker, and a second one keeps player stats (which only read ratings,
+chemistry and the game history) apart from changes but not from searches. Recorded games stay inside an open batch() and are written behind: the first
+change after a flush starts a timer, and everything changed before it fires is saved in
+one write. Pending changes are also saved on shutdown (SIGINT/SIGTERM).
+
+    python service.py --league spring=leagues/spring --league fall=leagues/fall --port 8765
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import functools
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from main import CommandError, game_from_json, json_default, team_json
+from matchmaker import DEFAULT_TEAM_ITERATIONS, VolleyballMatchmaker
+from storage import SqliteStorage
+
+DEFAULT_FLUSH_DELAY = 2.0   # seconds between the first unsaved change and its write
+DEFAULT_TIME_BUDGET = 1.0   # search time budget when a request does not give one
+MAX_TIME_BUDGET = 10.0
+MAX_BODY_BYTES = 1 << 20
+DATABASE_FILE = 'league.db'  # used instead of players.csv and games.csv when present
+
+
+class HttpError(Exception):
+    """An error response with a status other than 400."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _options(body: Dict, defaults: Dict) -> Dict:
+    """Request options over defaults, rejecting unknown fields."""
+    if not isinstance(body, dict):
+        raise CommandError("Request body must be a JSON object")
+    unknown = set(body) - set(defaults)
+    if unknown:
+        raise CommandError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    options = {**defaults, **body}
+    budget = options.get('time_budget')
+    if budget is not None:
+        if not isinstance(budget, (int, float)) or budget <= 0:
+            raise CommandError("time_budget must be a positive number of seconds")
+        options['time_budget'] = min(float(budget), MAX_TIME_BUDGET)
+    return options
+
+
+def _names(body: Dict) -> List[str]:
+    """Names from {"name": ...} or {"names": [...]}."""
+    names = body.get('names', [body['name']] if 'name' in body else None) if isinstance(body, dict) else None
+    if not isinstance(names, list) or not all(isinstance(name, str) and name for name in names):
+        raise CommandError('Expected {"name": ...} or {"names": [...]}')
+    return names
+
+
+def _record_games(matchmaker: VolleyballMatchmaker, games: List) -> List[tuple]:
+    """Check every game, then record them all in the open batch; returns the recorded games."""
+    results = [game_from_json(matchmaker, game) for game in games]
+    matchmaker.record_games(results)
+    return results
+
+
+class League:
+    """One league's warm matchmaker, attendance list and write-behind state."""
+
+    def __init__(self, name: str, directory: str, executor: ThreadPoolExecutor,
+                 flush_delay: float = DEFAULT_FLUSH_DELAY):
+        self.name = name
+        self.executor = executor
+        self.flush_delay = flush_delay
+        self.attendance_file = os.path.join(directory, 'attendance.csv')
+        # A league.db (see 'main.py migrate') replaces players.csv and games.csv
+        database = os.path.join(directory, DATABASE_FILE)
+        self.matchmaker = VolleyballMatchmaker(os.path.join(directory, 'players.csv'),
+                                               os.path.join(directory, 'games.csv'), self.attendance_file,
+                                               storage=SqliteStorage(database) if os.path.exists(database) else None)
+        # Recorded games are only written by flush() while this batch is open
+        self._batch = contextlib.ExitStack()
+        self._batch.enter_context(self.matchmaker.batch())
+        # Chemistry is loaded now rather than by whichever of a search or stats comes first,
+        # as the two can run at once; the game index is built now rather than by the first
+        # recorded game
+        self.matchmaker.chemistry.load()
+        len(self.matchmaker.game_log)
+        self.lock = asyncio.Lock()  # searches and changes
+        self.history_lock = asyncio.Lock()  # stats and changes (taken after lock)
+
+        # Check-ins only touch this list; it is applied to the matchmaker before a search
+        try:
+            with open(self.attendance_file, 'r', newline='') as f:
+                self.attendance: Dict[str, None] = dict.fromkeys(row[0] for row in csv.reader(f) if row)
+        except FileNotFoundError:
+            self.attendance = {}
+        self._attendance_version = 0
+        self._applied_version = -1
+        self._attendance_dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking call in the worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def changed(self) -> None:
+        """Note an unsaved change; the first one after a flush starts the flush timer."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        # Changes from here on start the next timer
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write recorded games, ratings, players and attendance if they changed."""
+        async with self.lock, self.history_lock:
+            attendance = list(self.attendance) if self._attendance_dirty else None
+            self._attendance_dirty = False
+            await self.run(self._write, attendance)
+
+    def _write(self, attendance: Optional[List[str]]) -> None:
+        self.matchmaker.flush()
+        if attendance is not None:
+            # Written next to the file and renamed into place so readers never see it half written
+            tmp_path = self.attendance_file + '.tmp'
+            with open(tmp_path, 'w', newline='') as f:
+                csv.writer(f).writerows([name] for name in attendance)
+            os.replace(tmp_path, self.attendance_file)
+
+    async def close(self) -> None:
+        """Cancel the flush timer and save everything still pending."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        self._batch.close()
+        self.matchmaker.storage.close()
+
+    def set_attendance(self, names: List[str], present: bool = True, replace: bool = False) -> int:
+        """Check names in (or out), or replace the list; returns the number attending."""
+        if replace:
+            self.attendance = {}
+        for name in names:
+            if present:
+                self.attendance[name] = None
+            else:
+                self.attendance.pop(name, None)
+        self._attendance_version += 1
+        self._attendance_dirty = True
+        self.changed()
+        return len(self.attendance)
+
+    def _apply_attendance(self) -> None:
+        """Bring the matchmaker's attending players up to date (call with both locks held)."""
+        if self._applied_version != self._attendance_version:
+            self.matchmaker.set_attendance(list(self.attendance))
+            self._applied_version = self._attendance_version
+        if len(self.matchmaker.attending_players) < 2:
+            raise CommandError("Need at least 2 attending players")
+
+    async def stats(self, player_name: str) -> Dict:
+        # Read only, so a running search does not hold it up
+        async with self.history_lock:
+            stats = await self.run(self.matchmaker.get_player_stats, player_name)
+        if 'error' in stats:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Player not found: {player_name}")
+        return stats
+
+    async def teams(self, body: Dict) -> Dict:
+        options = _options(body, {'team_size': 6, 'method': 'random', 'iterations': None, 'seed': None,
+                                  'time_budget': DEFAULT_TIME_BUDGET, 'workers': None})
+        if options['method'] not in DEFAULT_TEAM_ITERATIONS:
+            raise CommandError(f"Unknown team creation method: {options['method']}")
+        async with self.lock:
+            async with self.history_lock:
+                self._apply_attendance()
+            mm = self.matchmaker
+            team1, team2 = await self.run(mm.create_teams, options['team_size'], options['iterations'],
+                                          options['method'], seed=options['seed'], workers=options['workers'],
+                                          time_budget=options['time_budget'])
+            return {
+                'teams': [team_json(mm, team1), team_json(mm, team2)],
+                'quality': mm.predict_match_quality(team1, team2),
+                'search': mm.last_search_stats,
+            }
+
+    async def multi_teams(self, body: Dict) -> Dict:
+        options = _options(body, {'team_size': 6, 'num_teams': None, 'rounds': None, 'iterations': 200,
+                                  'seed': None, 'time_budget': DEFAULT_TIME_BUDGET, 'workers': None})
+        async with self.lock:
+            async with self.history_lock:
+                self._apply_attendance()
+            mm = self.matchmaker
+            teams = await self.run(mm.create_multiple_teams, options['team_size'], options['num_teams'],
+                                   options['iterations'], schedule_rounds=options['rounds'],
+                                   workers=options['workers'], seed=options['seed'],
+                                   time_budget=options['time_budget'])
+            result = {'teams': [team_json(mm, team) for team in teams]}
+            if options['rounds']:
+                result['schedule'] = mm.last_schedule_stats
+            else:
+                result['matchups'] = mm.last_matchup_stats
+            return result
+
+    async def record(self, body) -> Dict:
+        games = [body] if isinstance(body, dict) else body
+        if not isinstance(games, list):
+            raise CommandError("Expected a game object or a list of games")
+        async with self.lock, self.history_lock:
+            mm = self.matchmaker
+            # Rating updates (and a game log catching up on rows written by others) run in the pool
+            results = await self.run(_record_games, mm, games)
+            self.changed()
+            players = {p.name: p for team1, team2, _, _ in results for p in team1 + team2}
+            return {
+                'recorded': len(results),
+                'players': [{'name': p.name, 'rating': p.z_score, 'sigma': p.sigma,
+                             'games_played': p.games_played, 'wins': p.wins} for p in players.values()],
+            }
+
+
+class MatchmakerService:
+    """Routes HTTP requests to leagues."""
+
+    def __init__(self, leagues: Dict[str, League]):
+        self.leagues = leagues
+
+    def league(self, name: str) -> League:
+        league = self.leagues.get(name)
+        if league is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown league: {name}")
+        return league
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[HTTPStatus, object]:
+        """Handle one request; returns (status, JSON payload)."""
+        try:
+            parts = [unquote(part) for part in urlsplit(target).path.strip('/').split('/')]
+            try:
+                payload = json.loads(body) if body else {}
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                raise CommandError(f"Invalid JSON: {e}")
+
+            if parts == ['health'] and method == 'GET':
+                return HTTPStatus.OK, {'leagues': {name: {'players': len(league.matchmaker.players),
+                                                          'attending': len(league.attendance)}
+                                                   for name, league in self.leagues.items()}}
+            if len(parts) < 3 or parts[0] != 'leagues':
+                raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {target}")
+            league = self.league(parts[1])
+            route = (method, *parts[2:3], len(parts))
+            if route == ('GET', 'players', 4):
+                return HTTPStatus.OK, await league.stats(parts[3])
+            if route == ('POST', 'checkin', 3):
+                return HTTPStatus.OK, {'attending': league.set_attendance(_names(payload))}
+            if route == ('POST', 'checkout', 3):
+                return HTTPStatus.OK, {'attending': league.set_attendance(_names(payload), present=False)}
+            if route == ('PUT', 'attendance', 3):
+                return HTTPStatus.OK, {'attending': league.set_attendance(_names(payload), replace=True)}
+            if route == ('POST', 'teams', 3):
+                return HTTPStatus.OK, await league.teams(payload)
+            if route == ('POST', 'multi-teams', 3):
+                return HTTPStatus.OK, await league.multi_teams(payload)
+            if route == ('POST', 'games', 3):
+                return HTTPStatus.OK, await league.record(payload)
+            if route == ('POST', 'flush', 3):
+                await league.flush()
+                return HTTPStatus.OK, {'flushed': True}
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {method} {target}")
+        except HttpError as e:
+            return e.status, {'error': str(e)}
+        except (CommandError, ValueError) as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except Exception as e:
+            print(f"Error handling {method} {target}: {e!r}", file=sys.stderr)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.dispatch(method, target, body)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                data = json.dumps(payload, default=json_default).encode()
+                connection = '' if keep_alive else 'Connection: close\r\n'
+                head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n{connection}\r\n")
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Client went away or sent something that is not HTTP
+            pass
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        for league in self.leagues.values():
+            await league.close()
+
+
+async def serve(leagues: Dict[str, str], host: str, port: int, workers: int, flush_delay: float) -> None:
+    """Load the leagues, serve until SIGINT/SIGTERM, then save pending changes."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search') as executor:
+        loop = asyncio.get_running_loop()
+        loaded = {}
+        for name, directory in leagues.items():
+            loaded[name] = await loop.run_in_executor(executor, League, name, directory, executor, flush_delay)
+            print(f"Loaded league {name}: {len(loaded[name].matchmaker.players)} players", file=sys.stderr)
+        service = MatchmakerService(loaded)
+
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+        async with server:
+            await stop.wait()
+        await service.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Volleyball matchmaker HTTP/JSON service")
+    parser.add_argument('--league', action='append', metavar='NAME=DIR',
+                        help="League name and the directory holding its players.csv, games.csv (or "
+                             f"{DATABASE_FILE}) and attendance.csv (repeatable; default: 'default' in the "
+                             "current directory)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (0 picks a free one)")
+    parser.add_argument('--workers', type=int, default=4, help="Threads for searches and file writes")
+    parser.add_argument('--flush-delay', type=float, default=DEFAULT_FLUSH_DELAY,
+                        help="Seconds from the first unsaved change to the write that saves it")
+    args = parser.parse_args(argv)
+
+    leagues = {}
+    for spec in args.league or ['default=.']:
+        name, sep, directory = spec.partition('=')
+        if not sep or not name:
+            parser.error(f"--league expects NAME=DIR, got {spec!r}")
+        leagues[name] = directory
+
+    # Matchmaker progress messages go to stderr with the service log
+    with contextlib.redirect_stdout(sys.stderr):
+        asyncio.run(serve(leagues, args.host, args.port, args.workers, args.flush_delay))
+
+
+if __name__ == "__main__":
+    main()
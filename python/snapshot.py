@@ -0,0 +1,92 @@
+"""
+Versioned binary snapshot files: named NumPy arrays plus JSON metadata in one file.
+
+The file starts with SNAPSHOT_MAGIC, the format version and the length of a JSON header
+that lists each array's dtype, shape and offset; arrays follow, aligned to SNAPSHOT_ALIGN
+bytes. read_snapshot maps the arrays copy-on-write instead of reading them, so opening
+a snapshot costs little more than parsing the header and pages are loaded on first use.
+"""
+import json
+import os
+import struct
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+SNAPSHOT_MAGIC = b'VMSNAP\0\0'
+SNAPSHOT_VERSION = 2  # 2: player table rows are registry ids
+SNAPSHOT_ALIGN = 64
+_PREFIX = struct.Struct('<8sII')  # magic, version, header length
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], meta: Dict) -> int:
+    """
+    Write arrays and meta to a temporary file and rename it over path.
+
+    Returns:
+        Bytes written
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    # Offsets are relative to the first aligned byte after the header
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': layout}).encode()
+    data_start = _aligned(_PREFIX.size + len(header))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][2])
+            f.write(array.tobytes())
+        # Pad to the end of the layout, where empty arrays at the end are placed
+        size = data_start + offset
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_snapshot(path: str) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """
+    Open a snapshot written by write_snapshot.
+
+    Returns:
+        Tuple of (meta, name -> writable copy-on-write array), or None if the file is
+        missing, truncated or of another format version
+    """
+    try:
+        with open(path, 'rb') as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                return None
+            magic, version, header_length = _PREFIX.unpack(prefix)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            header = json.loads(f.read(header_length))
+        size = os.path.getsize(path)
+    except (OSError, ValueError):
+        return None
+
+    data_start = _aligned(_PREFIX.size + header_length)
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        offset += data_start
+        if offset + count * dtype.itemsize > size:
+            return None
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=offset, shape=tuple(shape)).view(np.ndarray)
+    return header['meta'], arrays
@@ -0,0 +1,837 @@
+"""
+Storage backends for the matchmaker's players, chemistry and game history.
+
+CsvStorage is the original layout: players.csv (chemistry packed into one column) and
+games.csv, with recorded games saved through an append-only journal that is compacted
+into players.csv from time to time. SqliteStorage keeps the
+same data in normalized, indexed tables of one SQLite database in WAL mode and writes
+only the players and chemistry pairs that changed. migrate() copies a league between
+backends. Like history, this module needs only the standard library.
+"""
+import csv
+import json
+import os
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from history import GameLog
+
+PLAYER_HEADER = ['Name', 'Skill_Group', 'Z_Score', 'Sigma', 'LastPlayed',
+                 'GamesPlayed', 'Wins', 'PointsScored', 'PointsAllowed', 'Chemistry']
+COUNT_FIELDS = ('games_played', 'wins', 'points_scored', 'points_allowed')
+
+# (datetime, team1 names, team2 names, score1, score2) as read for replays
+GameRecord = Tuple[datetime, List[str], List[str], int, int]
+
+
+# Journal size that triggers compaction into a fresh players.csv
+JOURNAL_COMPACT_BYTES = 4 << 20
+JOURNAL_SUFFIX = '.journal'  # the journal is '<players file>.journal'
+SNAPSHOT_SUFFIX = '.snapshot'  # the matchmaker's binary snapshot is '<players file>.snapshot'
+
+
+class Journal:
+    """
+    Append-only log of checksummed JSON records.
+
+    Each line is '<crc32 hex> <json>'. Reading stops at the first line that is torn or
+    fails its checksum, and the next append first cuts the file back to the last good
+    record, so a crash mid-append loses at most the record being written. Every append
+    is fsynced before it returns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._valid_bytes: Optional[int] = None  # end of the last good record, once scanned
+
+    def records(self) -> List[dict]:
+        """Every intact record, oldest first."""
+        records = []
+        valid = 0
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    crc, _, payload = line.rstrip(b'\n').partition(b' ')
+                    if not line.endswith(b'\n') or crc != b'%08x' % zlib.crc32(payload):
+                        break
+                    try:
+                        records.append(json.loads(payload))
+                    except ValueError:
+                        break
+                    valid += len(line)
+        except FileNotFoundError:
+            pass
+        self._valid_bytes = valid
+        return records
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, record: dict) -> int:
+        """Append and fsync one record; returns the bytes written."""
+        if self._file is None:
+            if self._valid_bytes is None:
+                self.records()
+            self._file = open(self.path, 'ab')
+            self._file.truncate(self._valid_bytes)  # Drop a torn tail left by a crash
+        payload = json.dumps(record, separators=(',', ':')).encode()
+        line = b'%08x %s\n' % (zlib.crc32(payload), payload)
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return len(line)
+
+    def reset(self) -> None:
+        """Empty the journal once its records are in a snapshot."""
+        self.close()
+        with open(self.path, 'wb') as f:
+            os.fsync(f.fileno())
+        self._valid_bytes = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def journal_rows(player_file: str) -> List[list]:
+    """Player rows journaled for player_file since its last compaction, oldest first (read only)."""
+    return [row for record in Journal(player_file + JOURNAL_SUFFIX).records() for row in record.get('players', [])]
+
+
+def _count_games(path: str, offset: int) -> int:
+    """Complete games (as GameLog counts them) in the game file from byte offset on."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return sum(1 for line in f if GameLog._parse(next(csv.reader((line.decode(),)), [])) is not None)
+    except FileNotFoundError:
+        return 0
+
+
+def _fsync_file(path: str) -> None:
+    try:
+        with open(path, 'rb') as f:
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        pass
+
+
+def _fsync_directory(path: str) -> None:
+    """Make a rename in path's directory durable (not possible on every platform)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _player_row(player, chemistry_str: str) -> list:
+    """A players.csv row for a Player (plain Python numbers, so it can also go into the journal)."""
+    return [player.name, player.skill_group, float(player.z_score), float(player.sigma),
+            player.last_played.strftime("%Y-%m-%d"), int(player.games_played), int(player.wins),
+            int(player.points_scored), int(player.points_allowed), chemistry_str]
+
+
+# Count columns outside this range load as 0
+INT64_RANGE = range(-2**63, 2**63)
+
+
+def parse_rating(value: str) -> float:
+    """A Z_Score or Sigma value, 100.0 if empty or malformed."""
+    try:
+        return float(value)
+    except ValueError:
+        return 100.0
+
+
+def parse_count(value: str) -> int:
+    """A GamesPlayed, Wins or Points value, 0 if empty, malformed or outside int64."""
+    try:
+        value = int(value)
+    except ValueError:
+        return 0
+    return value if value in INT64_RANGE else 0
+
+
+def parse_date(value: str) -> Optional[date]:
+    """A LastPlayed value, or None if it is not a YYYY-MM-DD date."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def parse_chemistry(field: str, chemistry) -> None:
+    """Set the scores of a 'Name:score;...' chemistry column in chemistry (a name -> score mapping)."""
+    try:
+        for pair in field.split(';'):
+            if ':' in pair:
+                other_player, score = pair.split(':')
+                chemistry[other_player] = float(score)
+    except ValueError:
+        # If chemistry data is malformed, keep what was read before it
+        pass
+
+
+def parse_player_row(row: list) -> Dict:
+    """
+    A players.csv row (or the journal's or database's Name..PointsAllowed values) as a dict,
+    with missing or malformed values replaced by the defaults load_players uses.
+
+    Returns:
+        Dict with name, skill_group, z_score, sigma, last_played (a date, or None to mean
+        today), games_played, wins, points_scored and points_allowed
+    """
+    row = list(row) + [''] * (9 - len(row))
+    return {
+        'name': row[0],
+        'skill_group': row[1] or 'C',
+        'z_score': parse_rating(row[2]),
+        'sigma': parse_rating(row[3]),
+        'last_played': parse_date(row[4]),
+        **dict(zip(COUNT_FIELDS, map(parse_count, row[5:9])))
+    }
+
+
+class CsvStorage:
+    """
+    players.csv and games.csv, as written by earlier versions, plus a write-ahead journal.
+
+    Saves after recorded games do not rewrite players.csv. Each storage transaction
+    appends one record to '<players file>.journal' holding the new game rows and, as
+    players.csv rows, the players those games changed (with only the changed chemistry
+    pairs in the Chemistry column). The record is fsynced before the games are appended
+    to games.csv, so all games flushed together share one fsync (group commit). Once the
+    journal passes compact_bytes the full roster is written to a temporary file and
+    renamed over players.csv, and the journal is emptied.
+
+    Loading reads players.csv and then the journal rows, which as later rows of the same
+    players take precedence, and appends any journaled games missing from games.csv.
+    Replaying a record twice gives the same result, so a crash at any point recovers.
+
+    on_player_file_written, if set, is called after each rewrite of players.csv; the
+    matchmaker uses it to write a binary snapshot of the same state to snapshot_file.
+    """
+
+    def __init__(self, player_file: str, game_file: str, journal: bool = True,
+                 compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        self.player_file = player_file
+        self.game_file = game_file
+        self.ratings_file = os.path.splitext(game_file)[0] + '_ratings.bin'
+        self.journal = Journal(player_file + JOURNAL_SUFFIX) if journal else None
+        self.compact_bytes = compact_bytes
+        self.snapshot_file = player_file + SNAPSHOT_SUFFIX
+        self.on_player_file_written: Optional[Callable[[], None]] = None
+        # Without a journal save_players always rewrites the whole player file
+        self.partial_writes = journal
+        self.metrics = None  # counts bytes written, journal records and compactions when set
+        self._record: Optional[dict] = None  # journal record of the open transaction
+        self._game_log: Optional['_JournaledGameLog'] = None
+        self._players: Optional[Dict] = None  # last saved roster and chemistry, for compaction
+        self._chemistry = None
+
+    def read_players(self, include_file: bool = True) -> Tuple[List[list], Callable]:
+        """
+        Read the player file (creating it, with a header, if it is missing or empty) and
+        recover from the journal.
+
+        Args:
+            include_file: False to return only the journal rows, when the player file's
+                contents are already loaded (from a snapshot)
+
+        Returns:
+            Tuple of (rows of Name..PointsAllowed values, skipping rows without a name, with
+            journaled rows last, and a function that loads the rows' chemistry columns into
+            a ChemistryMatrix)
+        """
+        rows = []
+        if include_file:
+            try:
+                with open(self.player_file, 'r', newline='') as f:
+                    reader = csv.reader(f)
+                    try:
+                        next(reader)  # Try to read header
+                        rows = [row for row in reader if row and row[0]]  # Skip empty rows and rows without names
+                    except StopIteration:
+                        # Empty file, create with header
+                        self._create_player_file()
+            except FileNotFoundError:
+                # Create file with header if it doesn't exist
+                self._create_player_file()
+        if self.journal is not None:
+            rows.extend(self._recover())
+        if not rows:
+            return rows, _no_chemistry
+
+        return rows, chemistry_loader([row[0] for row in rows], [row[9] if len(row) > 9 else '' for row in rows])
+
+    def _recover(self) -> List[list]:
+        """Player rows from the journal; games it holds that games.csv lacks are appended."""
+        records = self.journal.records()
+        journaled = [record['games'] for record in records if 'games' in record]
+        if not journaled:
+            return [row for record in records for row in record.get('players', [])]
+        first, _, *offset = journaled[0]
+        if offset:
+            # Games before the offset the first journaled game went to are not in question
+            count = first + _count_games(self.game_file, offset[0])
+        else:
+            count = len(GameLog(self.game_file))
+        missing = []
+        for first, games, *_ in journaled:
+            if first > count:
+                print(f"Journal games from {first} do not follow the {count} games in {self.game_file}")
+            missing.extend(games[max(0, count - first):])
+            count = max(count, first + len(games))
+        if missing:
+            print(f"Recovered {len(missing)} games from {self.journal.path}")
+            with open(self.game_file, 'a', newline='') as f:
+                csv.writer(f).writerows(missing)
+        return [row for record in records for row in record.get('players', [])]
+
+    def _create_player_file(self) -> None:
+        """Create the player file with header."""
+        with open(self.player_file, 'w', newline='') as f:
+            csv.writer(f).writerow(PLAYER_HEADER)
+
+    def save_players(self, players: Dict, chemistry, changed: Optional[Tuple[Set[int], Set[Tuple[int, int]]]] = None) -> None:
+        """
+        Save players: journal the changed ones, or rewrite players.csv.
+
+        Args:
+            players: Name -> Player for every player, in file order
+            chemistry: The ChemistryMatrix the players index into
+            changed: (player ids, teammate id pairs) changed since the last save, to
+                journal instead of rewriting players.csv (ignored without a journal)
+        """
+        self._players, self._chemistry = players, chemistry
+        if changed is None or self.journal is None:
+            self._write_player_file()
+            return
+        ids, pairs = changed
+        names = chemistry.names
+        fields: Dict[int, List[str]] = {}
+        for i, j in pairs:
+            for x, y in ((i, j), (j, i)):
+                score = chemistry.get(x, y)
+                if score is not None:
+                    fields.setdefault(x, []).append(f"{names[y]}:{score}")
+        # In roster order, so players added since the last save reload in the order they were added
+        journaled = sorted((players[names[i]] for i in {*ids, *fields}), key=lambda player: player.row)
+        rows = [_player_row(player, ';'.join(fields.get(player.index, ()))) for player in journaled]
+        with self.transaction():
+            self._record['players'] = rows
+
+    def _write_player_file(self) -> None:
+        """Write every player to a temporary file, rename it over the player file and empty the journal."""
+        tmp_path = self.player_file + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(PLAYER_HEADER)
+            for player in self._players.values():
+                writer.writerow(_player_row(player, self._chemistry.format_field(player.index)))
+            written = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        if self.journal is not None:
+            # Journaled games must be on disk before the journal that holds them is emptied
+            _fsync_file(self.game_file)
+        os.replace(tmp_path, self.player_file)
+        _fsync_directory(self.player_file)
+        if self.journal is not None:
+            self.journal.reset()
+        if self.metrics is not None:
+            self.metrics.count('csv_bytes_written', written)
+        if self.on_player_file_written is not None:
+            self.on_player_file_written()
+
+    def compact(self) -> None:
+        """Fold the journal into a new players.csv now (no-op if nothing was saved yet)."""
+        if self._players is not None:
+            self._write_player_file()
+
+    def journaled_games_start(self) -> Optional[int]:
+        """Byte offset in games.csv where the journal's first games were appended, or None if it has none."""
+        if self.journal is None:
+            return None
+        for record in self.journal.records():
+            if 'games' in record:
+                _, _, *offset = record['games']
+                return offset[0] if offset else None
+        return None
+
+    def game_log(self) -> GameLog:
+        """Open the game history, creating an empty game file if needed."""
+        if not os.path.exists(self.game_file):
+            # Create file if it doesn't exist
+            with open(self.game_file, 'w', newline='') as f:
+                pass  # Just create an empty file
+        if self.journal is None:
+            return GameLog(self.game_file)
+        return _JournaledGameLog(self.game_file, self)
+
+    def read_games(self) -> Optional[List[GameRecord]]:
+        """Every game in file order (None without a game file); empty names are dropped, malformed rows skipped."""
+        games = []
+        try:
+            with open(self.game_file, 'r', newline='') as f:
+                for row in csv.reader(f):
+                    if len(row) < 5:
+                        continue
+                    try:
+                        # fromisoformat parses the "%Y-%m-%d %H:%M" timestamps far faster than strptime
+                        games.append((datetime.fromisoformat(row[0]),
+                                      [name for name in row[1].split(',') if name],
+                                      [name for name in row[2].split(',') if name],
+                                      int(row[3]), int(row[4])))
+                    except ValueError:
+                        print(f"Skipping malformed game row: {row}")
+        except FileNotFoundError:
+            return None
+        return games
+
+    @contextmanager
+    def transaction(self):
+        """
+        Collect the games and players saved inside into one journal record (nested blocks
+        join the outermost). On exit the record is appended and fsynced, its games are
+        appended to games.csv and the journal is compacted if it has grown too large.
+        """
+        if self.journal is None or self._record is not None:
+            yield
+            return
+        self._record = {}
+        try:
+            yield
+        except BaseException:
+            self._record, self._game_log = None, None
+            raise
+        record, self._record = self._record, None
+        if record:
+            self._commit(record)
+
+    def _commit(self, record: dict) -> None:
+        written = self.journal.append(record)
+        log, self._game_log = self._game_log, None
+        # The games are durable in the journal now; a crash before this append is recovered at load
+        appended = GameLog.flush(log) if log is not None else 0
+        if self.metrics is not None:
+            self.metrics.count('journal_records')
+            self.metrics.count('journal_bytes_written', written)
+            self.metrics.count('csv_bytes_written', appended)
+        if self.journal.size() >= self.compact_bytes:
+            if self.metrics is not None:
+                self.metrics.count('journal_compactions')
+            self.compact()
+
+    def close(self) -> None:
+        """Compact the journal if this session saved players, so players.csv is up to date for other readers."""
+        if self.journal is not None:
+            if self.journal.size():
+                self.compact()
+            self.journal.close()
+
+
+class _JournaledGameLog(GameLog):
+    """GameLog whose flush() inside a storage transaction journals the games instead of appending them."""
+
+    def __init__(self, path: str, storage: CsvStorage):
+        super().__init__(path)
+        self.storage = storage
+
+    def flush(self) -> int:
+        """Queue pending games in the open journal record (appended to the file at commit)."""
+        storage = self.storage
+        if storage._record is None:
+            with storage.transaction():
+                return self.flush()
+        if self.pending:
+            # len() has indexed the whole file, so indexed_bytes is where these games will go
+            storage._record['games'] = [len(self) - len(self.pending), list(self.pending), self.indexed_bytes]
+            storage._game_log = self
+        return 0
+
+
+def _no_chemistry(matrix) -> None:
+    pass
+
+
+def chemistry_loader(names: List[str], fields: List[str]) -> Callable:
+    """A function loading players' 'Name:score;...' chemistry columns (parallel lists) into a ChemistryMatrix."""
+    def load_chemistry(matrix) -> None:
+        for name, field in zip(names, fields):
+            if field:
+                matrix.load_field(matrix.add(name), field)
+    return load_chemistry
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    listed INTEGER NOT NULL DEFAULT 1,  -- 0 for names only seen in chemistry or games
+    skill_group TEXT NOT NULL DEFAULT 'C',
+    z_score REAL NOT NULL DEFAULT 100.0,
+    sigma REAL NOT NULL DEFAULT 100.0,
+    last_played TEXT NOT NULL DEFAULT '',
+    games_played INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    points_scored INTEGER NOT NULL DEFAULT 0,
+    points_allowed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,  -- position in the history, as in GameLog
+    played_at TEXT NOT NULL,  -- 'YYYY-MM-DD HH:MM'
+    score1 INTEGER NOT NULL,
+    score2 INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_played_at ON games (played_at);
+CREATE TABLE IF NOT EXISTS game_players (
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    team INTEGER NOT NULL,  -- 1 or 2
+    position INTEGER NOT NULL,
+    player_id INTEGER NOT NULL REFERENCES players (id),
+    PRIMARY KEY (game_id, team, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS game_players_player ON game_players (player_id, game_id);
+CREATE TABLE IF NOT EXISTS chemistry (
+    player_id INTEGER NOT NULL REFERENCES players (id),
+    teammate_id INTEGER NOT NULL REFERENCES players (id),
+    score REAL NOT NULL,
+    PRIMARY KEY (player_id, teammate_id)
+) WITHOUT ROWID;
+"""
+
+PLAYER_COLUMNS = ('name', 'skill_group', 'z_score', 'sigma', 'last_played',
+                  'games_played', 'wins', 'points_scored', 'points_allowed')
+
+# Games fetched per query while streaming the history
+GAME_FETCH_SIZE = 256
+
+
+class SqliteStorage:
+    """
+    One SQLite database (WAL mode) with players, games, game_players and chemistry tables.
+
+    Names get integer ids in the players table; names that only appear in chemistry or
+    games are kept with listed = 0 so they are not loaded as players. Saves after
+    record_game update only the rows of the players and chemistry pairs that changed.
+    Writes made inside transaction() are committed together.
+    """
+
+    partial_writes = True
+    player_file = None  # players are only in the database
+    snapshot_file = None  # the database loads fast enough on its own
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ratings_file = os.path.splitext(path)[0] + '_ratings.bin'
+        # The service calls in from its worker threads, one at a time under the league lock
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        # WAL with synchronous NORMAL never corrupts on a crash and only fsyncs at checkpoints
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.ids: Dict[str, int] = dict(self.connection.execute('SELECT name, id FROM players'))
+        self._depth = 0
+        self.metrics = None  # counts rows written when set
+
+    @contextmanager
+    def transaction(self):
+        """Group everything written inside into one commit (nested blocks join the outermost)."""
+        if self._depth == 0:
+            self.connection.execute('BEGIN')
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.connection.execute('ROLLBACK')
+                # Ids assigned inside the transaction are gone again
+                self.ids = dict(self.connection.execute('SELECT name, id FROM players'))
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.connection.execute('COMMIT')
+
+    def name_ids(self, names: Iterable[str]) -> List[int]:
+        """Ids for names, adding unknown names as unlisted rows (call inside transaction())."""
+        new = [name for name in dict.fromkeys(names) if name not in self.ids]
+        if new:
+            last_id = self.connection.execute('SELECT coalesce(max(id), 0) FROM players').fetchone()[0]
+            self.connection.executemany('INSERT INTO players (name, listed) VALUES (?, 0)', ((n,) for n in new))
+            self.ids.update(self.connection.execute('SELECT name, id FROM players WHERE id > ?', (last_id,)))
+        return [self.ids[name] for name in names]
+
+    def read_players(self) -> Tuple[List[list], Callable]:
+        """
+        Listed players in id order.
+
+        Returns:
+            Tuple of (rows of Name..PointsAllowed values, and a function that loads the
+            chemistry table into a ChemistryMatrix)
+        """
+        rows = [list(row) for row in self.connection.execute(
+            f"SELECT {', '.join(PLAYER_COLUMNS)} FROM players WHERE listed ORDER BY id")]
+        if not rows:
+            return rows, _no_chemistry
+
+        def load_chemistry(matrix) -> None:
+            # Unlisted names join the matrix in id order, after the roster
+            unlisted = self.connection.execute(
+                'SELECT name FROM players WHERE NOT listed AND id IN (SELECT teammate_id FROM chemistry) ORDER BY id')
+            matrix.add_many([name for name, in unlisted])
+            names = {player_id: name for name, player_id in self.ids.items()}
+            # In teammate id order, which is the order equal scores rank in best_teammates
+            scores = self.connection.execute(
+                'SELECT player_id, teammate_id, score FROM chemistry ORDER BY player_id, teammate_id')
+            matrix.load_scores((names[a], names[b], score) for a, b, score in scores)
+        return rows, load_chemistry
+
+    def save_players(self, players: Dict, chemistry,
+                     changed: Optional[Tuple[Set[int], Set[Tuple[int, int]]]] = None) -> None:
+        """
+        Write players and chemistry.
+
+        Args:
+            players: Name -> Player for every player
+            chemistry: The ChemistryMatrix the players index into
+            changed: (player ids, teammate id pairs), as ids of the chemistry's names, to
+                write instead of everything; a pair is written in both directions
+        """
+        if changed is None:
+            players = list(players.values())
+        else:
+            player_ids, pairs = changed
+            players = [players[chemistry.names[i]] for i in player_ids]
+        with self.transaction():
+            self.name_ids([player.name for player in players])
+            self.connection.executemany(
+                'UPDATE players SET listed = 1, skill_group = ?, z_score = ?, sigma = ?, last_played = ?, '
+                'games_played = ?, wins = ?, points_scored = ?, points_allowed = ? WHERE id = ?',
+                [(player.skill_group, player.z_score, player.sigma, player.last_played.strftime("%Y-%m-%d"),
+                  player.games_played, player.wins, player.points_scored, player.points_allowed,
+                  self.ids[player.name]) for player in players])
+
+            if changed is None:
+                # Every known entry of the matrix, replacing the table
+                self.connection.execute('DELETE FROM chemistry')
+                names = chemistry.names
+                entries = [(names[i], names[j], score) for i, j, score in chemistry.entries()]
+            else:
+                entries = []
+                for i, j in pairs:
+                    for x, y in ((i, j), (j, i)):
+                        score = chemistry.get(x, y)
+                        if score is not None:
+                            entries.append((chemistry.names[x], chemistry.names[y], score))
+            self.name_ids([name for entry in entries for name in entry[:2]])
+            ids = self.ids
+            # Pairs are upserted, so rows of teammates outside the changed set are left alone
+            self.connection.executemany(
+                'INSERT INTO chemistry (player_id, teammate_id, score) VALUES (?, ?, ?) '
+                'ON CONFLICT (player_id, teammate_id) DO UPDATE SET score = excluded.score',
+                [(ids[a], ids[b], score) for a, b, score in entries])
+        if self.metrics is not None:
+            self.metrics.count('rows_written', len(players) + len(entries))
+
+    def game_log(self) -> 'SqliteGameLog':
+        return SqliteGameLog(self)
+
+    def read_games(self) -> List[GameRecord]:
+        """Every game in id order."""
+        return [(datetime.fromisoformat(game['played_at']), game['team1'], game['team2'],
+                 game['score1'], game['score2']) for game in self.game_log().iter_rows()]
+
+    def player(self, name: str) -> Optional[list]:
+        """A listed player's Name..PointsAllowed values, or None."""
+        row = self.connection.execute(
+            f"SELECT {', '.join(PLAYER_COLUMNS)} FROM players WHERE listed AND name = ?", (name,)).fetchone()
+        return list(row) if row else None
+
+    def best_teammates(self, name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """A player's highest chemistry scores, ties in id order."""
+        return self.connection.execute(
+            'SELECT t.name, c.score FROM chemistry c JOIN players t ON t.id = c.teammate_id '
+            'WHERE c.player_id = (SELECT id FROM players WHERE name = ?) '
+            'ORDER BY c.score DESC, c.teammate_id LIMIT ?', (name, limit)).fetchall()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class SqliteGameLog:
+    """
+    The games and game_players tables behind the GameLog interface.
+
+    Games are queried through the played_at and (player_id, game_id) indexes instead of
+    scanning the history. Appended games wait in pending until flush().
+    """
+
+    def __init__(self, storage: SqliteStorage):
+        self.storage = storage
+        self.pending: List[list] = []  # [played_at, team1, team2, score1, score2] waiting for flush()
+        self._count: Optional[int] = None
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = self.storage.connection.execute('SELECT count(*) FROM games').fetchone()[0]
+        return self._count + len(self.pending)
+
+    def iter_rows(self, where: str = '', params: tuple = (), reverse: bool = False,
+                  player_id: Optional[int] = None):
+        """Stored games matching an SQL condition on games g (and player), with played_at as stored."""
+        connection = self.storage.connection
+        order = 'DESC' if reverse else 'ASC'
+        if player_id is None:
+            source = 'games g'
+        else:
+            # Walk the player's games through the (player_id, game_id) index
+            source = 'games g JOIN (SELECT DISTINCT game_id FROM game_players WHERE player_id = ?) gp ON g.id = gp.game_id'
+            params = (player_id,) + params
+        last = None
+        while True:
+            # Keyset pagination, so a game log larger than memory streams in small queries
+            condition = [where] if where else []
+            if last is not None:
+                condition.append(f"g.id {'<' if reverse else '>'} {last}")
+            query = (f"SELECT g.id, g.played_at, g.score1, g.score2 FROM {source} "
+                     f"{'WHERE ' + ' AND '.join(condition) if condition else ''} ORDER BY g.id {order} LIMIT ?")
+            games = connection.execute(query, params + (GAME_FETCH_SIZE,)).fetchall()
+            if not games:
+                return
+            teams: Dict[int, Tuple[List[str], List[str]]] = {game_id: ([], []) for game_id, _, _, _ in games}
+            placeholders = ','.join('?' * len(games))
+            for game_id, team, name in connection.execute(
+                    f'SELECT gp.game_id, gp.team, p.name FROM game_players gp JOIN players p ON p.id = gp.player_id '
+                    f'WHERE gp.game_id IN ({placeholders}) ORDER BY gp.game_id, gp.team, gp.position', list(teams)):
+                teams[game_id][team - 1].append(name)
+            for game_id, played_at, score1, score2 in games:
+                team1, team2 = teams[game_id]
+                yield {'id': game_id, 'played_at': played_at, 'team1': team1, 'team2': team2,
+                       'score1': score1, 'score2': score2}
+            last = games[-1][0]
+
+    def iter_games(self, since: Optional[date] = None, until: Optional[date] = None,
+                   player: Optional[str] = None, reverse: bool = False, with_player: Optional[str] = None):
+        """
+        Yield games one at a time, as GameLog.iter_games does.
+
+        Args:
+            since: Only games on or after this date
+            until: Only games on or before this date
+            player: Only games this player took part in
+            reverse: Newest first instead of oldest first
+            with_player: Only games this player took part in too (together with player)
+
+        Yields:
+            Dicts with date, team1, team2 (lists of names), score1 and score2
+        """
+        if isinstance(since, datetime):
+            since = since.date()
+        if isinstance(until, datetime):
+            until = until.date()
+        condition, params = [], []
+        if since is not None:
+            condition.append('g.played_at >= ?')
+            params.append(since.isoformat())
+        if until is not None:
+            condition.append('g.played_at < ?')
+            params.append((until + timedelta(days=1)).isoformat())
+        if with_player is not None:
+            condition.append('g.id IN (SELECT game_id FROM game_players WHERE player_id = ?)')
+            params.append(self.storage.ids.get(with_player))
+        player_id = self.storage.ids.get(player) if player is not None else None
+        players = [name for name in (player, with_player) if name is not None]
+
+        def wanted(game):
+            return ((since is None or game['date'] >= since) and (until is None or game['date'] <= until)
+                    and all(name in game['team1'] or name in game['team2'] for name in players))
+        pending = [game for game in map(_pending_game, self.pending) if wanted(game)]
+
+        if reverse:
+            yield from reversed(pending)
+        stored = player is None or player_id is not None
+        for row in self.iter_rows(' AND '.join(condition), tuple(params), reverse, player_id) if stored else ():
+            yield {'date': datetime.fromisoformat(row['played_at']).date(), 'team1': row['team1'],
+                   'team2': row['team2'], 'score1': row['score1'], 'score2': row['score2']}
+        if not reverse:
+            yield from pending
+
+    def append(self, game_time: datetime, team1: List[str], team2: List[str], score1: int, score2: int) -> int:
+        """Queue a game for the next flush() and return its game id (position in the log)."""
+        game_id = len(self)
+        self.pending.append([game_time.strftime("%Y-%m-%d %H:%M"), list(team1), list(team2), score1, score2])
+        return game_id
+
+    def flush(self) -> int:
+        """Insert queued games; returns 0 (no CSV bytes are written)."""
+        if not self.pending:
+            return 0
+        games = [(len(self) - len(self.pending) + i, *game) for i, game in enumerate(self.pending)]
+        self.insert(games)
+        self._count = len(self)
+        self.pending = []
+        return 0
+
+    def insert(self, games: List[Tuple[int, str, List[str], List[str], int, int]]) -> None:
+        """Insert (id, played_at, team1, team2, score1, score2) games in one transaction."""
+        storage = self.storage
+        with storage.transaction():
+            storage.connection.executemany('INSERT INTO games (id, played_at, score1, score2) VALUES (?, ?, ?, ?)',
+                                           [(game_id, played_at, score1, score2)
+                                            for game_id, played_at, _, _, score1, score2 in games])
+            storage.name_ids([name for _, _, team1, team2, _, _ in games for name in team1 + team2])
+            ids = storage.ids
+            storage.connection.executemany(
+                'INSERT INTO game_players (game_id, team, position, player_id) VALUES (?, ?, ?, ?)',
+                [(game_id, team, position, ids[name])
+                 for game_id, _, team1, team2, _, _ in games
+                 for team, names in ((1, team1), (2, team2))
+                 for position, name in enumerate(names)])
+
+
+def _pending_game(row: list) -> dict:
+    played_at, team1, team2, score1, score2 = row
+    return {'date': datetime.fromisoformat(played_at).date(), 'team1': team1, 'team2': team2,
+            'score1': score1, 'score2': score2}
+
+
+def migrate(matchmaker, target: SqliteStorage) -> Dict[str, int]:
+    """
+    Copy a loaded league into an empty SQLite database.
+
+    Players and chemistry are written from the matchmaker, so malformed CSV values get the
+    same defaults as in load_players; games are copied from its storage in history order.
+
+    Args:
+        matchmaker: VolleyballMatchmaker loaded from the source files
+        target: Empty SqliteStorage to fill
+
+    Returns:
+        Dict with the number of players and games copied
+    """
+    if target.connection.execute('SELECT EXISTS (SELECT 1 FROM players)').fetchone()[0]:
+        raise ValueError(f"{target.path} already holds a league")
+    games = matchmaker.storage.read_games() or []
+    with target.transaction():
+        # Roster first, so ids follow the chemistry matrix order of a CSV load
+        target.name_ids(list(matchmaker.players))
+        target.save_players(matchmaker.players, matchmaker.chemistry)
+        target.game_log().insert([(game_id, game_time.strftime("%Y-%m-%d %H:%M"), team1, team2, score1, score2)
+                                  for game_id, (game_time, team1, team2, score1, score2) in enumerate(games)])
+    return {'players': len(matchmaker.players), 'games': len(games)}
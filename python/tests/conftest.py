@@ -0,0 +1,36 @@
+import contextlib
+import io
+import itertools
+import os
+import sys
+
+import pytest
+
+# The modules live flat in python/, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.league import generate_league
+from matchmaker import VolleyballMatchmaker
+
+
+@pytest.fixture
+def matchmaker(tmp_path):
+    """
+    Factory for matchmakers over seeded synthetic leagues (see generate_league), each in
+    its own directory under tmp_path, with attendance loaded.
+
+    Call it as matchmaker(num_players, num_games=200, seed=0, num_attending=24, **league).
+    """
+    directories = itertools.count()
+
+    def make(num_players: int, num_games: int = 200, seed: int = 0, num_attending: int = 24,
+             **league) -> VolleyballMatchmaker:
+        directory = tmp_path / f'league{next(directories)}'
+        paths = generate_league(str(directory), num_players, num_games, num_attending=num_attending,
+                                seed=seed, **league)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = VolleyballMatchmaker(paths['players'], paths['games'], paths['attendance'])
+            result.load_attendance()
+        return result
+
+    return make
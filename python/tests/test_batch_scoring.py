@@ -0,0 +1,53 @@
+"""evaluate_team_assignments (NumPy batches) against the scalar _balance_score path."""
+import numpy as np
+import pytest
+
+
+def _assignments(rng: np.random.Generator, num_players: int, num_teams: int, team_size: int,
+                 candidates: int) -> np.ndarray:
+    """Random partitions, some leaving players out so teams come out short."""
+    rows = np.full((candidates, num_players), -1, dtype=np.int64)
+    for row in rows:
+        assigned = rng.integers(num_teams, min(num_players, num_teams * team_size) + 1)
+        order = rng.permutation(num_players)[:assigned]
+        row[order] = np.arange(assigned) % num_teams
+    return rows
+
+
+def _league(matchmaker, seed: int):
+    """A seeded league of 40 players, 24 attending, with chemistry among them and some games played."""
+    return matchmaker(40, 300, seed=seed, chemistry_entries=12)
+
+
+def _scalar_scores(matchmaker, players, assignments, num_teams, team_size):
+    global_avg_rating = np.mean([player.weighted_rating() for player in players])
+    scores = []
+    for row in assignments:
+        teams = [[player for player, team in zip(players, row) if team == t] for t in range(num_teams)]
+        scores.append(matchmaker._balance_score(teams, team_size, global_avg_rating))
+    return scores
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('num_teams, team_size', [(2, 6), (3, 5), (4, 6)])
+def test_batch_matches_scalar(matchmaker, seed, num_teams, team_size):
+    league = _league(matchmaker, seed)
+    players = league.attending_players
+    assignments = _assignments(np.random.default_rng(seed), len(players), num_teams, team_size, 50)
+
+    batch = league.evaluate_team_assignments(players, assignments, num_teams, team_size)
+
+    expected = _scalar_scores(league, players, assignments, num_teams, team_size)
+    assert batch.tolist() == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+def test_empty_team_scores_inf(matchmaker):
+    league = _league(matchmaker, 0)
+    players = league.attending_players
+    assignments = np.zeros((2, len(players)), dtype=np.int64)
+    assignments[1, ::2] = 1
+
+    scores = league.evaluate_team_assignments(players, assignments, 2, 12)
+
+    assert scores[0] == np.inf
+    assert np.isfinite(scores[1])
@@ -0,0 +1,106 @@
+"""Lazy inactivity decay: idempotent reads and loads, and record_game cost independent of roster size."""
+import contextlib
+import io
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from matchmaker import Player, VolleyballMatchmaker
+
+
+def _idle(player: Player, days: int = 100) -> None:
+    player.z_score, player.sigma = 150.0, 50.0
+    player.last_played = date.today() - timedelta(days=days)
+
+
+def test_decayed_rating_does_not_change_player():
+    player = Player('Idle', 'B')
+    _idle(player)
+
+    first = player.decayed_rating()
+
+    assert player.decayed_rating() == first
+    assert (player.z_score, player.sigma) == (150.0, 50.0)
+    assert first[0] < 150.0 and first[1] > 50.0
+
+
+def test_apply_decay_twice_is_a_no_op():
+    player = Player('Idle', 'B')
+    _idle(player)
+    expected = player.decayed_rating()
+
+    player.apply_decay()
+    once = (player.z_score, player.sigma, player.last_played)
+    player.apply_decay()
+
+    assert (player.z_score, player.sigma) == pytest.approx(expected)
+    assert (player.z_score, player.sigma, player.last_played) == once
+    assert player.last_played == date.today()
+
+
+def test_attendance_loads_decay_once(matchmaker):
+    league = matchmaker(100)
+    player = league.attending_players[0]
+    _idle(player)
+    expected = player.decayed_rating()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        league.load_attendance()
+        once = (player.z_score, player.sigma, player.last_played)
+        league.load_attendance()
+
+    assert (player.z_score, player.sigma) == pytest.approx(expected)
+    assert (player.z_score, player.sigma, player.last_played) == once
+
+
+def test_recording_games_leaves_absent_players_alone(matchmaker):
+    league = matchmaker(100)
+    attending = set(league.attending_players)
+    absent = next(player for player in league.players.values() if player not in attending)
+    _idle(absent)
+    before = (absent.z_score, absent.sigma, absent.last_played)
+
+    players = league.attending_players
+    league.record_games([(players[:6], players[6:12], 25, 20), (players[12:18], players[18:24], 18, 25)])
+
+    assert (absent.z_score, absent.sigma, absent.last_played) == before
+
+
+@pytest.mark.parametrize('num_players', [200, 5000])
+def test_record_game_decays_only_the_teams(matchmaker, monkeypatch, num_players):
+    league = matchmaker(num_players)
+    decayed = []
+    apply_decay = Player.apply_decay
+
+    def counted(player, on=None):
+        decayed.append(player.name)
+        apply_decay(player, on)
+
+    monkeypatch.setattr(Player, 'apply_decay', counted)
+    players = league.attending_players
+    league.record_game(players[:6], players[6:12], 25, 21)
+
+    assert sorted(decayed) == sorted(player.name for player in players[:12])
+
+
+def _per_game_seconds(league: VolleyballMatchmaker, games: int = 200) -> float:
+    """Fastest of three rounds of recording games in a batch, per game (the single save is excluded)."""
+    players = league.attending_players
+    best = float('inf')
+    for _ in range(3):
+        with league.batch():
+            start = time.perf_counter()
+            for i in range(games):
+                offset = i % 2 * 12
+                league.record_game(players[offset:offset + 6], players[offset + 6:offset + 12], 25, 15 + i % 10)
+            best = min(best, (time.perf_counter() - start) / games)
+    return best
+
+
+def test_record_game_time_does_not_grow_with_roster(matchmaker):
+    small = _per_game_seconds(matchmaker(200))
+    large = _per_game_seconds(matchmaker(5000))
+
+    # 25 times the players; a roster-wide sweep per game would scale with it
+    assert large < 4 * small
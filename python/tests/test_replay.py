@@ -0,0 +1,42 @@
+"""replay_game_history must rebuild the state record_game built incrementally."""
+import contextlib
+import io
+import random
+
+import pytest
+
+
+def _state(league):
+    players = {name: (player.z_score, player.sigma, player.games_played, player.wins,
+                      player.points_scored, player.points_allowed)
+               for name, player in league.players.items()}
+    names = league.chemistry.names
+    chemistry = {(names[i], names[j]): score
+                 for i, row in league.chemistry.rows.items() for j, score in row.items()}
+    return players, chemistry
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_replay_matches_record_game(matchmaker, seed):
+    league = matchmaker(40, num_games=0, seed=seed, chemistry_entries=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        league.reset_player_stats(reset_all=True)
+    rng = random.Random(seed)
+    roster = list(league.players.values())
+    for _ in range(120):
+        size = rng.choice([4, 5, 6])
+        sample = rng.sample(roster, 2 * size)
+        losing = rng.randint(5, 25)
+        score1, score2 = (25, losing) if rng.random() < 0.5 else (losing, 25)
+        league.record_game(sample[:size], sample[size:], score1, score2)
+    recorded_players, recorded_chemistry = _state(league)
+
+    assert league.replay_game_history(save=False) == 120
+
+    replayed_players, replayed_chemistry = _state(league)
+    assert replayed_players.keys() == recorded_players.keys()
+    for name, expected in recorded_players.items():
+        assert replayed_players[name] == pytest.approx(expected), name
+    assert replayed_chemistry.keys() == recorded_chemistry.keys()
+    for pair, score in recorded_chemistry.items():
+        assert replayed_chemistry[pair] == pytest.approx(score), pair